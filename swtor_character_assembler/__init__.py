@@ -24,10 +24,14 @@ modulesNames = [
     'preferences',
     'deduplicate_materials',
     'deduplicate_nodegroups',
+    'deduplicate_meshes',
+    'deduplicate_images',
     'character_assembler',
     'prefixer',
     'convert_to_legacy_materials',
     'baking_tools',
+    'asset_store_cleanup',
+    'resources_index_refresh',
     ]
   
 modulesFullNames = {}
@@ -0,0 +1,166 @@
+# Logging for the Character Assembler and the rest of the add-on's tools.
+#
+# Printing several lines per asset file to Blender's console is slow
+# (very much so in Windows' one), and with thousands of files it ends
+# up costing more than the copying itself. Instead, the tools log
+# through Python's logging module:
+#
+# • Per-asset details go to DEBUG, and the rest to INFO, WARNING or
+#   ERROR. The console only shows the levels set in the Preferences.
+#
+# • Console output is buffered and written in batches (right away
+#   for errors, and whenever a logging session ends).
+#
+# • A logging session can also write every record, DEBUG ones
+#   included, to a JSON-lines file (typically in the character's
+#   folder), with the assets' details as separate fields.
+#
+# • Sessions count the records per level and keep the warnings and
+#   errors, so that operators can summarize them in their reports.
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender.
+
+
+import sys
+import json
+import time
+import logging
+import logging.handlers
+
+
+LOGGER_NAME = "swtor_character_assembler"
+
+JSON_LOG_FILENAME = "assembler_log.jsonl"
+
+# Records buffered before writing them to the console
+CONSOLE_BUFFER_CAPACITY = 500
+
+# Fields that can be passed to the logging calls through their extra
+# argument, which the JSON-lines log writes as fields of their own
+STRUCTURED_FIELDS = ("slot", "asset_type", "origin", "destination", "outcome", "bytes", "path")
+
+
+_logger = logging.getLogger(LOGGER_NAME)
+_logger.setLevel(logging.DEBUG)
+# Blender or other add-ons may set handlers on the root logger:
+# only our sessions' handlers should print our records.
+_logger.propagate = False
+
+
+def get_logger(name=None):
+    '''Returns the add-on's logger, or one of its children (for
+    example, get_logger("gather") for "swtor_character_assembler.gather")'''
+
+    return _logger.getChild(name) if name else _logger
+
+
+class JsonLinesFormatter(logging.Formatter):
+    '''Formats records as single-line JSON objects'''
+
+    def format(self, record):
+        fields = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + ".{:03d}".format(int(record.msecs)),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            if hasattr(record, field):
+                fields[field] = str(getattr(record, field)) if field != "bytes" else getattr(record, field)
+        if record.exc_info:
+            fields["exception"] = self.formatException(record.exc_info)
+        return json.dumps(fields, ensure_ascii=False)
+
+
+class _TallyHandler(logging.Handler):
+    '''Counts records per level and keeps the warnings and errors'''
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.counts = {}
+        self.problems = []  # (levelname, message)
+
+    def emit(self, record):
+        self.counts[record.levelname] = self.counts.get(record.levelname, 0) + 1
+        if record.levelno >= logging.WARNING:
+            self.problems.append((record.levelname, record.getMessage()))
+
+
+class LogSession:
+    '''Attaches the console (and, optionally, JSON-lines file) handlers
+    to the add-on's logger for the duration of a run. Usable as a context
+    manager, or by calling close() once done.'''
+
+    def __init__(self, console_level=logging.INFO, json_log_filepath=None):
+        if isinstance(console_level, str):
+            console_level = logging.getLevelName(console_level)
+
+        self.json_log_filepath = json_log_filepath
+        self._handlers = []
+
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(logging.Formatter("%(message)s"))
+        buffering_handler = logging.handlers.MemoryHandler(
+            CONSOLE_BUFFER_CAPACITY,
+            flushLevel=logging.ERROR,
+            target=console_handler,
+            )
+        # (Levels are checked by the handler the logger calls, not by its target.)
+        buffering_handler.setLevel(console_level)
+        self._add(buffering_handler, console_handler)
+
+        if json_log_filepath:
+            try:
+                file_handler = logging.FileHandler(json_log_filepath, mode="a", encoding="utf-8")
+            except OSError as e:
+                _logger.warning("The log file %s couldn't be opened: %s", json_log_filepath, e)
+                self.json_log_filepath = None
+            else:
+                file_handler.setFormatter(JsonLinesFormatter())
+                self._add(file_handler)
+
+        self._tally = _TallyHandler()
+        self._add(self._tally)
+
+    def _add(self, handler, *inner_handlers):
+        _logger.addHandler(handler)
+        self._handlers.append((handler, inner_handlers))
+
+    @property
+    def counts(self):
+        '''Numbers of records per level name'''
+        return dict(self._tally.counts)
+
+    @property
+    def problems(self):
+        '''List of (level name, message) of the warnings and errors logged'''
+        return list(self._tally.problems)
+
+    def errors(self):
+        return [message for levelname, message in self._tally.problems if levelname in ("ERROR", "CRITICAL")]
+
+    def warnings(self):
+        return [message for levelname, message in self._tally.problems if levelname == "WARNING"]
+
+    def flush(self):
+        for handler, _ in self._handlers:
+            handler.flush()
+
+    def close(self):
+        '''Writes out anything buffered and detaches the handlers'''
+
+        for handler, inner_handlers in self._handlers:
+            _logger.removeHandler(handler)
+            handler.flush()
+            handler.close()
+            for inner_handler in inner_handlers:
+                inner_handler.close()
+        self._handlers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
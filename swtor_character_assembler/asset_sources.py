@@ -0,0 +1,729 @@
+# Asset sources for the Character Assembler's gathering.
+#
+# The assets a character needs can come from several kinds of places,
+# and several of them at once:
+#
+# • A 'resources' folder, as extracted by SWTOR asset extractors
+#   (LocalFolderSource).
+# • A zip archive of a 'resources' folder or part of it (ZipSource).
+# • A folder with the game's .tor archives (TorSource).
+# • An HTTP(S) server mirroring a 'resources' folder (HttpSource),
+#   through a pool of persistent connections.
+# • A stack of any of the above (OverlaySource): patched or modded
+#   assets layered over a base extraction, for example. The first
+#   source in the stack that has an asset provides it, which is found
+#   out when fetching it.
+#
+# Sources that aren't plain folders are fetched from into a local cache
+# folder mirroring the 'resources' one, which the rest of the add-on
+# uses as usual. A record of what was fetched lets later gatherings
+# reuse the cached files, unless their originals changed.
+#
+# Sources work as path_resolver.PathResolver objects for the gathering
+# planner, with two steps: locate() tells where an asset will be, and
+# fetch_local() fetches it and returns where it is (the same path,
+# except for overlays). The planner only locates most assets, and the
+# copying threads fetch them (see gather_copier.copy_asset), so that
+# the fetching is concurrent.
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender.
+
+
+import os
+import json
+import queue
+import hashlib
+import zipfile
+import threading
+import http.client
+import email.utils
+import urllib.parse
+from pathlib import Path
+
+from .resources_index import normalize_path
+from .path_resolver import PathResolver
+from .tor_archive import TorIndex, find_archives, tor_filename, TOR_INDEX_FILENAME
+from .assembler_log import get_logger
+
+
+log = get_logger("asset_sources")
+
+
+# Record of the files fetched into a cache folder
+FETCH_RECORD_FILENAME = "fetched_assets.json"
+
+DEFAULT_HTTP_CONNECTIONS = 8
+DEFAULT_HTTP_TIMEOUT = 30
+
+# Subfolders that make a cache folder pass for a 'resources' one
+RESOURCES_MARKER_FOLDERS = ("art/shaders/materials", "art/defaultassets")
+
+
+def _as_written(asset_path):
+    return asset_path.replace("\\", "/").strip("/")
+
+
+def source_hash(spec):
+    '''Short hash identifying a source's folder, file or URL, for
+    naming its cache folder and indexes'''
+
+    if not is_url(spec):
+        spec = str(Path(spec).resolve())
+    return hashlib.sha1(spec.encode("utf-8")).hexdigest()[:12]
+
+
+def is_url(spec):
+    return spec.lower().startswith(("http://", "https://"))
+
+
+def make_resources_like(folderpath):
+    '''Creates a folder with the subfolders a 'resources' one is validated by'''
+
+    for marker_folder in RESOURCES_MARKER_FOLDERS:
+        os.makedirs(os.path.join(str(folderpath), *marker_folder.split("/")), exist_ok=True)
+    return str(folderpath)
+
+
+
+# Base classes
+
+class AssetSource:
+    '''A source of assets, resolving their paths as written in SWTOR
+    files to absolute paths in a local folder'''
+
+    kind = "source"
+
+    def __init__(self, local_folderpath):
+        self.swtor_resources_folderpath = str(local_folderpath)
+        self._located = {}  # Local path → path as written
+        self._lock = threading.Lock()
+
+    def local_path(self, asset_path):
+        return os.path.join(self.swtor_resources_folderpath, *normalize_path(asset_path).split("/"))
+
+    def locate(self, asset_path):
+        '''Returns the absolute path an asset will have locally once
+        fetched (see fetch_local), without fetching it'''
+
+        filepath = self.local_path(asset_path)
+        with self._lock:
+            self._located[filepath] = _as_written(asset_path)
+        return filepath
+
+    def resolve(self, asset_path):
+        '''Returns the absolute path of an asset, fetching it now if
+        needed. Assets that can't be fetched resolve to where they'd
+        be, for the copying to report them.'''
+
+        filepath = self.locate(asset_path)
+        try:
+            return self.fetch_local(filepath)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.error("Couldn't fetch %s from %s: %s", asset_path, self.description(), e, extra={"path": asset_path})
+        return filepath
+
+    def fetch_local(self, filepath):
+        '''Makes sure that a path returned by locate() holds its asset,
+        and returns the path it is at (see OverlaySource.fetch_local).
+        Raises FileNotFoundError if the source doesn't have it. Paths
+        this source didn't locate are left alone. Thread-safe.'''
+
+        with self._lock:
+            asset_path = self._located.get(filepath)
+        if asset_path is not None:
+            self._fetch(asset_path, filepath)
+        return filepath
+
+    def owns(self, filepath):
+        with self._lock:
+            return filepath in self._located
+
+    @property
+    def corrections(self):
+        '''Asset paths' casing corrections made, as in PathResolver'''
+        return []
+
+    def exists(self, asset_path):
+        raise NotImplementedError
+
+    def _fetch(self, asset_path, filepath):
+        raise NotImplementedError
+
+    def description(self):
+        return self.kind
+
+    def summary(self):
+        return self.description()
+
+    def write_corrections_log(self, folderpath):
+        return None
+
+    def save(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CachingSource(AssetSource):
+    '''A source whose assets are fetched into a cache folder. Subclasses
+    implement _is_current and _read.'''
+
+    def __init__(self, cache_folderpath):
+        super().__init__(make_resources_like(cache_folderpath))
+        self.fetched = 0
+        self.reused = 0
+        self.bytes_fetched = 0
+
+        # What was fetched, with its origin's signature, to tell stale files apart
+        self._record_filepath = os.path.join(self.swtor_resources_folderpath, FETCH_RECORD_FILENAME)
+        try:
+            with open(self._record_filepath, "r") as record_file:
+                self._record = json.load(record_file)
+        except (OSError, ValueError):
+            self._record = {}
+        self._dirty = False
+        self._fetch_locks = {}  # Normalized path → lock, so that each asset is fetched once at a time
+        self._current = set()  # Normalized paths fetched or found current by this instance
+
+    def _is_current(self, asset_path, known_signature):
+        '''Whether the cached file, fetched when its origin had
+        known_signature, is still good'''
+        raise NotImplementedError
+
+    def _read(self, asset_path, known_signature):
+        '''Returns the asset's (contents, signature), or (None, signature)
+        if the cached file is still good. Raises FileNotFoundError if the
+        asset isn't in the source.'''
+        raise NotImplementedError
+
+    def _fetch_lock(self, relative_path):
+        with self._lock:
+            return self._fetch_locks.setdefault(relative_path, threading.Lock())
+
+    def _fetch(self, asset_path, filepath):
+        # Whoever asks for an asset being fetched already (the planner
+        # reading a model the copying threads are fetching, say) waits
+        # for that fetch, and then finds the file current.
+        relative_path = normalize_path(asset_path)
+        with self._fetch_lock(relative_path):
+            self._fetch_unlocked(asset_path, relative_path, filepath)
+
+    def _fetch_unlocked(self, asset_path, relative_path, filepath):
+        with self._lock:
+            if relative_path in self._current and os.path.exists(filepath):
+                self.reused += 1
+                return
+            known_signature = self._record.get(relative_path)
+        if known_signature is not None and not os.path.exists(filepath):
+            known_signature = None
+
+        if known_signature is not None and self._is_current(asset_path, known_signature):
+            with self._lock:
+                self.reused += 1
+                self._current.add(relative_path)
+            return
+
+        contents, signature = self._read(asset_path, known_signature)
+        if contents is not None:
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            # Replace rather than overwrite: the old file may be linked from
+            # characters' folders. The temporary file is per thread in case
+            # two of them fetch the same asset.
+            temporary_filepath = "{}.{}.tmp".format(filepath, threading.get_ident())
+            with open(temporary_filepath, "wb") as fetched_file:
+                fetched_file.write(contents)
+            os.replace(temporary_filepath, filepath)
+            log.debug("FETCHED: %s", asset_path, extra={"path": relative_path, "bytes": len(contents)})
+
+        with self._lock:
+            if contents is None:
+                self.reused += 1
+            else:
+                self.fetched += 1
+                self.bytes_fetched += len(contents)
+            if self._record.get(relative_path) != signature:
+                self._record[relative_path] = signature
+                self._dirty = True
+            self._current.add(relative_path)
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                with open(self._record_filepath + ".tmp", "w") as record_file:
+                    json.dump(self._record, record_file)
+                os.replace(self._record_filepath + ".tmp", self._record_filepath)
+                self._dirty = False
+            except OSError as e:
+                log.warning("The record of the files fetched from %s couldn't be saved: %s", self.description(), e)
+
+    def summary(self):
+        return "{}: {} files fetched ({:.1f} MB), {} fetched already".format(
+            self.description(),
+            self.fetched,
+            self.bytes_fetched / (1024 * 1024),
+            self.reused,
+            )
+
+
+
+# Backends
+
+class LocalFolderSource(AssetSource):
+    '''A 'resources' folder. Nothing needs fetching. If a
+    path_resolver.PathResolver is passed, paths are resolved
+    through it, fixing any casing mismatches.'''
+
+    kind = "folder"
+
+    def __init__(self, swtor_resources_folderpath, path_resolver=None):
+        super().__init__(swtor_resources_folderpath)
+        self.path_resolver = path_resolver
+
+    def local_path(self, asset_path):
+        if self.path_resolver:
+            return self.path_resolver.resolve(asset_path)
+        return os.path.join(self.swtor_resources_folderpath, *_as_written(asset_path).split("/"))
+
+    def locate(self, asset_path):
+        return self.local_path(asset_path)
+
+    def fetch_local(self, filepath):
+        return filepath
+
+    def owns(self, filepath):
+        folderpath = os.path.abspath(self.swtor_resources_folderpath)
+        try:
+            return os.path.commonpath([os.path.abspath(filepath), folderpath]) == folderpath
+        except ValueError:  # Different drives
+            return False
+
+    def exists(self, asset_path):
+        return os.path.exists(self.local_path(asset_path))
+
+    def description(self):
+        return "'resources' folder " + self.swtor_resources_folderpath
+
+    @property
+    def corrections(self):
+        return self.path_resolver.corrections if self.path_resolver else []
+
+    def write_corrections_log(self, folderpath):
+        if self.path_resolver:
+            return self.path_resolver.write_corrections_log(folderpath)
+        return None
+
+
+class ZipSource(CachingSource):
+    '''A zip archive of a 'resources' folder (its files can be at the
+    archive's root or inside a 'resources' folder in it)'''
+
+    kind = "zip"
+
+    def __init__(self, zip_filepath, cache_folderpath):
+        super().__init__(cache_folderpath)
+        self.zip_filepath = str(zip_filepath)
+        self._local = threading.local()  # ZipFile objects aren't thread-safe.
+        self._zip_files = []
+
+        # Normalized path → (member's name, signature)
+        self._members = {}
+        for info in self._zip_file().infolist():
+            if info.is_dir():
+                continue
+            relative_path = normalize_path(info.filename)
+            if relative_path.startswith("resources/"):
+                relative_path = relative_path[len("resources/"):]
+            self._members[relative_path] = (info.filename, [info.CRC, info.file_size])
+
+    def _zip_file(self):
+        zip_file = getattr(self._local, "zip_file", None)
+        if zip_file is None:
+            zip_file = self._local.zip_file = zipfile.ZipFile(self.zip_filepath, "r")
+            with self._lock:
+                self._zip_files.append(zip_file)
+        return zip_file
+
+    def exists(self, asset_path):
+        return normalize_path(asset_path) in self._members
+
+    def _is_current(self, asset_path, known_signature):
+        member = self._members.get(normalize_path(asset_path))
+        return member is not None and member[1] == known_signature
+
+    def _read(self, asset_path, known_signature):
+        member = self._members.get(normalize_path(asset_path))
+        if member is None:
+            raise FileNotFoundError("Not found in " + self.zip_filepath + ": " + asset_path)
+        return self._zip_file().read(member[0]), member[1]
+
+    def description(self):
+        return "zip archive " + self.zip_filepath
+
+    def close(self):
+        with self._lock:
+            for zip_file in self._zip_files:
+                zip_file.close()
+            self._zip_files = []
+        self._local = threading.local()
+
+
+class TorSource(CachingSource):
+    '''The game's .tor archives, as indexed by a tor_archive.TorIndex.
+    Files are extracted the first time they are asked for, or if they
+    changed in a game patch.'''
+
+    kind = ".tor archives"
+
+    def __init__(self, tor_index, cache_folderpath):
+        super().__init__(cache_folderpath)
+        self.tor_index = tor_index
+        self._released = False
+
+    def exists(self, asset_path):
+        return self.tor_index.exists(asset_path)
+
+    def _signature(self, asset_path):
+        found = self.tor_index.lookup(asset_path)
+        if found is None:
+            return None
+        return [found[0], found[1], os.path.basename(found[3])]
+
+    def _is_current(self, asset_path, known_signature):
+        return self._signature(asset_path) == known_signature
+
+    def _read(self, asset_path, known_signature):
+        signature = self._signature(asset_path)
+        if signature is None:
+            raise FileNotFoundError("Not found in the .tor archives: " + tor_filename(asset_path))
+        return self.tor_index.read(asset_path), signature
+
+    def description(self):
+        return ".tor archives in " + self.tor_index.tor_folderpath
+
+    def close(self):
+        # The index stays open for later sources (see get_tor_index).
+        with self._lock:
+            released, self._released = self._released, True
+        if not released:
+            release_tor_index(self.tor_index)
+
+
+class HttpSource(CachingSource):
+    '''An HTTP(S) server mirroring a 'resources' folder. Requests go
+    through a pool of persistent connections, and cached files are
+    reused as they are, or, if revalidate is set, after a conditional
+    request confirms they didn't change.'''
+
+    kind = "HTTP"
+
+    def __init__(self, base_url, cache_folderpath, max_connections=DEFAULT_HTTP_CONNECTIONS, timeout=DEFAULT_HTTP_TIMEOUT, revalidate=False):
+        super().__init__(cache_folderpath)
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.revalidate = revalidate
+        self.requests = 0
+
+        url = urllib.parse.urlsplit(self.base_url)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise ValueError("Not an HTTP(S) URL: " + base_url)
+        self._connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self._host = url.hostname
+        self._port = url.port
+        self._base_path = url.path.rstrip("/")
+
+        # Idle connections. A LIFO queue keeps reusing the most recent
+        # ones, which are the likeliest to still be open.
+        self._connections = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, max_connections))
+        self._exists = {}
+
+    def _new_connection(self):
+        return self._connection_class(self._host, self._port, timeout=self.timeout)
+
+    def _request(self, method, asset_path, headers=None):
+        '''Returns (status, headers, body) for an asset's URL. A connection
+        found closed by the server is retried once with a new one.'''
+
+        url_path = self._base_path + "/" + urllib.parse.quote(_as_written(asset_path))
+        with self._slots:
+            try:
+                connection = self._connections.get_nowait()
+                reused = True
+            except queue.Empty:
+                connection = self._new_connection()
+                reused = False
+
+            while True:
+                try:
+                    connection.request(method, url_path, headers=headers or {})
+                    response = connection.getresponse()
+                    body = response.read()
+                except (http.client.HTTPException, OSError):
+                    connection.close()
+                    if not reused:
+                        raise
+                    connection = self._new_connection()
+                    reused = False
+                    continue
+                break
+
+            with self._lock:
+                self.requests += 1
+            if response.will_close:
+                connection.close()
+            else:
+                self._connections.put(connection)
+            return response.status, response.headers, body
+
+    def exists(self, asset_path):
+        relative_path = normalize_path(asset_path)
+        with self._lock:
+            if relative_path in self._exists:
+                return self._exists[relative_path]
+            if relative_path in self._record and os.path.exists(self.local_path(asset_path)):
+                return True
+        status, _, _ = self._request("HEAD", asset_path)
+        with self._lock:
+            self._exists[relative_path] = status == 200
+        return status == 200
+
+    def _is_current(self, asset_path, known_signature):
+        return not self.revalidate
+
+    def _read(self, asset_path, known_signature):
+        headers = {}
+        if known_signature:
+            etag, last_modified = known_signature
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        status, response_headers, body = self._request("GET", asset_path, headers)
+        if status == 304:
+            return None, known_signature
+        if status == 404:
+            raise FileNotFoundError("Not found in " + self.base_url + ": " + asset_path)
+        if status != 200:
+            raise OSError("HTTP {} fetching {} from {}".format(status, asset_path, self.base_url))
+        signature = [response_headers.get("ETag"), response_headers.get("Last-Modified") or email.utils.formatdate(usegmt=True)]
+        return body, signature
+
+    def description(self):
+        return "HTTP server " + self.base_url
+
+    def summary(self):
+        return super().summary() + ", {} requests".format(self.requests)
+
+    def close(self):
+        while True:
+            try:
+                self._connections.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class OverlaySource(AssetSource):
+    '''A stack of sources: each asset comes from the first source that
+    has it. The last one is the base, and isn't asked whether it has
+    the assets: those no source has are located in it, for the
+    copying to report them as missing.
+
+    Asking the other sources can take a request per asset, so it's left
+    to fetch_local, which the copying threads call concurrently: locate
+    returns the asset's path in the base, and fetch_local the path in
+    the source it actually comes from.'''
+
+    kind = "overlay"
+
+    def __init__(self, sources):
+        if not sources:
+            raise ValueError("An overlay needs at least one source")
+        super().__init__(sources[-1].swtor_resources_folderpath)
+        self.sources = list(sources)
+        self._chosen = {}  # Normalized path → source
+
+    @property
+    def corrections(self):
+        corrections = []
+        for source in self.sources:
+            corrections += source.corrections
+        return corrections
+
+    def source_of(self, asset_path):
+        '''Returns the source an asset comes from'''
+
+        relative_path = normalize_path(asset_path)
+        with self._lock:
+            source = self._chosen.get(relative_path)
+        if source is None:
+            source = self.sources[-1]
+            for candidate in self.sources[:-1]:
+                try:
+                    if candidate.exists(asset_path):
+                        source = candidate
+                        break
+                except Exception as e:
+                    log.warning("Couldn't check %s in %s: %s", asset_path, candidate.description(), e, extra={"path": asset_path})
+            with self._lock:
+                self._chosen[relative_path] = source
+        return source
+
+    def locate(self, asset_path):
+        filepath = self.sources[-1].locate(asset_path)
+        with self._lock:
+            self._located[filepath] = asset_path
+        return filepath
+
+    def fetch_local(self, filepath):
+        with self._lock:
+            asset_path = self._located.get(filepath)
+        if asset_path is not None:
+            source = self.source_of(asset_path)
+            return source.fetch_local(source.locate(asset_path))
+
+        # A path a source returned already
+        for source in self.sources:
+            if source.owns(filepath):
+                return source.fetch_local(filepath)
+        return filepath
+
+    def owns(self, filepath):
+        with self._lock:
+            if filepath in self._located:
+                return True
+        return any(source.owns(filepath) for source in self.sources)
+
+    def exists(self, asset_path):
+        return any(source.exists(asset_path) for source in self.sources)
+
+    def description(self):
+        return " over ".join(source.description() for source in self.sources)
+
+    def summary(self):
+        return "\n".join(source.summary() for source in self.sources)
+
+    def write_corrections_log(self, folderpath):
+        logs = [source.write_corrections_log(folderpath) for source in self.sources]
+        logs = [log_filepath for log_filepath in logs if log_filepath]
+        return logs[0] if logs else None
+
+    def save(self):
+        for source in self.sources:
+            source.save()
+
+    def close(self):
+        for source in self.sources:
+            source.close()
+
+
+
+# Factory
+
+# .tor archives' indexes opened in this session, by folder, and how
+# many sources are using each. Refreshing an index closes its memory
+# maps, so it waits until no source is reading through them.
+_tor_indexes = {}
+_tor_index_users = {}
+_tor_indexes_lock = threading.Lock()
+
+# Whether folders hold .tor archives, by folder
+_tor_archives_found = {}
+
+
+def has_tor_archives(tor_folderpath, recheck=False):
+    '''Whether a folder holds .tor archives. Only the first check of a
+    folder in this session (or one with recheck set) lists it, so that
+    panels can check it on every redraw.'''
+
+    tor_folderpath = str(tor_folderpath)
+    if not tor_folderpath:
+        return False
+    if recheck or tor_folderpath not in _tor_archives_found:
+        _tor_archives_found[tor_folderpath] = bool(find_archives(tor_folderpath))
+    return _tor_archives_found[tor_folderpath]
+
+
+def get_tor_index(tor_folderpath, index_folderpath):
+    '''Returns the TorIndex of a folder's .tor archives, opening it (or
+    building it, the first time) if not opened in this session already,
+    and refreshing it if the archives changed since, unless another
+    source is using it. Each call must be paired with a call to
+    release_tor_index (TorSource.close makes it).'''
+
+    tor_folderpath = str(tor_folderpath)
+    with _tor_indexes_lock:
+        tor_index = _tor_indexes.get(tor_folderpath)
+        if tor_index is None:
+            index_filepath = os.path.join(str(index_folderpath), source_hash(tor_folderpath) + "_" + TOR_INDEX_FILENAME)
+            tor_index = _tor_indexes[tor_folderpath] = TorIndex(tor_folderpath, index_filepath)
+        elif not _tor_index_users.get(tor_folderpath):
+            tor_index.refresh()
+        elif tor_index.changed():
+            log.warning("The .tor archives in %s changed, but another gathering is reading them: their index will be refreshed once it's done.", tor_folderpath)
+        _tor_index_users[tor_folderpath] = _tor_index_users.get(tor_folderpath, 0) + 1
+    _tor_archives_found[tor_folderpath] = bool(tor_index.archives)
+    return tor_index
+
+
+def release_tor_index(tor_index):
+    '''Tells that a source got from get_tor_index is done with its index'''
+
+    with _tor_indexes_lock:
+        if _tor_indexes.get(tor_index.tor_folderpath) is tor_index and _tor_index_users.get(tor_index.tor_folderpath):
+            _tor_index_users[tor_index.tor_folderpath] -= 1
+
+
+def cache_folderpath(spec, cache_root_folderpath, kind):
+    return os.path.join(str(cache_root_folderpath), "{}_resources_{}".format(kind, source_hash(spec)))
+
+
+def parse_sources_list(sources_list):
+    '''Splits a semicolon-separated list of sources (as set in the
+    add-on's preferences) into their specs'''
+
+    return [spec.strip() for spec in sources_list.split(";") if spec.strip()]
+
+
+def _spec_kind(spec):
+    if is_url(spec):
+        return "http"
+    if spec.lower().endswith(".zip") and os.path.isfile(spec):
+        return "zip"
+    if os.path.isdir(spec) and find_archives(spec):
+        return "tor"
+    if os.path.isdir(spec):
+        return "folder"
+    raise FileNotFoundError("Not a folder, a .zip file or an http(s) URL: " + spec)
+
+
+def source_folderpath(spec, cache_root_folderpath):
+    '''Returns the local folder a spec's source would provide its assets
+    in, without opening the source'''
+
+    kind = _spec_kind(spec)
+    if kind == "folder":
+        return spec
+    return make_resources_like(cache_folderpath(spec, cache_root_folderpath, kind))
+
+
+def make_source(spec, cache_root_folderpath, fix_path_casing=False, http_connections=DEFAULT_HTTP_CONNECTIONS):
+    '''Returns the source for a spec: an http(s):// URL, a .zip file, a
+    folder with .tor archives, or a 'resources' folder (whose paths'
+    casing mismatches are fixed if fix_path_casing is set). Fetched
+    files are cached in subfolders of cache_root_folderpath.'''
+
+    kind = _spec_kind(spec)
+    if kind == "http":
+        return HttpSource(spec, cache_folderpath(spec, cache_root_folderpath, "http"), max_connections=http_connections)
+    if kind == "zip":
+        return ZipSource(spec, cache_folderpath(spec, cache_root_folderpath, "zip"))
+    if kind == "tor":
+        return TorSource(get_tor_index(spec, cache_root_folderpath), cache_folderpath(spec, cache_root_folderpath, "tor"))
+    return LocalFolderSource(spec, PathResolver.from_walk(spec) if fix_path_casing else None)
@@ -0,0 +1,357 @@
+# Shared, content-addressed asset store for the Character Assembler.
+#
+# Characters in a library tend to share many gear models and textures.
+# With a store set in the add-on's preferences, each asset is gathered
+# from 'resources' into the store once, and the characters' folders get
+# links to the store's copy instead of copies of their own (see
+# gather_copier.link_asset).
+#
+# Store layout:
+#     <store>/objects/<first two key characters>/<key><file extension>
+#     <store>/store_index.json
+#
+# The index keeps, per stored object, its origin in 'resources', its
+# size, and the character folders' files that reference it, which is
+# what garbage collection and the savings statistics work from.
+#
+# Several Blender processes can share a store (see batch_assembler).
+# Each one records only what it adds, and merges that into the index
+# on disk when saving, under a lock file, so that no process drops
+# another one's references. Objects are written under unique temporary
+# names, and garbage collection leaves recent leftovers alone, in case
+# they belong to a gathering still running.
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender.
+
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from .gather_copier import reflink, link_asset, COPIED, HARDLINKED, SYMLINKED
+from .gather_manifest import file_hash
+from .assembler_log import get_logger
+
+
+log = get_logger("asset_store")
+
+
+INDEX_FILENAME = "store_index.json"
+INDEX_LOCK_FILENAME = "store_index.lock"
+OBJECTS_FOLDERNAME = "objects"
+
+# Seconds to wait for another process to release the index's lock,
+# and after which a lock is taken for a crashed process' leftover
+INDEX_LOCK_TIMEOUT = 60
+INDEX_LOCK_STALE_SECONDS = 600
+
+# Files in the store that the index doesn't know about are deleted
+# by garbage collection only once they are older than this (seconds)
+ORPHAN_GRACE_SECONDS = 24 * 60 * 60
+
+# Keying modes
+PATH_KEY = "PATH"  # resources-relative path + size + modification time
+HASH_KEY = "HASH"  # hash of the file's contents
+
+class AssetStore:
+    '''A content-addressed store of gathered assets. Thread-safe, so that
+    the gathering threads can ingest and reference assets concurrently.
+    Call save() once done to persist the index.'''
+
+    def __init__(self, store_folderpath, swtor_resources_folderpath=None, key_mode=PATH_KEY):
+        self.store_folderpath = str(store_folderpath)
+        self.swtor_resources_folderpath = swtor_resources_folderpath
+        self.key_mode = key_mode
+
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+        # "objects": {key: {"source", "size", "path", "refs": {destination: outcome}}}
+        # "sources": {resources-relative path: [size, mtime_ns, key]} (avoids rehashing)
+        self.index = self._read_index()
+
+        # What this instance added since it last saved, in the same layout
+        self._changes = {"objects": {}, "sources": {}}
+
+
+    # Index
+
+    def _index_filepath(self):
+        return os.path.join(self.store_folderpath, INDEX_FILENAME)
+
+    def _read_index(self):
+        index = {"objects": {}, "sources": {}}
+        index_filepath = self._index_filepath()
+        if os.path.isfile(index_filepath):
+            try:
+                with open(index_filepath, "r") as index_file:
+                    index.update(json.load(index_file))
+            except Exception as e:
+                log.warning("The asset store's index couldn't be read and will be rebuilt: %s", e)
+        return index
+
+    def _write_index(self, index):
+        index_filepath = self._index_filepath()
+        with open(index_filepath + ".tmp", "w") as index_file:
+            json.dump(index, index_file)
+        os.replace(index_filepath + ".tmp", index_filepath)
+
+    @contextmanager
+    def _index_lock(self):
+        # A lock file other processes using the store honor too
+        os.makedirs(self.store_folderpath, exist_ok=True)
+        lock_filepath = os.path.join(self.store_folderpath, INDEX_LOCK_FILENAME)
+        deadline = time.monotonic() + INDEX_LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(lock_filepath, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_filepath) > INDEX_LOCK_STALE_SECONDS:
+                        log.warning("Removing the stale asset store lock %s", lock_filepath)
+                        os.remove(lock_filepath)
+                        continue
+                except OSError:
+                    continue  # Released meanwhile
+                if time.monotonic() > deadline:
+                    raise TimeoutError("The asset store's index is locked by another process: " + lock_filepath)
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            os.remove(lock_filepath)
+
+    def _merge_changes(self, index):
+        # Applies this instance's additions to an index read from disk
+        for key, changed_entry in self._changes["objects"].items():
+            entry = index["objects"].setdefault(key, {"refs": {}})
+            for field in ("source", "size", "path"):
+                if field in changed_entry:
+                    entry[field] = changed_entry[field]
+            entry["refs"].update(changed_entry["refs"])
+        index["sources"].update(self._changes["sources"])
+        self._changes = {"objects": {}, "sources": {}}
+
+
+    # Keys
+
+    def _relative_source(self, origin):
+        if self.swtor_resources_folderpath:
+            origin = os.path.relpath(origin, self.swtor_resources_folderpath)
+        # BioWare's paths' casing and separators are inconsistent.
+        return origin.replace("\\", "/").lower()
+
+    def key_for(self, origin):
+        '''Returns the store key for a 'resources' file'''
+
+        stat = os.stat(origin)
+        source = self._relative_source(origin)
+
+        known = self.index["sources"].get(source)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+
+        if self.key_mode == HASH_KEY:
+            key = file_hash(origin)
+        else:
+            key = hashlib.sha1("{}|{}|{}".format(source, stat.st_size, stat.st_mtime_ns).encode("utf-8")).hexdigest()
+
+        with self._lock:
+            self.index["sources"][source] = self._changes["sources"][source] = [stat.st_size, stat.st_mtime_ns, key]
+        return key
+
+    def object_path(self, key, extension=""):
+        return os.path.join(self.store_folderpath, OBJECTS_FOLDERNAME, key[:2], key + extension)
+
+
+    # Ingesting and referencing
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def ingest(self, origin):
+        '''Stores a 'resources' file unless it's there already.
+        Returns its (key, object path).'''
+
+        key = self.key_for(origin)
+        object_path = self.object_path(key, os.path.splitext(origin)[1].lower())
+
+        with self._key_lock(key):
+            if not os.path.isfile(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                # Written under a temporary name of its own and then
+                # moved into place, so that an interrupted ingest leaves
+                # no half file and other processes ingesting it don't
+                # interfere. If one of them won the race, its object is
+                # kept, for the links placed from it to stay shared.
+                temporary_file, temporary_path = tempfile.mkstemp(prefix=key + ".", suffix=".tmp", dir=os.path.dirname(object_path))
+                os.close(temporary_file)
+                try:
+                    try:
+                        reflink(origin, temporary_path)
+                    except OSError:
+                        shutil.copy2(origin, temporary_path)
+                    try:
+                        os.link(temporary_path, object_path)
+                    except FileExistsError:
+                        pass
+                    except OSError:
+                        os.replace(temporary_path, object_path)  # No hardlinks in the store's filesystem
+                finally:
+                    if os.path.exists(temporary_path):
+                        os.remove(temporary_path)
+
+            with self._lock:
+                fields = {
+                    "source": self._relative_source(origin),
+                    "size": os.path.getsize(object_path),
+                    "path": os.path.relpath(object_path, self.store_folderpath),
+                    }
+                self.index["objects"].setdefault(key, {"refs": {}}).update(fields)
+                self._changes["objects"].setdefault(key, {"refs": {}}).update(fields)
+
+        return key, object_path
+
+    def add_reference(self, key, destination, outcome):
+        '''Records that a character folder's file was placed from a stored object'''
+
+        with self._lock:
+            destination = os.path.abspath(destination)
+            self.index["objects"][key]["refs"][destination] = outcome
+            self._changes["objects"].setdefault(key, {"refs": {}})["refs"][destination] = outcome
+
+    def place(self, origin, destination):
+        '''Ingests a 'resources' file and places it at destination as a link
+        to the stored object (or as a copy of it if links aren't possible).
+        Returns the outcome (see gather_copier).'''
+
+        key, object_path = self.ingest(origin)
+        outcome = link_asset(object_path, destination)
+        self.add_reference(key, destination, outcome)
+        return outcome
+
+    def save(self):
+        '''Merges what this instance added into the store's index
+        on disk, along with what other processes added meanwhile'''
+
+        with self._lock, self._index_lock():
+            index = self._read_index()
+            self._merge_changes(index)
+            self._write_index(index)
+            self.index = index
+
+
+    # Maintenance
+
+    def _still_references(self, object_path, destination, outcome):
+        if not os.path.lexists(destination):
+            return False
+        try:
+            if os.path.samefile(object_path, destination):
+                return True
+        except OSError:
+            return False
+        # Reflinks and copies aren't the same file as far as the OS
+        # is concerned: settle for them not having been replaced.
+        return outcome not in (HARDLINKED, SYMLINKED) and os.path.getsize(destination) == os.path.getsize(object_path)
+
+    def collect_garbage(self):
+        '''Forgets references from character folders' files that don't exist
+        anymore or have been replaced, and deletes stored objects that no
+        file references. Returns (objects deleted, bytes freed).'''
+
+        objects_deleted = 0
+        bytes_freed = 0
+
+        # Work on the latest index, with nobody else saving meanwhile.
+        with self._lock, self._index_lock():
+            self.index = self._read_index()
+            self._merge_changes(self.index)
+
+            for key, entry in list(self.index["objects"].items()):
+                object_path = os.path.join(self.store_folderpath, entry.get("path", ""))
+                entry["refs"] = {
+                    destination: outcome
+                    for destination, outcome in entry["refs"].items()
+                    if self._still_references(object_path, destination, outcome)
+                }
+                if not entry["refs"] or not os.path.isfile(object_path):
+                    if os.path.isfile(object_path):
+                        bytes_freed += os.path.getsize(object_path)
+                        os.remove(object_path)
+                        objects_deleted += 1
+                    del self.index["objects"][key]
+
+            # Sources whose key isn't stored anymore are forgotten too.
+            self.index["sources"] = {
+                source: known
+                for source, known in self.index["sources"].items()
+                if known[2] in self.index["objects"]
+            }
+
+            # Files in the store that the index doesn't know about
+            # (leftovers of interrupted ingests, mostly). Recent ones may
+            # be another process' ingests in progress or not saved yet.
+            indexed_paths = set(os.path.normcase(os.path.join(self.store_folderpath, entry["path"])) for entry in self.index["objects"].values())
+            objects_folderpath = os.path.join(self.store_folderpath, OBJECTS_FOLDERNAME)
+            for folderpath, _, filenames in os.walk(objects_folderpath):
+                for filename in filenames:
+                    filepath = os.path.join(folderpath, filename)
+                    if os.path.normcase(filepath) in indexed_paths:
+                        continue
+                    try:
+                        # (Ingested copies keep their origin's modification time.)
+                        stat = os.stat(filepath)
+                        if time.time() - max(stat.st_mtime, stat.st_ctime) < ORPHAN_GRACE_SECONDS:
+                            continue
+                        size = stat.st_size
+                        os.remove(filepath)
+                    except OSError:
+                        continue  # Renamed or removed meanwhile
+                    bytes_freed += size
+                    objects_deleted += 1
+
+            self._write_index(self.index)
+
+        return objects_deleted, bytes_freed
+
+    def statistics(self):
+        '''Returns a dict with the store's object count and size, the number
+        of references to them, and the bytes saved by sharing them'''
+
+        objects = self.index["objects"].values()
+        store_bytes = sum(entry.get("size", 0) for entry in objects)
+        references = sum(len(entry["refs"]) for entry in objects)
+
+        # Without the store, every reference would be a full copy.
+        # With it, there's the stored object plus any references that
+        # had to fall back to copies.
+        bytes_without_store = sum(entry.get("size", 0) * len(entry["refs"]) for entry in objects)
+        bytes_with_store = store_bytes + sum(
+            entry.get("size", 0) * sum(1 for outcome in entry["refs"].values() if outcome == COPIED)
+            for entry in objects
+        )
+
+        return {
+            "objects": len(self.index["objects"]),
+            "store_bytes": store_bytes,
+            "references": references,
+            "bytes_saved": max(0, bytes_without_store - bytes_with_store),
+        }
+
+    def summary(self):
+        statistics = self.statistics()
+        return "Asset store: {} objects ({:.1f} MB) referenced {} times. {:.1f} MB saved".format(
+            statistics["objects"],
+            statistics["store_bytes"] / (1024 * 1024),
+            statistics["references"],
+            statistics["bytes_saved"] / (1024 * 1024),
+        )
@@ -0,0 +1,68 @@
+import bpy
+from pathlib import Path
+
+from .asset_store import AssetStore
+from .assembler_log import get_logger, LogSession
+
+
+log = get_logger("asset_store")
+
+
+
+class SWTOR_OT_asset_store_cleanup(bpy.types.Operator):
+
+    bl_idname = "swtor.asset_store_cleanup"
+    bl_label = "Clean Up Asset Store"
+    bl_description = "Deletes the assets in the Character Assembler's shared asset store\nthat no character folder uses anymore, and reports the disk space\nthe store is saving.\n\n• Requires setting the path to an asset store folder in this addon's Preferences"
+    bl_options = {'REGISTER'}
+
+    # Whether to just report the store's statistics
+    statistics_only: bpy.props.BoolProperty(
+        name="Statistics Only",
+        default = False,
+        options={'HIDDEN'}
+    )
+
+    @classmethod
+    def poll(cls,context):
+        asset_store_folderpath = context.preferences.addons[__package__].preferences.asset_store_folderpath
+        return bool(asset_store_folderpath) and Path(asset_store_folderpath).is_dir()
+
+
+    def execute(self, context):
+        bpy.context.window.cursor_set("WAIT")
+
+        swtor_preferences = context.preferences.addons[__package__].preferences
+        # Log at the level set in the Preferences
+        with LogSession(swtor_preferences.log_level):
+            store = AssetStore(
+                swtor_preferences.asset_store_folderpath,
+                swtor_preferences.swtor_resources_folderpath,
+                swtor_preferences.asset_store_key,
+                )
+
+            report_text = ""
+            if not self.statistics_only:
+                objects_deleted, bytes_freed = store.collect_garbage()
+                report_text = "{} unused assets deleted ({:.1f} MB freed). ".format(objects_deleted, bytes_freed / (1024 * 1024))
+            report_text += store.summary()
+
+            log.info(report_text)
+        bpy.context.window.cursor_set("DEFAULT")
+        self.report({'INFO'}, report_text)
+        return {'FINISHED'}
+
+
+# UI is set in preferences.py
+
+
+# Registrations
+
+def register():
+    bpy.utils.register_class(SWTOR_OT_asset_store_cleanup)
+
+def unregister():
+    bpy.utils.unregister_class(SWTOR_OT_asset_store_cleanup)
+
+if __name__ == "__main__":
+    register()
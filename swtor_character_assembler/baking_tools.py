@@ -2,6 +2,8 @@ import bpy
 import os
 from pathlib import Path
 
+from .dds_file import dds_dimensions
+
 
 def merge_material_nodes(source_material_name, destination_material_name):
     # Get the source and destination materials
@@ -194,11 +196,13 @@ class SWTOR_OT_baking_tools(bpy.types.Operator):
             nodes=mat.node_tree.nodes
             if "BAKED MATERIAL'S OUTPUT" in nodes:
                 
-                # Determine texturemap size
-                if "_d DiffuseMap" in nodes:
-                    tx_size = nodes["_d DiffuseMap"].width
-                else:
-                    tx_size = 1024
+                # Determine texturemap size (from the .dds file's header,
+                # not the node's width, without loading the image)
+                tx_size = 1024
+                if "_d DiffuseMap" in nodes and getattr(nodes["_d DiffuseMap"], "image", None):
+                    diffuse_image = nodes["_d DiffuseMap"].image
+                    dimensions = dds_dimensions(bpy.path.abspath(diffuse_image.filepath, library=diffuse_image.library))
+                    tx_size = dimensions[0] if dimensions else diffuse_image.size[0]
                     
                 # Create texturemap image and assign to baking target
                 tx_name = mat.name + "DIFFUSE"
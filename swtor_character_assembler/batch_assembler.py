@@ -0,0 +1,276 @@
+# Headless batch Character Assembler.
+#
+# Walks a folder tree of TORCommunity.com character exports, and
+# gathers, imports and saves each character found (each 'paths.json'
+# file) as a .blend file of its own, spreading the characters over
+# a pool of background Blender processes.
+#
+# Usage (everything after "--" is this script's arguments):
+#
+#     blender -b --python batch_assembler.py -- EXPORTS_FOLDER [options]
+#
+# Options:
+#     --output FOLDER    Where to save the .blend files (default: next to
+#                        each character's folder, named after it).
+#     --jobs N           Number of simultaneous Blender processes
+#                        (default: the number of CPU cores).
+#     --resources PATH   'resources' folder to use instead of the one
+#                        set in the add-on's preferences.
+#     --gather-only, --overwrite, --armor-only, --no-skeleton,
+#     --no-bind, --no-collect
+#                        Same as the Character Assembler's options.
+#
+# A 'batch_report.json' file with every character's outcome is saved
+# in the output folder (or in EXPORTS_FOLDER), and a summary printed.
+#
+# Internally, each character is processed by running Blender again
+# on this same script with a --character argument.
+
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import bpy
+import addon_utils
+
+
+ADDON_MODULE_NAME = Path(__file__).resolve().parent.name
+GR2_ADDON_MODULE_NAME = "io_scene_gr2"
+
+REPORT_FILENAME = "batch_report.json"
+LOGS_FOLDERNAME = "batch_logs"
+
+# Prefix of the line a worker prints its result as, for the orchestrator to pick up
+RESULT_LINE_PREFIX = "SWCA_BATCH_RESULT "
+
+
+# Aux Functions
+
+def parse_arguments():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    parser = argparse.ArgumentParser(
+        prog="blender -b --python batch_assembler.py --",
+        description="Assembles every TORCommunity.com character export in a folder tree into its own .blend file.",
+        )
+    parser.add_argument("exports_folder", nargs="?", help="Folder tree holding the characters' exports")
+    parser.add_argument("--output", help="Folder to save the .blend files in")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Number of simultaneous Blender processes")
+    parser.add_argument("--resources", help="'resources' folder to use instead of the add-on preferences' one")
+    parser.add_argument("--gather-only", action="store_true", help="Gather the assets without importing the characters")
+    parser.add_argument("--overwrite", action="store_true", help="Overwrite assets existing in the characters' folders")
+    parser.add_argument("--armor-only", action="store_true", help="Import the armor gear only")
+    parser.add_argument("--no-skeleton", action="store_true", help="Don't import the characters' skeletons")
+    parser.add_argument("--no-bind", action="store_true", help="Don't bind the characters' objects to their skeletons")
+    parser.add_argument("--no-collect", action="store_true", help="Don't collect the armor gear by in-game names")
+    parser.add_argument("--proxy-resolution", choices=("0", "2048", "1024", "512", "256"), default="0", help="Maximum texture resolution (0: full), for background characters")
+    # Internal: process a single character (used by the worker processes)
+    parser.add_argument("--character", help=argparse.SUPPRESS)
+    parser.add_argument("--blend", help=argparse.SUPPRESS)
+
+    return parser.parse_args(argv)
+
+
+def find_characters(exports_folder):
+    '''Returns the sorted list of 'paths.json' files in a folder tree'''
+
+    paths_jsons = []
+    for folderpath, _, filenames in os.walk(exports_folder):
+        if "paths.json" in filenames:
+            paths_jsons.append(str(Path(folderpath) / "paths.json"))
+    return sorted(paths_jsons)
+
+
+def character_name(paths_json_filepath):
+    # Same as the Character Assembler's naming of the character's Collection
+    return Path(paths_json_filepath).parent.parent.name
+
+
+def blend_filepath_for(paths_json_filepath, output_folder):
+    if output_folder:
+        return str( Path(output_folder) / (character_name(paths_json_filepath) + ".blend") )
+    return str( Path(paths_json_filepath).parent.parent.parent / (character_name(paths_json_filepath) + ".blend") )
+
+
+
+# Worker: a single character per Blender process
+
+def assemble_character(arguments):
+    '''Gathers, imports and saves a single character. Returns a result dict.'''
+
+    result = {
+        "character": character_name(arguments.character),
+        "paths_json": arguments.character,
+        "blend": None,
+        "status": "FAILED",
+        "message": "",
+    }
+
+    for module_name in (GR2_ADDON_MODULE_NAME, ADDON_MODULE_NAME):
+        if not addon_utils.check(module_name)[1]:
+            if addon_utils.enable(module_name, default_set=False) is None:
+                result["message"] = "The '{}' add-on couldn't be enabled".format(module_name)
+                return result
+
+    if arguments.resources:
+        bpy.context.preferences.addons[ADDON_MODULE_NAME].preferences.swtor_resources_folderpath = arguments.resources
+
+    # Start from an empty scene, keeping the user's preferences.
+    bpy.ops.wm.read_homefile(use_empty=True)
+
+    scene = bpy.context.scene
+    scene.swca_gather_only_bool = arguments.gather_only
+    scene.swca_dont_overwrite_bool = not arguments.overwrite
+    scene.swca_collect_bool = not arguments.no_collect
+    scene.swca_import_armor_only = arguments.armor_only
+    scene.swca_import_skeleton_bool = not arguments.no_skeleton
+    scene.swca_bind_to_skeleton_bool = not arguments.no_bind
+    scene.swca_proxy_resolution = arguments.proxy_resolution
+
+    try:
+        operator_result = bpy.ops.swtor.character_assembler(filepath=arguments.character)
+    except Exception as e:
+        result["message"] = "The Character Assembler failed: " + str(e)
+        return result
+
+    if operator_result != {"FINISHED"}:
+        result["message"] = "The Character Assembler was cancelled"
+        return result
+
+    if not arguments.gather_only:
+        if not bpy.data.objects:
+            result["message"] = "No objects were imported"
+            return result
+        os.makedirs(os.path.dirname(arguments.blend), exist_ok=True)
+        bpy.ops.wm.save_as_mainfile(filepath=arguments.blend)
+        result["blend"] = arguments.blend
+
+    result["status"] = "OK"
+    return result
+
+
+
+# Orchestrator: spreads the characters over worker processes
+
+def run_worker(paths_json_filepath, arguments, logs_folder):
+    '''Runs a background Blender process for a character. Returns a result dict.'''
+
+    blend_filepath = blend_filepath_for(paths_json_filepath, arguments.output)
+    log_filepath = str( Path(logs_folder) / (character_name(paths_json_filepath) + ".log") )
+
+    command = [
+        bpy.app.binary_path, "-b",
+        "--python", str(Path(__file__).resolve()),
+        "--",
+        "--character", paths_json_filepath,
+        "--blend", blend_filepath,
+    ]
+    if arguments.resources:
+        command += ["--resources", arguments.resources]
+    if arguments.proxy_resolution != "0":
+        command += ["--proxy-resolution", arguments.proxy_resolution]
+    for flag in ("gather_only", "overwrite", "armor_only", "no_skeleton", "no_bind", "no_collect"):
+        if getattr(arguments, flag):
+            command.append("--" + flag.replace("_", "-"))
+
+    start_time = time.perf_counter()
+    with open(log_filepath, "w") as log_file:
+        completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace")
+        log_file.write(completed.stdout)
+
+    result = None
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_LINE_PREFIX):
+            result = json.loads(line[len(RESULT_LINE_PREFIX):])
+    if result is None:
+        result = {
+            "character": character_name(paths_json_filepath),
+            "paths_json": paths_json_filepath,
+            "blend": None,
+            "status": "FAILED",
+            "message": "Blender exited with code {} without a result (crashed?)".format(completed.returncode),
+        }
+
+    result["seconds"] = round(time.perf_counter() - start_time, 2)
+    result["log"] = log_filepath
+    return result
+
+
+def run_batch(arguments):
+    if not arguments.exports_folder or not Path(arguments.exports_folder).is_dir():
+        print("ERROR: please pass a folder holding TORCommunity.com character exports.")
+        return 1
+
+    paths_jsons = find_characters(arguments.exports_folder)
+    if not paths_jsons:
+        print("No 'paths.json' files found in", arguments.exports_folder)
+        return 1
+
+    report_folder = arguments.output or arguments.exports_folder
+    logs_folder = Path(report_folder) / LOGS_FOLDERNAME
+    os.makedirs(logs_folder, exist_ok=True)
+
+    jobs = max(1, min(arguments.jobs, len(paths_jsons)))
+    print("=================================")
+    print("BATCH CHARACTER ASSEMBLER")
+    print("=================================")
+    print(len(paths_jsons), "characters found. Processing them in", jobs, "Blender processes.\n")
+
+    start_time = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(run_worker, paths_json, arguments, logs_folder) for paths_json in paths_jsons]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print("[{}/{}] {} - {} ({}s) {}".format(
+                len(results), len(paths_jsons), result["status"], result["character"], result["seconds"], result["message"]
+                ))
+
+    results.sort(key=lambda result: result["paths_json"])
+    succeeded = [result for result in results if result["status"] == "OK"]
+    failed = [result for result in results if result["status"] != "OK"]
+
+    report = {
+        "exports_folder": str(arguments.exports_folder),
+        "seconds": round(time.perf_counter() - start_time, 2),
+        "succeeded": len(succeeded),
+        "failed": len(failed),
+        "characters": results,
+    }
+    report_filepath = Path(report_folder) / REPORT_FILENAME
+    with open(report_filepath, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+
+    print()
+    print("BATCH DONE in {}s: {} characters succeeded, {} failed.".format(report["seconds"], len(succeeded), len(failed)))
+    if failed:
+        print("\nFailed characters (see their logs in {}):\n".format(logs_folder))
+        for result in failed:
+            print("     " + result["character"] + " - " + result["message"])
+    print("\nReport saved as", report_filepath)
+
+    return 0 if not failed else 2
+
+
+def main():
+    arguments = parse_arguments()
+
+    if arguments.character:
+        result = assemble_character(arguments)
+        print(RESULT_LINE_PREFIX + json.dumps(result))
+        return 0 if result["status"] == "OK" else 2
+
+    return run_batch(arguments)
+
+
+if __name__ == "__main__":
+    exit_code = main()
+    if bpy.app.background:
+        sys.exit(exit_code)
@@ -5,55 +5,229 @@ from bpy.types import Operator
 import os
 from pathlib import Path
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import json
-import xml.etree.ElementTree as ET
 
 
 from .addon_checks import requirements_checks
+from .gather_copier import copy_assets, DEFAULT_MAX_WORKERS
+from .asset_store import AssetStore
+from .gather_manifest import GatherManifest
+from .resources_index_refresh import get_resources_index
+from .path_resolver import PathResolver
+from .mat_cache import mat_cache
+from .gather_planner import get_skeleton_filepath, GatherPlan, iter_gather, plan_gather, summarize_textures
+from .assembler_log import get_logger, LogSession, JSON_LOG_FILENAME
+from .texture_memory import estimate_texture_memory, fit_texture_budget, MEGABYTE
+from .tor_archive import find_archives
+from .prefetcher import Prefetcher
+from .import_tracker import ImportTracker
+from .character_cache import CharacterCache, character_key, CACHE_FOLDERNAME
+from .mesh_registry import share_meshes
+from .asset_sources import (
+    TorSource, LocalFolderSource, OverlaySource,
+    make_source, parse_sources_list, get_tor_index, cache_folderpath, source_folderpath, make_resources_like,
+    )
 
 
 ADDON_ROOT = __file__.rsplit(__name__.rsplit(".")[0])[0] + __name__.rsplit(".")[0]
 
+MAT_CACHE_FILENAME = "mat_cache.json"
+
+# Texture resolutions to gather at. Lower ones are written without the
+# textures' largest mip levels (see dds_file.write_proxy_dds), so that
+# background characters take less time and memory to import. Gathering
+# again at another resolution replaces them.
+TEXTURE_RESOLUTION_ITEMS = [
+    ("0", "Full", "Gather the textures at their full resolution"),
+    ("2048", "2048 px", "Gather the textures without their mip levels larger than 2048 pixels"),
+    ("1024", "1024 px", "Gather the textures without their mip levels larger than 1024 pixels"),
+    ("512", "512 px", "Gather the textures without their mip levels larger than 512 pixels"),
+    ("256", "256 px", "Gather the textures without their mip levels larger than 256 pixels"),
+]
+
+# Failed files listed in the operator's report (the rest go to the console)
+MAX_REPORTED_FAILURES = 5
+
+log = get_logger("character_assembler")
+
 
 # Aux Functions
 
-def get_wrinkles_and_directionmaps(mat_file_abs_path):
-    '''Reads a shader .mat file and returns any DirectionMap
-    and WrinkleMap paths in an "as is" basis
-    (slashes, backslashes, initial ones or not…)'''
-    
-    relative_paths = []
-    with open(mat_file_abs_path, 'r') as mat_file:
-        tree = ET.parse(mat_file)
-        root = tree.getroot()
-
-        # The diverse camelCases are as per BioWare's horrific inconsistency.
-        # Same goes for initial backslash. For consistency, we add it if missing.
-        # backslash vs. slash is solved vía pathlib later on.
-
-        DirectionMap = root.find("./input/[semantic='DirectionMap']")
-        if DirectionMap != None:
-            texturemap_path = DirectionMap.find("value").text + ".dds"
-            if texturemap_path[0] != "\\":
-                texturemap_path = "\\" + texturemap_path
-            relative_paths.append(texturemap_path)
-
-        animatedWrinkleMap = root.find("./input/[semantic='animatedWrinkleMap']")
-        if animatedWrinkleMap != None:
-            texturemap_path = animatedWrinkleMap.find("value").text + ".dds"
-            if texturemap_path[0] != "\\":
-                texturemap_path = "\\" + texturemap_path
-            relative_paths.append(texturemap_path)
-
-        animatedWrinkleMask = root.find("./input/[semantic='animatedWrinkleMask']")
-        if animatedWrinkleMask != None:
-            texturemap_path = animatedWrinkleMask.find("value").text + ".dds"
-            if texturemap_path[0] != "\\":
-                texturemap_path = "\\" + texturemap_path
-            relative_paths.append(texturemap_path)
-
-    return(relative_paths)
+# Texture memory estimate of the last character gathered or estimated
+last_texture_estimate = {"character": None, "estimate": None}
+
+def get_datafiles_folderpath():
+    return Path(bpy.utils.user_resource('DATAFILES', path=__package__, create=True))
+
+def get_character_cache(swtor_preferences):
+    if not swtor_preferences.character_cache:
+        return None
+    return CharacterCache(get_datafiles_folderpath() / CACHE_FOLDERNAME)
+
+def get_tor_source(swtor_preferences):
+    """
+    If no valid 'resources' folder is set in the add-on's preferences
+    but a folder with the game's .tor archives is, returns the folder
+    their assets are extracted to on demand (a 'resources' folder of
+    sorts). Returns None otherwise.
+    """
+
+    if ( Path(swtor_preferences.swtor_resources_folderpath) / "art/shaders/materials").exists():
+        return None
+    tor_folderpath = swtor_preferences.swtor_tor_folderpath
+    if not tor_folderpath or not find_archives(tor_folderpath):
+        return None
+
+    # Make it pass for a 'resources' folder.
+    return make_resources_like(cache_folderpath(tor_folderpath, get_datafiles_folderpath(), "tor"))
+
+def get_sources_fallback(swtor_preferences):
+    """
+    If neither a valid 'resources' folder nor .tor archives are set in
+    the add-on's preferences, but additional asset sources are, returns
+    the local folder of the last of them (the base of their stack).
+    Returns None otherwise.
+    """
+
+    specs = parse_sources_list(swtor_preferences.asset_sources)
+    if not specs:
+        return None
+    try:
+        return source_folderpath(specs[-1], get_datafiles_folderpath())
+    except Exception as e:
+        log.error("The asset source %s can't be used: %s", specs[-1], e)
+        return None
+
+def get_asset_source(swtor_preferences, swtor_resources_folderpath, path_resolver=None):
+    """
+    Returns the asset_sources.AssetSource to gather a character's assets
+    from, as per the add-on's preferences: the additional sources stacked
+    over the 'resources' folder or the .tor archives (indexed if needed:
+    the first time, or after a game patch). Returns None if the assets
+    are just to be copied from a 'resources' folder.
+    """
+
+    datafiles_folderpath = get_datafiles_folderpath()
+
+    sources = []
+    for spec in parse_sources_list(swtor_preferences.asset_sources):
+        try:
+            sources.append(make_source(
+                spec,
+                datafiles_folderpath,
+                fix_path_casing = swtor_preferences.fix_path_casing,
+                http_connections = swtor_preferences.gather_threads,
+                ))
+        except Exception as e:
+            log.error("The asset source %s can't be used: %s", spec, e)
+
+    # The base of the stack
+    if swtor_resources_folderpath == get_tor_source(swtor_preferences):
+        tor_index = get_tor_index(swtor_preferences.swtor_tor_folderpath, datafiles_folderpath)
+        sources.append(TorSource(tor_index, swtor_resources_folderpath))
+    elif sources and sources[-1].swtor_resources_folderpath == swtor_resources_folderpath:
+        pass  # The last additional source is the base already (see get_sources_fallback).
+    elif sources:
+        sources.append(LocalFolderSource(swtor_resources_folderpath, path_resolver))
+    else:
+        return None
+
+    if len(sources) == 1:
+        return sources[0]
+    return OverlaySource(sources)
+
+def get_swtor_resources_folderpath(swtor_preferences):
+    """
+    Returns the 'resources' folder set in the add-on's preferences, if
+    valid. Else, the folder that the .tor archives' assets are extracted
+    to, if set, or the local folder of the additional asset sources, if
+    any. Returns None if there is none of those.
+    """
+
+    swtor_resources_folderpath = swtor_preferences.swtor_resources_folderpath
+    swtor_shaders_path = swtor_resources_folderpath + "/art/shaders/materials"
+    # Test the existence of the shaders subfolder to validate the SWTOR "resources" folder
+    if Path(swtor_shaders_path).exists() == False:
+        swtor_resources_folderpath = None
+        # Without one, extract what's needed from the game's archives, if set so.
+        tor_extraction_folderpath = get_tor_source(swtor_preferences)
+        if tor_extraction_folderpath:
+            swtor_resources_folderpath = tor_extraction_folderpath
+        else:
+            # Or fetch them from the additional asset sources only.
+            swtor_resources_folderpath = get_sources_fallback(swtor_preferences)
+    return swtor_resources_folderpath
+
+def get_path_resolver(swtor_preferences, swtor_resources_folderpath, resources_index=None):
+    """
+    Returns a PathResolver fixing the assets' paths' casing mismatches,
+    if set so in the add-on's preferences (from the 'resources' index if
+    any, or from a walk of the folder). Returns None otherwise.
+    """
+
+    if not swtor_preferences.fix_path_casing or swtor_resources_folderpath == get_tor_source(swtor_preferences):
+        return None
+    if resources_index:
+        return PathResolver.from_index(resources_index)
+    return PathResolver.from_walk(swtor_resources_folderpath)
+
+def read_texture_infos(gather_plan, asset_source=None, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Reads the headers of a gathering plan's textures at their origins
+    (see GatherPlan.texture_infos), fetching them from the asset source
+    first, if any (which sets the entries' origins to where the
+    source fetched them). It doesn't touch bpy.
+    """
+
+    if asset_source:
+        def fetch(entry):
+            try:
+                entry.origin = asset_source.fetch_local(entry.origin)
+            except Exception:
+                pass  # The copying will report it.
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(fetch, [entry for entry in gather_plan if entry.origin.lower().endswith(".dds")]))
+    return gather_plan.texture_infos()
+
+def estimate_textures(texture_infos, max_texture_size=0, budget_megabytes=0):
+    """
+    Returns the TextureMemoryEstimate of a list of (GatherEntry, DdsInfo).
+    If a budget is passed, the biggest textures are set to be gathered
+    at a proxy resolution first, for the estimate to fit it.
+    """
+
+    if budget_megabytes:
+        fit_texture_budget(texture_infos, budget_megabytes * MEGABYTE, max_texture_size)
+    return estimate_texture_memory(texture_infos, max_texture_size)
+
+def get_import_filepaths(paths_json_filepath, gather_plan=None):
+    """
+    Returns the files in a character's folder that the .gr2 Importer
+    reads when importing it, in about the order it reads them: the
+    gathering plan's models and textures, if there is one, or else
+    whatever models and textures the character's folder holds.
+    """
+
+    if gather_plan:
+        return [entry.destination for entry in gather_plan if entry.destination.lower().endswith((".gr2", ".dds"))]
+
+    models = []
+    textures = []
+    for folderpath, _, filenames in os.walk(Path(paths_json_filepath).parent):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(".gr2"):
+                models.append(os.path.join(folderpath, filename))
+            elif filename.lower().endswith(".dds"):
+                textures.append(os.path.join(folderpath, filename))
+    return models + textures
+
+def set_last_estimate(character_name, estimate):
+    # Shown in the Character Assembler's panel
+    last_texture_estimate["character"] = character_name
+    last_texture_estimate["estimate"] = estimate
 
 def place_black_dds(swtor_resources_folderpath):
 
@@ -61,17 +235,14 @@ def place_black_dds(swtor_resources_folderpath):
     black_dds_destination = Path(swtor_resources_folderpath) / "art/defaultassets/black.dds"
     
     if black_dds_destination.exists() == False:
-        print ("'black.dds' file missing in 'resources\\art\\defaultassets'. Placing a copy of the file \(included in this Addon\) there.")
-        print()
-        print()
+        log.info("'black.dds' file missing in 'resources\\art\\defaultassets'. Placing a copy of the file (included in this Addon) there.")
         try:
             shutil.copy2( str(black_dds_origin), str(black_dds_destination) )
         except Exception as e:
-            print("ERROR: Copying the 'black.dds' file to the resources folder failed:")
-            print(e)
-            print()
+            log.error("Copying the 'black.dds' file to the resources folder failed: %s", e, extra={"path": str(black_dds_destination)})
+            return False
 
-    return
+    return True
 
 def link_objects_to_collection(objects, destination_collection, create = True, move = False):
     """
@@ -175,6 +346,79 @@ def link_collections_to_collection(collections, destination_collection, create =
         return False
 
 
+def gather_assets(gathering, cancel_event=None):
+    """
+    Plans and copies a character's assets as set up by
+    SWTOR_OT_character_assembler.prepare_gathering(), updating the
+    gathering's progress and results. It doesn't touch bpy, so that
+    it can run in a background thread (see the modal Assembler).
+    If cancel_event is set, the gathering stops early.
+    """
+
+    gather_plan = gathering["gather_plan"]
+    resources_index = gathering["resources_index"]
+
+    # Plan the files to copy to the character folder while copying them:
+    # the planning (reading .mat files included) and the copying overlap.
+    # Entries are checked against the 'resources' index, if any,
+    # to tell missing assets apart. An overlay's entries are located in
+    # its base until fetched from whichever source has them, so only the
+    # fetching can tell.
+    check_index = resources_index if not isinstance(gathering["asset_source"], OverlaySource) else None
+    def planned_entries():
+        for entry in iter_gather(
+            gathering["filepath"],
+            gathering["swtor_resources_folderpath"],
+            resolver = gathering["path_resolver"],
+            plan = gather_plan,
+            complete_dependencies = gathering["complete_dependencies"],
+            ):
+            if check_index and not gather_plan.check_source(entry, check_index):
+                gathering["missing_entries"].append(entry)
+            gathering["planned"] += 1
+            yield entry
+        gathering["planning_done"] = True
+
+    def progress(files_done, files_queued):
+        gathering["done"] = files_done
+
+    try:
+        entries = planned_entries()
+
+        # Fitting a texture memory budget needs the whole plan first,
+        # to tell which textures are the biggest.
+        if gathering["texture_memory_budget"]:
+            entries = list(entries)
+            gathering["texture_estimate"] = estimate_textures(
+                read_texture_infos(gather_plan, gathering["asset_source"], gathering["max_workers"]),
+                gathering["max_texture_size"],
+                gathering["texture_memory_budget"],
+                )
+
+        gathering["errors_report"], gathering["copy_stats"] = copy_assets(
+            entries,
+            dont_overwrite = gathering["dont_overwrite"],
+            max_workers = gathering["max_workers"],
+            link_mode = gathering["link_mode"],
+            store = gathering["asset_store"],
+            manifest = gathering["gather_manifest"],
+            progress_callback = progress,
+            cancel_event = cancel_event,
+            source = gathering["asset_source"],
+            max_texture_size = gathering["max_texture_size"],
+            )
+    finally:
+        # The index's connections are per thread.
+        if resources_index:
+            resources_index.close()
+        if gathering["asset_source"]:
+            gathering["asset_source"].save()
+            gathering["asset_source"].close()
+        mat_cache.save()
+
+    return gathering
+
+
 
 
 
@@ -236,17 +480,16 @@ class SWTOR_OT_character_assembler(Operator):
         options={'HIDDEN'}
     )
 
-
-    def execute(self, context):
-        # Terminal's VT100 escape codes (most terminals understand them).
-        # See: http://www.climagic.org/mirrors/VT100_Escape_Codes.html
-        # (replacing ^[ in terminal codes with \033)
-        CLEAR_TERMINAL = '\033[2J'      # Clear entire screen.
-        CURSOR_HOME = '\033[H'          # Move cursor to upper left corner.
-        CLEAR_EOL = '\r\033[K'          # Erase to end of current line.
-        LINE_BACK_1ST_COL = '\033[F'    # Move cursor one line up, 1st column.
+    proxy_resolution: bpy.props.EnumProperty(
+        name="Texture Resolution",
+        description="Maximum resolution of the character's textures. Lower ones are meant for background characters",
+        items=TEXTURE_RESOLUTION_ITEMS,
+        default = "0",
+        options={'HIDDEN'}
+    )
 
 
+    def begin(self, context):
         # Sync properties with their UI matches
         self.gather_only = context.scene.swca_gather_only_bool
         self.dont_overwrite = context.scene.swca_dont_overwrite_bool
@@ -254,353 +497,443 @@ class SWTOR_OT_character_assembler(Operator):
         self.import_armor_only = context.scene.swca_import_armor_only
         self.import_skeleton = context.scene.swca_import_skeleton_bool
         self.bind_to_skeleton = context.scene.swca_bind_to_skeleton_bool
+        self.proxy_resolution = context.scene.swca_proxy_resolution
 
         # Get the extracted SWTOR assets' "resources" folder from the add-on's preferences. 
-        swtor_resources_folderpath = bpy.context.preferences.addons[__package__].preferences.swtor_resources_folderpath
-        swtor_shaders_path = swtor_resources_folderpath + "/art/shaders/materials"
-        # Test the existence of the shaders subfolder to validate the SWTOR "resources" folder
-        if Path(swtor_shaders_path).exists() == False:
-            # self.report({"WARNING"}, "Please check this add-on's preferences' path to the extracted assets 'resources' folder.")
-            # return {"CANCELLED"}
-            swtor_resources_folderpath = None
-
-
-        print(CLEAR_TERMINAL + CURSOR_HOME)
-        print("=================================")
-        print("CHARACTER FOLDER'S ASSETS LOCATOR")
-        print("=================================")
-        print()
-        print()
-
-        # Check for the existence of a "black.dds" file in resources/art/defaultassets and add one if missing
-        if swtor_resources_folderpath:
-            place_black_dds(swtor_resources_folderpath)
+        swtor_preferences = bpy.context.preferences.addons[__package__].preferences
+        swtor_resources_folderpath = get_swtor_resources_folderpath(swtor_preferences)
 
 
         if self.filepath.endswith("paths.json") == False:
             self.report({"WARNING"}, "The selected file isn't a 'path.json' file. Please select a correct one.")
-            return {"CANCELLED"}
-        
-        character_folder_name = Path(self.filepath).parent.parent.name
+            return False, None
 
-        body_coll_name_in_outliner = "BODY"
-        gear_coll_name_in_outliner = "GEAR"
+        context.workspace.status_text_set("Assembling the character in {}…".format(Path(self.filepath).parent.parent.name))
+        return True, swtor_resources_folderpath
 
 
-        if swtor_resources_folderpath:
+    def prepare_gathering(self, swtor_resources_folderpath):
+        """
+        Sets up everything the gathering needs that requires bpy, so that
+        gather_assets() can run in any thread. Returns the gathering's state.
+        """
 
-            # Building list of origins and destinations for copying. Each element is:
-            # [slotName, type of asset, origin, destination, some report text if needed]
-            
-            files_to_copy = []
+        swtor_preferences = bpy.context.preferences.addons[__package__].preferences
+
+        # Log at the level set in the Preferences, and to a file if set so
+        log_session = LogSession(
+            swtor_preferences.log_level,
+            str( Path(self.filepath).parent / JSON_LOG_FILENAME ) if swtor_preferences.log_to_file else None,
+            )
+        log.info("Gathering the character's assets listed in %s", self.filepath)
+
+        # Check for the existence of a "black.dds" file in resources/art/defaultassets and add one if missing
+        if not place_black_dds(swtor_resources_folderpath):
+            self.report({'WARNING'}, "The 'black.dds' file couldn't be placed in the resources folder. Check the console's output.")
+
+        resources_index = get_resources_index(swtor_preferences)
+
+        # Resolve the assets' paths' casing mismatches, if set so
+        path_resolver = get_path_resolver(swtor_preferences, swtor_resources_folderpath, resources_index)
+        if resources_index:
+            # Its connections are per thread: gather_assets() opens
+            # and closes its own, maybe in another thread.
+            resources_index.close()
+
+        # Assets in .tor archives, zip archives, servers or stacks of
+        # several places are fetched through an asset source.
+        asset_source = get_asset_source(swtor_preferences, swtor_resources_folderpath, path_resolver)
+        if asset_source:
+            path_resolver = asset_source
+
+        # Keep the .mat files' parsing cache between sessions, if set so
+        if swtor_preferences.mat_cache_on_disk:
+            mat_cache.set_cache_filepath(str( Path(bpy.utils.user_resource('DATAFILES', path=__package__, create=True)) / MAT_CACHE_FILENAME ))
+        else:
+            mat_cache.set_cache_filepath(None)
+
+        # Gather through the shared asset store if there is one
+        asset_store = None
+        if swtor_preferences.asset_store_folderpath:
+            asset_store = AssetStore(
+                swtor_preferences.asset_store_folderpath,
+                swtor_resources_folderpath,
+                swtor_preferences.asset_store_key,
+                )
+
+        # The record of previous gatherings lets us copy only what changed
+        gather_manifest = GatherManifest(Path(self.filepath).parent, use_hashes = swtor_preferences.gather_manifest_hashes)
+
+        return {
+            "filepath": self.filepath,
+            "swtor_resources_folderpath": swtor_resources_folderpath,
+            "dont_overwrite": self.dont_overwrite,
+            "max_workers": swtor_preferences.gather_threads,
+            "link_mode": swtor_preferences.gather_link_mode,
+            "max_texture_size": int(self.proxy_resolution),
+            "texture_memory_budget": swtor_preferences.texture_memory_budget,
+            "complete_dependencies": swtor_preferences.gather_complete_dependencies,
+            "resources_index": resources_index,
+            "path_resolver": path_resolver,
+            "asset_source": asset_source,
+            "asset_store": asset_store,
+            "gather_manifest": gather_manifest,
+            "gather_plan": GatherPlan(),
+            "log_session": log_session,
+            "missing_entries": [],
+            # Progress, updated as the gathering goes
+            "planned": 0,
+            "planning_done": False,
+            "done": 0,
+            # Results
+            "texture_estimate": None,
+            "errors_report": [],
+            "copy_stats": None,
+            "exception": None,
+            }
+
+
+    def report_gathering(self, gathering):
+        gather_plan = gathering["gather_plan"]
+        copy_stats = gathering["copy_stats"]
+        errors_report = gathering["errors_report"]
+        path_resolver = gathering["path_resolver"]
+
+        log.info("ASSETS GATHERING DONE!")
+        log.info(copy_stats.summary())
+        if gather_plan.duplicates:
+            log.info("%s repeated assets merged in the gathering plan.", gather_plan.duplicates)
+        # (Only the textures' headers are read.)
+        texture_infos = gather_plan.texture_infos(at_destinations = True)
+        log.info(summarize_textures(texture_infos))
+        texture_estimate = estimate_texture_memory(texture_infos)
+        if gathering["texture_estimate"]:
+            log.info("%s textures downscaled to fit the %s MB texture memory budget.", gathering["texture_estimate"].downscaled, gathering["texture_memory_budget"])
+        log.info(texture_estimate.summary() + ":\n" + texture_estimate.slots_report())
+        set_last_estimate(Path(self.filepath).parent.parent.name, texture_estimate)
+        log.info(mat_cache.summary())
+        if gather_plan.dependencies:
+            log.info(gather_plan.dependencies.summary())
+        if gathering["missing_entries"]:
+            log.warning("These assets are missing in the 'resources' folder (as per its index):\n\n" + "\n".join(
+                "     " + entry.slot_name + " - " + entry.asset_type + " - " + entry.origin for entry in gathering["missing_entries"]
+                ))
+        if gathering["asset_store"]:
+            log.info(gathering["asset_store"].summary())
+        if gathering["asset_source"]:
+            log.info(gathering["asset_source"].summary())
+        if path_resolver and path_resolver.corrections:
+            corrections_log_filepath = path_resolver.write_corrections_log(Path(self.filepath).parent)
+            log.info("%s asset paths' casing corrected. See %s", len(path_resolver.corrections), corrections_log_filepath)
+        log_session = gathering["log_session"]
+        if log_session.json_log_filepath:
+            log.info("Detailed log written to %s", log_session.json_log_filepath)
+        log.info("")
+        if errors_report:
+            log.error("Some files failed to be copied:\n\n" + "\n".join("     " + error_report for error_report in errors_report) +
+                "\n\nPlease check the console for their related error messages, and their entries in the 'paths.json' and/or related .mat files.")
             
-            with open(self.filepath, 'r') as file:
-                json_data = json.load(file)
-                
-                # Fill list of files to copy to character folder
-                
-                character_models_folderpath = str( Path(self.filepath).parent / "models" )
-                character_materials_folderpath = str( Path(self.filepath).parent / "materials" )
-                character_skeleton_folderpath = str( Path(self.filepath).parent / "skeleton" )
-                
-                for element in json_data:
-                    
-                    slotName = element["slotName"]
-                    
-                    if slotName != "skinMats":
-                        
-                        # NOT SKIN MATERIALS
-                        
-                        if "models" in element:
-                            models =  element["models"]
-                            if models:
-                                for model in models:
-                                    origin = str( Path(swtor_resources_folderpath) / Path(model[1:]) )
-                                    destination = str( Path(character_models_folderpath) / slotName / Path(model).name )
-                                    files_to_copy.append([slotName, "model", origin, destination, ""])
-                                
-                        if "materialInfo" in element:
-                            materialInfo = element["materialInfo"]
-                            
-                            if "matPath" in materialInfo:
-                                origin = str( Path(swtor_resources_folderpath) / Path(materialInfo["matPath"][1:]) )
-                                destination = str( Path(character_materials_folderpath) / slotName / Path(materialInfo["matPath"]).name )
-                                files_to_copy.append([slotName, "material definition", origin, destination, ""])
-                                
-                                additional_texturemaps = get_wrinkles_and_directionmaps(origin)
-                                if additional_texturemaps:
-                                    for additional_texturemap in additional_texturemaps:
-                                        origin = str( Path(swtor_resources_folderpath) / Path(additional_texturemap[1:]) )
-                                        destination = str( Path(character_materials_folderpath) / slotName / Path(additional_texturemap).name )
-                                        files_to_copy.append([slotName, "material definition", origin, destination, ""])
-
-                            if "ddsPaths" in materialInfo:
-                                ddsPaths = materialInfo["ddsPaths"]
-                                if ddsPaths:
-                                    for ddsPath in ddsPaths:
-                                        if ddsPaths[ddsPath].endswith(".dds"):
-                                            origin = str( Path(swtor_resources_folderpath) / Path(ddsPaths[ddsPath][1:]) )
-                                            destination = str( Path(character_materials_folderpath) / slotName / Path(ddsPaths[ddsPath]).name )
-                                            files_to_copy.append([slotName, "texture map", origin, destination, ""])
-
-                            if "eyeMatInfo" in materialInfo:
-                                if "ddsPaths" in materialInfo["eyeMatInfo"]:
-                                    ddsPaths = materialInfo["eyeMatInfo"]["ddsPaths"]
-                                    if ddsPaths:
-                                        for ddsPath in ddsPaths:
-                                            if ddsPaths[ddsPath].endswith(".dds"):
-                                                origin = str( Path(swtor_resources_folderpath) / Path(ddsPaths[ddsPath][1:]) )
-                                                destination = str( Path(character_materials_folderpath) / "eye" / Path(ddsPaths[ddsPath]).name )
-                                                files_to_copy.append(["eye", "texture map", origin, destination, ""])
-
-
-                    else:
-
-                        # SKIN MATERIALS (the dict hierarchy gets deeper and more confusing)
-                        
-                        if "materialInfo" in element:
-                            if "mats" in element["materialInfo"]:
-                                mats = element["materialInfo"]["mats"]
-                                for mat in mats:
-                                    mat_slotName = mat["slotName"]
-                                    
-                                    if "materialInfo" in mat:
-                                        mat_materialInfo = mat["materialInfo"]
-
-                                        if "matPath" in mat_materialInfo:
-                                            origin = str( Path(swtor_resources_folderpath) / Path(mat_materialInfo["matPath"][1:]) )
-                                            destination = str( Path(character_materials_folderpath) / slotName / mat_slotName / Path(mat_materialInfo["matPath"]).name )
-                                            files_to_copy.append([slotName + ": " + mat_slotName, "material definition", origin, destination, ""])
-                                
-                                            additional_texturemaps = get_wrinkles_and_directionmaps(origin)
-                                            if additional_texturemaps:
-                                                for additional_texturemap in additional_texturemaps:
-                                                    origin = str( Path(swtor_resources_folderpath) / Path(additional_texturemap[1:]) )
-                                                    destination = str( Path(character_materials_folderpath) / slotName / Path(additional_texturemap).name )
-                                                    files_to_copy.append([slotName, "material definition", origin, destination, ""])
-
-                                    if "ddsPaths" in mat:
-                                        mat_ddsPaths = mat["ddsPaths"]
-                                        if mat_ddsPaths:
-                                            for ddsPath in mat_ddsPaths:
-                                                if mat_ddsPaths[ddsPath].endswith(".dds"):
-                                                    origin = str( Path(swtor_resources_folderpath) / Path(mat_ddsPaths[ddsPath][1:]) )
-                                                    destination = str( Path(character_materials_folderpath) / slotName / mat_slotName / Path(mat_ddsPaths[ddsPath]).name )
-                                                    files_to_copy.append([slotName + ": " + mat_slotName, "texture map", origin, destination, ""])
-
-
-                # If there is a companion "skeleton.json" file, process it too.
-                skeleton_exists = False
-                skeleton_filepath = Path(self.filepath).parent / "skeleton.json"
+            # Summarize the failures in the report itself, too
+            failures_summary = "\n".join(errors_report[:MAX_REPORTED_FAILURES])
+            if len(errors_report) > MAX_REPORTED_FAILURES:
+                failures_summary += "\n(and {} more)".format(len(errors_report) - MAX_REPORTED_FAILURES)
+            self.report({'INFO'}, "Character's Assets copied to its folder. {} FILES FAILED TO BE COPIED! Check the console's output.\n".format(len(errors_report)) + copy_stats.summary() + "\n" + failures_summary )
+        else:
+            self.report({'INFO'}, "Character's Assets copied to its folder.\n" + copy_stats.summary() )
+        log_session.flush()
+
+
+
+    def execute(self, context):
+        is_valid, swtor_resources_folderpath = self.begin(context)
+        if not is_valid:
+            return {"CANCELLED"}
+
+        character_folder_name = Path(self.filepath).parent.parent.name
+
+        try:
+            if swtor_resources_folderpath:
+                gathering = self.prepare_gathering(swtor_resources_folderpath)
                 try:
-                    with open(skeleton_filepath, 'r') as skeleton_file:
-                        json_data = json.load(skeleton_file)
-                        if "path" in json_data:
-                            skeleton_model = json_data["path"]
-                            if skeleton_model:
-                                origin = str( Path(swtor_resources_folderpath) / Path(skeleton_model[1:]) )
-                                destination = str( Path(character_skeleton_folderpath) / Path(skeleton_model).name )
-                                files_to_copy.append(["Skeleton", "model", origin, destination, ""])
-                                skeleton_exists = True
-                except Exception as error:
-                    pass
-                
+                    gather_assets(gathering)
+                    self.report_gathering(gathering)
+                finally:
+                    gathering["log_session"].close()
+
+            # Importing objects if set so
+            if self.gather_only == False:
+                return self.run_import(swtor_resources_folderpath, character_folder_name, gathering["gather_plan"] if swtor_resources_folderpath else None)
+
+            return {'FINISHED'}
+        finally:
+            context.workspace.status_text_set(None)
+
+
+    def run_import(self, swtor_resources_folderpath, character_folder_name, gather_plan=None, prefetcher=None):
+        """
+        Imports the character: from the assembled characters' cache, if
+        set so and it holds it, or else through import_character(),
+        reading its files ahead and caching the result if set so.
+        Any errors and warnings logged meanwhile are added to the operator's report.
+        """
+
+        swtor_preferences = bpy.context.preferences.addons[__package__].preferences
+        with LogSession(swtor_preferences.log_level) as log_session:
+            result = self.load_or_import(swtor_resources_folderpath, character_folder_name, gather_plan, prefetcher)
+        if log_session.errors():
+            self.report({'ERROR'}, "\n".join(log_session.errors()))
+        if log_session.warnings():
+            self.report({'WARNING'}, "\n".join(log_session.warnings()))
+        return result
+
+
+    def load_or_import(self, swtor_resources_folderpath, character_folder_name, gather_plan=None, prefetcher=None):
+        # See run_import()
+        swtor_preferences = bpy.context.preferences.addons[__package__].preferences
+        character_cache = get_character_cache(swtor_preferences)
+        if character_cache:
+            cache_key = character_key(self.filepath, {
+                "collect": self.collect,
+                "import_armor_only": self.import_armor_only,
+                "import_skeleton": self.import_skeleton,
+                "bind_to_skeleton": self.bind_to_skeleton,
+                "blender": list(bpy.app.version),
+                })
+            cached_entry = character_cache.lookup(self.filepath, cache_key)
+            if cached_entry:
+                if prefetcher:
+                    prefetcher.stop()
+                if self.load_cached_character(*cached_entry, link = swtor_preferences.character_cache_mode == "LINK"):
+                    return {'FINISHED'}
+
+        if prefetcher is None:
+            prefetcher = self.start_prefetch(gather_plan)
+        try:
+            result = self.import_character(swtor_resources_folderpath, character_folder_name)
+        finally:
+            self.finish_prefetch(prefetcher)
 
+        if character_cache and result == {'FINISHED'}:
+            self.cache_character(character_cache, cache_key, character_folder_name)
+        return result
 
 
-                # Process list of files to copy to character folder
-                
-                errors_report = []
-                
-                if files_to_copy:
-                    for element in files_to_copy:
-                        body_part = element[0]
-                        asset_type = element[1]
-                        origin = element[2]
-                        destination = element[3]
-                        report = element[4]
-                        
-                        print(body_part, "-", asset_type, "\n",origin, "\n",destination)
-
-                        # If any of the destination folders doesn't exist, create it
-                        # ('eye', typically, plus any new one such as 'skeleton')
-                        if Path(destination).parent.exists() == False:
-                            try:
-                                os.makedirs(Path(destination).parent, mode=0o777, exist_ok=True) # mode required to make folders user-accessible
-                                # Path(destination).parent.makedirs(parents=False, exist_ok=True)
-                                print("Creating " + str(Path(destination).parent) + "folder.\n")
-                            except Exception as e:
-                                print("ERROR!!!--------: The folder ",destination," didn't exist and when trying to create it an error occurred:\n",e,"\n")
-                        
-                        if Path(destination).exists() == True and self.dont_overwrite == True:
-                            print("FILE ALREADY EXISTS IN DESTINATION. PRESERVED")
-                        else:
-                            # File copy as such:
-                            try:
-                                shutil.copy2(origin, destination)
-                                print("COPIED")
-                            except Exception as e:
-                                print("ERROR!!!-------- ", str(e))
-                                print()
-                                errors_report.append(body_part + " - " + asset_type + " - " + str(origin))
-                        
-                        print()
-                            
-            print("ASSETS GATHERING DONE!")
-            print()
-            if errors_report:
-                print("Some files failed to be copied:\n")
-                for error_report in errors_report:
-                    print("     " + error_report)
-                print("\nPlease check the console for their related error messages, and their entries in the 'paths.json' and/or related .mat files.")
-                
-                self.report({'INFO'}, "Character's Assets copied to its folder. SOME FILES FAILED TO BE COPIED! Check the console's output." )
-            else:
-                self.report({'INFO'}, "Character's Assets copied to its folder" )
-            
-            
-        
-        # Importing objects if set so
-        
-        if self.gather_only == False:
-            print("IMPORTING CHARACTER")
-            print("Importing and assembling the character assets")
-            print()
-
-            # We do a after-minus-before bpy.data.objects check to determine
-            # the objects resulting from the importing, as the addon doesn't
-            # return that information.
-            objects_before_importing = list(bpy.data.objects)
-            
-            # Calling Darth Atroxa's Character Importer in his .gr2 Importer Addon.
-            try:
+    def load_cached_character(self, entry_filepath, collection_name, link = False):
+        '''Appends (or links, through a Collection instance) a character's
+        Collection from its cache entry. Returns False if that failed.'''
+
+        try:
+            with bpy.data.libraries.load(entry_filepath, link = link) as (data_from, data_to):
+                if collection_name not in data_from.collections:
+                    log.warning("The cached character %s lacks its '%s' Collection. Importing it instead.", entry_filepath, collection_name, extra={"path": entry_filepath})
+                    return False
+                data_to.collections = [collection_name]
+        except Exception as e:
+            log.warning("The cached character %s couldn't be loaded (%s). Importing it instead.", entry_filepath, e, extra={"path": entry_filepath})
+            return False
+
+        collection = data_to.collections[0]
+        if collection is None:
+            return False
+
+        if link:
+            instance = bpy.data.objects.new(collection.name, None)
+            instance.instance_type = 'COLLECTION'
+            instance.instance_collection = collection
+            bpy.context.collection.objects.link(instance)
+        else:
+            bpy.context.collection.children.link(collection)
+
+        log.info("Character loaded from the assembled characters' cache:\n%s\n", entry_filepath)
+        log.info("DONE!")
+        self.report({'INFO'}, "Character {} from the assembled characters' cache".format("linked" if link else "appended"))
+        return True
+
+
+    def cache_character(self, character_cache, cache_key, collection_name):
+        '''Saves the just assembled character's Collection as a cache entry'''
+
+        collection = bpy.data.collections.get(collection_name)
+        if collection is None:
+            return
+
+        entry_filepath = character_cache.entry_filepath(cache_key)
+        try:
+            os.makedirs(character_cache.cache_folderpath, exist_ok=True)
+            # Absolute paths, so that the textures are found from the cache's folder
+            bpy.data.libraries.write(entry_filepath, {collection}, path_remap = 'ABSOLUTE', compress = True)
+            character_cache.record(self.filepath, cache_key, collection.name)
+            character_cache.save()
+        except Exception as e:
+            log.warning("The assembled character couldn't be cached (%s)", e)
+            return
+        log.info("Character saved to the assembled characters' cache:\n%s", entry_filepath)
+
+
+    def start_prefetch(self, gather_plan=None):
+        """
+        Starts reading the files the import will need ahead, in the
+        background, if set so in the Preferences. Returns the Prefetcher,
+        or None.
+        """
+
+        swtor_preferences = bpy.context.preferences.addons[__package__].preferences
+        if not swtor_preferences.prefetch_before_import:
+            return None
+        return Prefetcher(get_import_filepaths(self.filepath, gather_plan)).start()
+
+
+    def finish_prefetch(self, prefetcher):
+        if prefetcher:
+            prefetcher.stop()
+            log.info(prefetcher.summary() + "\n")
+
+
+    def import_character(self, swtor_resources_folderpath, character_folder_name):
+        '''Imports the character through the .gr2 Importer Add-on, binds it to
+        its skeleton and collects its objects. Must run in Blender's main thread.'''
+
+        body_coll_name_in_outliner = "BODY"
+        gear_coll_name_in_outliner = "GEAR"
+
+        log.info("Importing and assembling the character's assets")
+
+        # The addon doesn't return the objects resulting from the importing,
+        # so we track what gets created meanwhile (see import_tracker).
+        character_import = ImportTracker()
+
+        # Calling Darth Atroxa's Character Importer in his .gr2 Importer Addon.
+        try:
+            with character_import:
                 result = bpy.ops.import_mesh.gr2_json(filepath = str( self.filepath ))
-                print(result)
-                if result == {"CANCELLED"}:
-                    print(f"\n\nWARNING: .gr2 Importer Addon failed to import {self.filepath}\n\n")
-                else:
-                    print("\n\nCharacter's Path File successfully processed by the .gr2 Importer Add-on!\n\n")
-            except:
-                print(f"\n\nWARNING: the .gr2 Importer addon CRASHED while importing:\n{self.filepath}\n\n")
-                print("CANCELLING CHARACTER IMPORT")
-                report_text = "The .gr2 Importer Add-on crashed while processing this character's Path file. \nPlease check if any of its assets is missing. "
-                if swtor_resources_folderpath == None:
-                    report_text += "\nIf a SWTOR assets extraction's 'resources' folder is available, set it in this Add-on's Preferences and try again."
-                self.report({"WARNING"}, report_text)
-                return {"CANCELLED"}
-
-            objects_after_importing = list(bpy.data.objects)
-            
-            character_objects = list(set(objects_after_importing) - set(objects_before_importing))
+            log.debug("The .gr2 Importer Add-on returned %s", result)
+            if result == {"CANCELLED"}:
+                log.warning(".gr2 Importer Addon failed to import %s", self.filepath, extra={"path": self.filepath})
+            else:
+                log.info("Character's Path File successfully processed by the .gr2 Importer Add-on!")
+        except:
+            log.error("The .gr2 Importer addon CRASHED while importing %s. Cancelling the character's import.", self.filepath, exc_info=True, extra={"path": self.filepath})
+            report_text = "The .gr2 Importer Add-on crashed while processing this character's Path file. \nPlease check if any of its assets is missing. "
+            if swtor_resources_folderpath == None:
+                report_text += "\nIf a SWTOR assets extraction's 'resources' folder is available, set it in this Add-on's Preferences and try again."
+            self.report({"WARNING"}, report_text)
+            return {"CANCELLED"}
 
+        character_objects = character_import.objects
+        log.info("Character: " + character_import.summary())
 
-            # Importing skeleton, if any, using Atroxa's .gr2 Importer Addon.
-            if self.import_skeleton:
-                objects_before_importing = list(bpy.data.objects)
+        # Reuse the mesh data of identical gear imported before, if set so.
+        swtor_preferences = bpy.context.preferences.addons[__package__].preferences
+        if swtor_preferences.share_meshes:
+            log.info(share_meshes(character_objects, Path(self.filepath).parent).summary())
 
-                skeleton_filepath = str( Path(character_skeleton_folderpath) / Path(skeleton_model).name )
-                try:
+
+        # Importing skeleton, if any, using Atroxa's .gr2 Importer Addon.
+        skeleton_object = []
+        skeleton_filepath = get_skeleton_filepath(self.filepath)
+        if self.import_skeleton and skeleton_filepath:
+            skeleton_import = ImportTracker()
+
+            try:
+                with skeleton_import:
                     result = bpy.ops.import_mesh.gr2(filepath=skeleton_filepath)
-                    if result == "CANCELLED":
-                        print(f"\n\nWARNING: .gr2 Importer Addon failed to import {skeleton_filepath}\n\n")
-                        skeleton_exists = False
-                        skeleton_object = []
-                    else:
-                        print("\nSkeleton Object Imported\n")
-                        
-                        objects_after_importing = list(bpy.data.objects)
-                        
-                        skeleton_object = list(set(objects_after_importing) - set(objects_before_importing))[0]
-
-                        # Binding character's objects to skeleton
-                        if character_objects and self.bind_to_skeleton:
-                            for obj in character_objects:
-                                obj.parent = skeleton_object
-                                obj.parent_type = "ARMATURE"
-                                obj.matrix_parent_inverse = skeleton_object.matrix_world.inverted()
-                                skeleton_object.show_in_front = True
-                                
-                            print("Character's Objects Bound To Skeleton")
+                if result == "CANCELLED":
+                    log.warning(".gr2 Importer Addon failed to import %s", skeleton_filepath, extra={"path": skeleton_filepath})
+                    skeleton_object = []
+                else:
+                    log.info("Skeleton Object Imported")
                     
-                except:
-                    print(f"\n\nWARNING: the .gr2 Importer addon CRASHED while importing:\n{skeleton_filepath}\n\n")
-                    skeleton_exists = False
+                    skeleton_object = (skeleton_import.armatures or skeleton_import.objects)[0]
+
+                    # Binding character's objects to skeleton
+                    if character_objects and self.bind_to_skeleton:
+                        for obj in character_objects:
+                            obj.parent = skeleton_object
+                            obj.parent_type = "ARMATURE"
+                            obj.matrix_parent_inverse = skeleton_object.matrix_world.inverted()
+                            skeleton_object.show_in_front = True
+                            
+                        log.info("Character's Objects Bound To Skeleton")
                 
+            except:
+                log.error("The .gr2 Importer addon CRASHED while importing %s", skeleton_filepath, exc_info=True, extra={"path": skeleton_filepath})
+                skeleton_object = []
             
-            # identify what's armor and what's body parts
-            armor_slots = ["face", "chest", "bracer", "hand", "waist", "leg", "boot"]
-            armor_gear_objects = []
-            body_parts_objects = []
-            for obj in character_objects:
-                if (
-                    "underwear" in obj.name
-                    or "naked" in obj.name
-                    or (obj.name.split("_")[0] not in armor_slots)
-                    ):
-                    body_parts_objects.append(obj)
-                else:
-                    armor_gear_objects.append(obj)
+        
+        # identify what's armor and what's body parts
+        armor_slots = ["face", "chest", "bracer", "hand", "waist", "leg", "boot"]
+        armor_gear_objects = []
+        body_parts_objects = []
+        for obj in character_objects:
+            if (
+                "underwear" in obj.name
+                or "naked" in obj.name
+                or (obj.name.split("_")[0] not in armor_slots)
+                ):
+                body_parts_objects.append(obj)
+            else:
+                armor_gear_objects.append(obj)
 
 
-            # COLLECTIONING
+        # COLLECTIONING
+        
+        if self.import_skeleton:
+            if skeleton_object:
+                link_objects_to_collection(skeleton_object, character_folder_name, create = True, move = True)
+
+
+        if armor_gear_objects:
+            if self.collect:
+                # Parsing "preset.json" to get the in-game names for the armor, if any,
+                # and creating Collections with their names
+                # and moving the armor objects to them
+                character_preset_filepath = str( Path(self.filepath).parent / "preset.json" )
+                if Path(character_preset_filepath).exists():
+                    with open(character_preset_filepath, 'r') as preset_file:
+                        json_data = json.load(preset_file)
+                        armor_gear_collections = []
+                        for element in json_data:
+                            if "Gear" in element:
+                                if json_data[element] != None:
+                                    in_game_name = json_data[element]["name"]
+                                    objects_for_this_slot = []
+                                    for obj in armor_gear_objects:
+                                        if json_data[element]["slot"] in obj.name:
+                                            objects_for_this_slot.append(obj)
+                                    if objects_for_this_slot:
+                                        link_objects_to_collection(objects_for_this_slot, in_game_name, create = True, move = True)
+                                        link_collections_to_collection (in_game_name, gear_coll_name_in_outliner, create = True, move = True)
+                                        armor_gear_collections.append(bpy.data.collections[in_game_name])
+
+                        # Collect armor parts in collections, and collect those in G
+                        if armor_gear_collections:
+                            link_collections_to_collection(gear_coll_name_in_outliner, character_folder_name, create = True, move = True)
+            else:
+                link_objects_to_collection(armor_gear_objects, character_folder_name, create = True, move = True)
+        else:
+            log.info("This character has no armor gear.")
             
-            # if skeleton_exists and self.import_skeleton:
-            if self.import_skeleton:
-                if skeleton_object:
-                    link_objects_to_collection(skeleton_object, character_folder_name, create = True, move = True)
-
 
-            if armor_gear_objects:
+        if body_parts_objects:
+            if self.import_armor_only:
+                for obj in body_parts_objects:
+                    bpy.data.objects.remove(obj)
+            else:
                 if self.collect:
-                    # Parsing "preset.json" to get the in-game names for the armor, if any,
-                    # and creating Collections with their names
-                    # and moving the armor objects to them
-                    character_preset_filepath = str( Path(self.filepath).parent / "preset.json" )
-                    if Path(character_preset_filepath).exists():
-                        with open(character_preset_filepath, 'r') as preset_file:
-                            json_data = json.load(preset_file)
-                            armor_gear_collections = []
-                            for element in json_data:
-                                if "Gear" in element:
-                                    if json_data[element] != None:
-                                        in_game_name = json_data[element]["name"]
-                                        objects_for_this_slot = []
-                                        for obj in armor_gear_objects:
-                                            if json_data[element]["slot"] in obj.name:
-                                                objects_for_this_slot.append(obj)
-                                        if objects_for_this_slot:
-                                            link_objects_to_collection(objects_for_this_slot, in_game_name, create = True, move = True)
-                                            link_collections_to_collection (in_game_name, gear_coll_name_in_outliner, create = True, move = True)
-                                            armor_gear_collections.append(bpy.data.collections[in_game_name])
-
-                            # Collect armor parts in collections, and collect those in G
-                            if armor_gear_collections:
-                                link_collections_to_collection(gear_coll_name_in_outliner, character_folder_name, create = True, move = True)
+                    link_objects_to_collection(body_parts_objects, body_coll_name_in_outliner, create = True, move = True)
+                    link_collections_to_collection(body_coll_name_in_outliner, character_folder_name, create = True, move = True)
                 else:
-                    link_objects_to_collection(armor_gear_objects, character_folder_name, create = True, move = True)
-            else:
-                print("\nThis character has no armor gear.\n")
-                
+                    link_objects_to_collection(body_parts_objects, character_folder_name, create = True, move = True)
+        else:
+            log.info("This character has no naked or default underwear body parts")
+
+        log.info("Character imported.")
 
-            if body_parts_objects:
-                if self.import_armor_only:
-                    for obj in body_parts_objects:
-                        bpy.data.objects.remove(obj)
-                else:
-                    if self.collect:
-                        link_objects_to_collection(body_parts_objects, body_coll_name_in_outliner, create = True, move = True)
-                        link_collections_to_collection(body_coll_name_in_outliner, character_folder_name, create = True, move = True)
-                    else:
-                        link_objects_to_collection(body_parts_objects, character_folder_name, create = True, move = True)
-            else:
-                print("\nThis character has no naked or default underwear body parts\n")
-                
-            print()
-            print("DONE!")
-            
         return {'FINISHED'}
 
 
+
+
     # File Browser for selecting paths.json file
     def invoke(self, context, event):
         context.window_manager.fileselect_add(self)
@@ -608,11 +941,221 @@ class SWTOR_OT_character_assembler(Operator):
 
 
 
+class SWTOR_OT_character_assembler_modal(SWTOR_OT_character_assembler):
+    bl_label = "SWTOR Character Assembler (Non-blocking)"
+    bl_idname = "swtor.character_assembler_modal"
+    bl_description = SWTOR_OT_character_assembler.bl_description + "\n\nThe assets are gathered in the background without freezing Blender,\nshowing the progress in the status bar. Esc cancels the gathering"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    _timer = None
+    _thread = None
+    _cancel_event = None
+    _gathering = None
+    _import_pending = False
+    _prefetcher = None
+    _swtor_resources_folderpath = None
+    _character_folder_name = ""
+
+
+    def execute(self, context):
+        is_valid, swtor_resources_folderpath = self.begin(context)
+        if not is_valid:
+            return {"CANCELLED"}
+
+        self._swtor_resources_folderpath = swtor_resources_folderpath
+        self._character_folder_name = Path(self.filepath).parent.parent.name
+
+        # Nothing to gather: import right away.
+        if not swtor_resources_folderpath:
+            context.workspace.status_text_set(None)
+            if self.gather_only:
+                return {'FINISHED'}
+            return self.run_import(swtor_resources_folderpath, self._character_folder_name)
+
+        self._gathering = self.prepare_gathering(swtor_resources_folderpath)
+        self._cancel_event = threading.Event()
+        self._import_pending = False
+
+        # Keep whatever the thread raises for the main thread to report.
+        # (The thread mustn't touch the operator itself, a bpy object.)
+        gathering = self._gathering
+        cancel_event = self._cancel_event
+        def run():
+            try:
+                gather_assets(gathering, cancel_event)
+            except Exception as e:
+                gathering["exception"] = e
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+        wm = context.window_manager
+        wm.progress_begin(0, 100)
+        self._timer = wm.event_timer_add(0.1, window=context.window)
+        wm.modal_handler_add(self)
+        context.workspace.status_text_set("Gathering the character's assets… (Esc to cancel)")
+        return {'RUNNING_MODAL'}
+
+
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS' and self._thread.is_alive():
+            self._cancel_event.set()
+            context.workspace.status_text_set("Cancelling the gathering of the character's assets…")
+            return {'RUNNING_MODAL'}
+
+        if event.type != 'TIMER':
+            # Let Blender's UI work normally meanwhile.
+            return {'PASS_THROUGH'}
+
+        gathering = self._gathering
+
+        if self._thread.is_alive():
+            planned = gathering["planned"]
+            done = gathering["done"]
+            # The gathering takes up to 90% of the progress, the importing the rest.
+            context.window_manager.progress_update(int(90 * done / planned) if planned else 0)
+            if not self._cancel_event.is_set():
+                context.workspace.status_text_set("Gathering the character's assets: {} of {} files{} (Esc to cancel)".format(
+                    done,
+                    planned,
+                    "" if gathering["planning_done"] else " found so far",
+                    ))
+            return {'PASS_THROUGH'}
+
+        if not self._import_pending:
+            # The gathering thread is done.
+            if gathering["exception"] is not None:
+                log.error("Gathering the character's assets failed: %s", gathering["exception"])
+                self.finish(context)
+                self.report({'ERROR'}, "Gathering the character's assets failed: " + str(gathering["exception"]))
+                return {'CANCELLED'}
+
+            self.report_gathering(gathering)
+
+            if gathering["copy_stats"].cancelled:
+                self.finish(context)
+                self.report({'WARNING'}, "Character's Assets gathering cancelled.\n" + gathering["copy_stats"].summary())
+                return {'CANCELLED'}
+
+            if self.gather_only:
+                self.finish(context)
+                return {'FINISHED'}
+
+            # Import in the next tick, so that the status bar
+            # gets redrawn before Blender blocks for it. The files
+            # can be read ahead meanwhile.
+            self._import_pending = True
+            self._prefetcher = self.start_prefetch(gathering["gather_plan"])
+            context.window_manager.progress_update(90)
+            context.workspace.status_text_set("Importing the character…")
+            return {'RUNNING_MODAL'}
+
+        self.finish(context)
+        prefetcher, self._prefetcher = self._prefetcher, None
+        return self.run_import(self._swtor_resources_folderpath, self._character_folder_name, gathering["gather_plan"], prefetcher)
+
+
+    def cancel(self, context):
+        # Called if Blender ends the operator (closing the file, etc.)
+        if self._thread:
+            self._cancel_event.set()
+            self._thread.join()
+        if self._prefetcher:
+            self._prefetcher.stop()
+            self._prefetcher = None
+        self.finish(context)
+
+
+    def finish(self, context):
+        if self._gathering:
+            self._gathering["log_session"].close()
+        wm = context.window_manager
+        if self._timer:
+            wm.event_timer_remove(self._timer)
+            self._timer = None
+            wm.progress_end()
+        context.workspace.status_text_set(None)
+
+
+
+
+class SWTOR_OT_estimate_texture_memory(Operator):
+    bl_label = "Estimate Texture Memory"
+    bl_idname = "swtor.estimate_texture_memory"
+    bl_description = "Estimates how much memory a character's textures will take once imported,\nper slot and in total, reading just their .dds files' headers.\nIt honors the Textures resolution setting and the texture memory budget\nset in this addon's Preferences. Nothing is copied or imported.\n\nSelect the character's 'paths.json' file"
+    bl_options = {'REGISTER'}
+
+    filepath: StringProperty(subtype='FILE_PATH')
+
+    def execute(self, context):
+        if self.filepath.endswith("paths.json") == False:
+            self.report({"WARNING"}, "The selected file isn't a 'path.json' file. Please select a correct one.")
+            return {"CANCELLED"}
+
+        swtor_preferences = bpy.context.preferences.addons[__package__].preferences
+        swtor_resources_folderpath = get_swtor_resources_folderpath(swtor_preferences)
+        if not swtor_resources_folderpath:
+            self.report({"WARNING"}, "Please check this add-on's preferences' path to the extracted assets 'resources' folder.")
+            return {"CANCELLED"}
+
+        with LogSession(swtor_preferences.log_level):
+            resources_index = get_resources_index(swtor_preferences)
+            path_resolver = get_path_resolver(swtor_preferences, swtor_resources_folderpath, resources_index)
+            asset_source = get_asset_source(swtor_preferences, swtor_resources_folderpath, path_resolver)
+            try:
+                gather_plan = plan_gather(
+                    self.filepath,
+                    swtor_resources_folderpath,
+                    asset_source or path_resolver,
+                    complete_dependencies = swtor_preferences.gather_complete_dependencies,
+                    )
+                texture_infos = read_texture_infos(gather_plan, asset_source, swtor_preferences.gather_threads)
+            finally:
+                if resources_index:
+                    resources_index.close()
+                if asset_source:
+                    asset_source.save()
+                    asset_source.close()
+                mat_cache.save()
+
+            texture_estimate = estimate_textures(
+                texture_infos,
+                int(context.scene.swca_proxy_resolution),
+                swtor_preferences.texture_memory_budget,
+                )
+            log.info(texture_estimate.summary() + ":\n" + texture_estimate.slots_report())
+
+        set_last_estimate(Path(self.filepath).parent.parent.name, texture_estimate)
+        self.report({'INFO'}, texture_estimate.summary())
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+
+class SWTOR_OT_clear_character_cache(Operator):
+    bl_label = "Clear Assembled Characters' Cache"
+    bl_idname = "swtor.clear_character_cache"
+    bl_description = "Deletes every assembled character saved in the Character Assembler's cache.\nThey'll be imported anew, and cached again, the next time"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        swtor_preferences = bpy.context.preferences.addons[__package__].preferences
+        with LogSession(swtor_preferences.log_level):
+            freed = CharacterCache(get_datafiles_folderpath() / CACHE_FOLDERNAME).clear()
+        self.report({'INFO'}, "Assembled characters' cache cleared ({:.1f} MB freed)".format(freed / MEGABYTE))
+        return {'FINISHED'}
+
+
+
 
 # REGISTRATIONS ---------------------------------------------
 
 classes = [
     SWTOR_OT_character_assembler,
+    SWTOR_OT_character_assembler_modal,
+    SWTOR_OT_estimate_texture_memory,
+    SWTOR_OT_clear_character_cache,
 ]
 
 def register():
@@ -655,6 +1198,19 @@ def register():
         default = True,
     )
 
+    bpy.types.Scene.swca_proxy_resolution = bpy.props.EnumProperty(
+        name="Texture Resolution",
+        description="Maximum resolution of the character's textures, for background characters\n(crowds, layouts) to import faster and use less memory. The textures' larger\nmip levels are dropped without re-encoding them. Textures without mip levels\nare copied whole. Gathering again at 'Full' restores the full resolution",
+        items=TEXTURE_RESOLUTION_ITEMS,
+        default = "0",
+    )
+
+    bpy.types.Scene.swca_non_blocking_bool = bpy.props.BoolProperty(
+        name="Don't Block Blender",
+        description="Gather the assets in the background, showing the progress in the status bar,\nwithout freezing Blender. Pressing Esc cancels the gathering.\nThe importing still blocks Blender while it lasts",
+        default = False,
+    )
+
 
 def unregister():
     for cls in reversed(classes):
@@ -665,6 +1221,8 @@ def unregister():
     del bpy.types.Scene.swca_collect_bool
     del bpy.types.Scene.swca_import_skeleton_bool
     del bpy.types.Scene.swca_bind_to_skeleton_bool
+    del bpy.types.Scene.swca_proxy_resolution
+    del bpy.types.Scene.swca_non_blocking_bool
 
 
 if __name__ == "__main__":
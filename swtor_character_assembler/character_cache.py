@@ -0,0 +1,157 @@
+# Cache of assembled characters, as .blend files.
+#
+# Importing a fully geared character (the .gr2 Importer building its
+# objects and materials, then the Assembler binding and collecting
+# them) takes tens of seconds, and comes out the same every time for
+# the same inputs. With the cache on, each assembled character's
+# Collection is saved to a .blend file, and importing it again appends
+# (or links) that Collection through bpy.data.libraries.load instead.
+#
+# Cache layout:
+#     <cache>/<key>.blend
+#     <cache>/character_cache_index.json
+#
+# An entry's key is a hash of everything the result depends on: the
+# character's 'paths.json', 'skeleton.json' and 'preset.json' files,
+# its gathering manifest (which changes whenever any gathered asset
+# does), and the import options. Any change makes for a new key, and
+# the index, which keeps each character folder's current key, lets the
+# superseded entry be deleted.
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender. Writing and loading the .blend files is
+# character_assembler's job.
+
+
+import os
+import json
+import hashlib
+import threading
+
+from .gather_manifest import MANIFEST_FILENAME
+from .assembler_log import get_logger
+
+
+log = get_logger("character_cache")
+
+
+CACHE_FOLDERNAME = "character_cache"
+INDEX_FILENAME = "character_cache_index.json"
+
+# Files next to 'paths.json' that an assembled character depends on
+INPUT_FILENAMES = ("paths.json", "skeleton.json", "preset.json")
+
+
+def character_key(paths_json_filepath, options=None):
+    '''Returns the cache key of a character: a hash of its input files,
+    its gathering manifest, and a dict of import options'''
+
+    character_folderpath = os.path.dirname(os.path.abspath(paths_json_filepath))
+    digest = hashlib.sha256()
+
+    for filename in INPUT_FILENAMES:
+        digest.update(filename.encode("utf-8") + b"\0")
+        try:
+            with open(os.path.join(character_folderpath, filename), "rb") as input_file:
+                digest.update(input_file.read())
+        except OSError:
+            digest.update(b"(missing)")
+        digest.update(b"\0")
+
+    # The manifest's entries' order depends on the gathering threads.
+    digest.update(MANIFEST_FILENAME.encode("utf-8") + b"\0")
+    try:
+        with open(os.path.join(character_folderpath, MANIFEST_FILENAME), "r") as manifest_file:
+            manifest = json.load(manifest_file)
+        digest.update(json.dumps(manifest, sort_keys=True).encode("utf-8"))
+    except (OSError, ValueError):
+        digest.update(b"(missing)")
+    digest.update(b"\0")
+
+    digest.update(json.dumps(options or {}, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+class CharacterCache:
+    '''Folder of assembled characters' .blend files, indexed by
+    character folder. Call save() after recording entries.'''
+
+    def __init__(self, cache_folderpath):
+        self.cache_folderpath = str(cache_folderpath)
+        self.index_filepath = os.path.join(self.cache_folderpath, INDEX_FILENAME)
+
+        self._lock = threading.Lock()
+        # Character folder → {"key", "collection"}
+        self.index = {}
+        if os.path.isfile(self.index_filepath):
+            try:
+                with open(self.index_filepath, "r") as index_file:
+                    self.index = json.load(index_file)
+            except Exception as e:
+                log.warning("The character cache's index couldn't be read. Its entries will be rebuilt: %s", e)
+
+    @staticmethod
+    def _character(paths_json_filepath):
+        return os.path.normcase(os.path.dirname(os.path.abspath(paths_json_filepath)))
+
+    def entry_filepath(self, key):
+        return os.path.join(self.cache_folderpath, key + ".blend")
+
+    def lookup(self, paths_json_filepath, key):
+        '''Returns the .blend file and Collection name of a character's
+        entry, as (filepath, collection name), or None if there's none
+        with that key'''
+
+        with self._lock:
+            record = self.index.get(self._character(paths_json_filepath))
+        if not record or record["key"] != key:
+            return None
+        entry_filepath = self.entry_filepath(key)
+        if not os.path.isfile(entry_filepath):
+            return None
+        return entry_filepath, record["collection"]
+
+    def record(self, paths_json_filepath, key, collection_name):
+        '''Records a character's entry (written to entry_filepath(key)),
+        deleting the one it supersedes, if any'''
+
+        character = self._character(paths_json_filepath)
+        with self._lock:
+            previous = self.index.get(character)
+            self.index[character] = {"key": key, "collection": collection_name}
+            keys_in_use = {record["key"] for record in self.index.values()}
+
+        if previous and previous["key"] not in keys_in_use:
+            try:
+                os.remove(self.entry_filepath(previous["key"]))
+                log.info("Removed the superseded cache entry %s", previous["key"])
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning("Couldn't remove the superseded cache entry %s: %s", previous["key"], e)
+
+    def save(self):
+        with self._lock:
+            os.makedirs(self.cache_folderpath, exist_ok=True)
+            with open(self.index_filepath + ".tmp", "w") as index_file:
+                json.dump(self.index, index_file, indent=1)
+            os.replace(self.index_filepath + ".tmp", self.index_filepath)
+
+    def clear(self):
+        '''Deletes every entry. Returns the number of bytes freed.'''
+
+        freed = 0
+        with self._lock:
+            if os.path.isdir(self.cache_folderpath):
+                for filename in os.listdir(self.cache_folderpath):
+                    if filename.endswith((".blend", ".blend1")):
+                        filepath = os.path.join(self.cache_folderpath, filename)
+                        try:
+                            size = os.path.getsize(filepath)
+                            os.remove(filepath)
+                            freed += size
+                        except OSError as e:
+                            log.warning("Couldn't remove %s: %s", filepath, e)
+            self.index = {}
+        self.save()
+        return freed
@@ -2,6 +2,12 @@ import bpy
 import os
 from pathlib import Path
 
+from .assembler_log import get_logger, LogSession
+from .dds_file import dds_dimensions
+
+
+log = get_logger("convert_to_legacy_materials")
+
 
 # -------------------------------------------------------------
 class SWTOR_OT_convert_to_legacy_materials(bpy.types.Operator):
@@ -21,6 +27,12 @@ class SWTOR_OT_convert_to_legacy_materials(bpy.types.Operator):
 
 
     def execute(self, context):
+        # Log at the level set in the Preferences
+        with LogSession(context.preferences.addons[__package__].preferences.log_level):
+            return self.convert(context)
+
+
+    def convert(self, context):
 
 
         # Append the Legacy materials from the auxiliary .blend file inside the Addon 
@@ -187,7 +199,7 @@ class SWTOR_OT_convert_to_legacy_materials(bpy.types.Operator):
                             legacy_inputs_names = {}
                             for n, input in enumerate(legacy_shader_nodegroup.inputs):
                                 legacy_inputs_names[input.name] = n
-                                print(input.name, n)
+                                log.debug("%s %s", input.name, n)
                                 
 
                             for prop in modern_shader_prop_names_to_legacy_fields:
@@ -224,10 +236,13 @@ class SWTOR_OT_convert_to_legacy_materials(bpy.types.Operator):
                     
                     # I use the existence of a "_d DiffuseMap" as a way to get
                     # the max texture map size SWTOR uses for this particular material. 
-                    if "_d DiffuseMap" in legacy_mat_nodes:
-                        size_ref = legacy_mat_nodes["_d DiffuseMap"].image.size[0]
-                    else:
-                        size_ref = 1024
+                    # Its size is read from its .dds file's header, as asking
+                    # the image for it would make Blender load it whole.
+                    size_ref = 1024
+                    if "_d DiffuseMap" in legacy_mat_nodes and legacy_mat_nodes["_d DiffuseMap"].image:
+                        diffuse_image = legacy_mat_nodes["_d DiffuseMap"].image
+                        dimensions = dds_dimensions(bpy.path.abspath(diffuse_image.filepath, library=diffuse_image.library))
+                        size_ref = dimensions[0] if dimensions else diffuse_image.size[0]
                         
                     bake_target_image = bpy.data.images.new(
                         name="BAKED-" + legacy_mat.name.replace(" - LGC", ""),
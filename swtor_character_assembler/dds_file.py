@@ -0,0 +1,299 @@
+# DirectDraw Surface (.dds) files' structure, read straight from their
+# bytes, without decoding any image data.
+#
+# A .dds file is a "DDS " magic number, a 124-byte header, optionally
+# a 20-byte DX10 extension header (if the pixel format's FourCC is
+# "DX10"), and then the image data: for each face (1, or 6 for cube
+# maps, or an array's count), every mip level, from the largest down.
+# With block-compressed formats (DXT1-5, BC4-7), each 4x4 pixels
+# block takes 8 or 16 bytes, so the size of every level can be told
+# from the header alone.
+#
+# That makes proxy-resolution copies cheap: write_proxy_dds drops the
+# largest mip levels by copying the header (with new dimensions and
+# mip count) and the smaller levels' bytes as they are.
+#
+# It also lets us learn textures' dimensions, formats and sizes without
+# loading them in Blender (which decodes the whole image): dds_info
+# reads just the headers, and keeps the results for the session (per
+# file, size and modification time).
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender.
+
+
+import os
+import struct
+import threading
+
+
+DDS_MAGIC = b"DDS "
+
+# Header fields' offsets (from the file's start)
+_HEIGHT_OFFSET = 12
+_WIDTH_OFFSET = 16
+_PITCH_OFFSET = 20
+_MIP_COUNT_OFFSET = 28
+
+_HEADER = struct.Struct("<4s7I44x")  # magic, size, flags, height, width, pitch or linear size, depth, mip count
+_PIXEL_FORMAT = struct.Struct("<2I4s5I")  # size, flags, FourCC, RGB bit count, R, G, B, A masks
+_CAPS = struct.Struct("<4I4x")  # caps, caps2, caps3, caps4
+_DX10_HEADER = struct.Struct("<5I")  # DXGI format, resource dimension, misc flag, array size, misc flags 2
+
+HEADER_SIZE = 4 + 124
+DX10_HEADER_SIZE = _DX10_HEADER.size
+
+# Header flags
+DDSD_PITCH = 0x8
+DDSD_MIPMAPCOUNT = 0x20000
+DDSD_LINEARSIZE = 0x80000
+DDSD_DEPTH = 0x800000
+
+# Pixel format flags
+DDPF_FOURCC = 0x4
+
+# Caps2 flags
+DDSCAPS2_CUBEMAP = 0x200
+DDSCAPS2_CUBEMAP_FACES = (0x400, 0x800, 0x1000, 0x2000, 0x4000, 0x8000)
+DDSCAPS2_VOLUME = 0x200000
+
+# DX10 header's misc flag
+DDS_RESOURCE_MISC_TEXTURECUBE = 0x4
+
+# Bytes per 4x4 block of block-compressed formats, by FourCC
+FOURCC_BLOCK_BYTES = {
+    b"DXT1": 8,
+    b"DXT2": 16,
+    b"DXT3": 16,
+    b"DXT4": 16,
+    b"DXT5": 16,
+    b"ATI1": 8,
+    b"BC4U": 8,
+    b"BC4S": 8,
+    b"ATI2": 16,
+    b"BC5U": 16,
+    b"BC5S": 16,
+}
+
+# Bytes per 4x4 block of block-compressed DXGI formats (BC1 to BC7)
+DXGI_BLOCK_BYTES = {
+    70: 8, 71: 8, 72: 8,  # BC1
+    73: 16, 74: 16, 75: 16,  # BC2
+    76: 16, 77: 16, 78: 16,  # BC3
+    79: 8, 80: 8, 81: 8,  # BC4
+    82: 16, 83: 16, 84: 16,  # BC5
+    94: 16, 95: 16, 96: 16,  # BC6H
+    97: 16, 98: 16, 99: 16,  # BC7
+}
+
+# Bits per pixel of the usual uncompressed DXGI formats
+DXGI_BITS_PER_PIXEL = {
+    2: 128,  # R32G32B32A32_FLOAT
+    10: 64,  # R16G16B16A16_FLOAT
+    24: 32,  # R10G10B10A2_UNORM
+    28: 32, 29: 32,  # R8G8B8A8_UNORM(_SRGB)
+    49: 16,  # R8G8_UNORM
+    61: 8,  # R8_UNORM
+    87: 32, 88: 32, 91: 32, 93: 32,  # B8G8R8A8/X8 (_SRGB)
+}
+
+
+class DdsError(Exception):
+    pass
+
+
+class DdsInfo:
+    '''What a .dds file's header tells about its image data'''
+
+    __slots__ = (
+        "width", "height", "depth", "mip_count", "fourcc", "dxgi_format",
+        "block_bytes", "bits_per_pixel", "faces", "flags", "data_offset",
+        )
+
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.depth = 1
+        self.mip_count = 1
+        self.fourcc = ""  # "DXT5", "DX10"… or "" if uncompressed
+        self.dxgi_format = 0  # Only for DX10 files
+        self.block_bytes = 0  # 0 if not block-compressed
+        self.bits_per_pixel = 0  # 0 if block-compressed or unknown
+        self.faces = 1  # Cube maps' faces, or array slices
+        self.flags = 0
+        self.data_offset = HEADER_SIZE
+
+    def __repr__(self):
+        return "DdsInfo({}x{}, {}, {} mips)".format(self.width, self.height, self.fourcc or "{} bpp".format(self.bits_per_pixel), self.mip_count)
+
+    @property
+    def is_supported(self):
+        '''Whether the data's layout is known (sizes can be computed)'''
+        return bool(self.block_bytes or self.bits_per_pixel) and self.depth == 1
+
+    def level_dimensions(self, level):
+        return max(1, self.width >> level), max(1, self.height >> level)
+
+    def level_size(self, level):
+        '''Size in bytes of one face's mip level'''
+
+        width, height = self.level_dimensions(level)
+        if self.block_bytes:
+            return max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * self.block_bytes
+        return (width * self.bits_per_pixel + 7) // 8 * height
+
+    def level_pitch(self, level):
+        '''Pitch (bytes per row) or, for block-compressed formats, linear size'''
+
+        width, _ = self.level_dimensions(level)
+        if self.block_bytes:
+            return self.level_size(level)
+        return (width * self.bits_per_pixel + 7) // 8
+
+    def data_size(self):
+        return self.faces * sum(self.level_size(level) for level in range(self.mip_count))
+
+
+def parse_dds_header(header_bytes):
+    '''Returns the DdsInfo of a .dds file's first bytes (at least
+    HEADER_SIZE, plus DX10_HEADER_SIZE for DX10 files). Raises
+    DdsError if they aren't a .dds file's.'''
+
+    if len(header_bytes) < HEADER_SIZE:
+        raise DdsError("Too short for a .dds file")
+    magic, size, flags, height, width, _, depth, mip_count = _HEADER.unpack_from(header_bytes, 0)
+    if magic != DDS_MAGIC or size != 124:
+        raise DdsError("Not a .dds file")
+    _, pixel_flags, fourcc, rgb_bit_count, _, _, _, _ = _PIXEL_FORMAT.unpack_from(header_bytes, 76)
+    _, caps2, _, _ = _CAPS.unpack_from(header_bytes, 108)
+
+    info = DdsInfo()
+    info.width = width
+    info.height = height
+    info.flags = flags
+    info.mip_count = max(1, mip_count) if flags & DDSD_MIPMAPCOUNT or mip_count > 1 else 1
+    if flags & DDSD_DEPTH or caps2 & DDSCAPS2_VOLUME:
+        info.depth = max(1, depth)
+    if caps2 & DDSCAPS2_CUBEMAP:
+        info.faces = sum(1 for face_flag in DDSCAPS2_CUBEMAP_FACES if caps2 & face_flag) or 6
+
+    if pixel_flags & DDPF_FOURCC:
+        info.fourcc = fourcc.decode("ascii", "replace").rstrip("\0")
+        if fourcc == b"DX10":
+            if len(header_bytes) < HEADER_SIZE + DX10_HEADER_SIZE:
+                raise DdsError("Truncated DX10 header")
+            dxgi_format, _, misc_flag, array_size, _ = _DX10_HEADER.unpack_from(header_bytes, HEADER_SIZE)
+            info.dxgi_format = dxgi_format
+            info.data_offset = HEADER_SIZE + DX10_HEADER_SIZE
+            info.faces = max(1, array_size) * (6 if misc_flag & DDS_RESOURCE_MISC_TEXTURECUBE else 1)
+            info.block_bytes = DXGI_BLOCK_BYTES.get(dxgi_format, 0)
+            info.bits_per_pixel = DXGI_BITS_PER_PIXEL.get(dxgi_format, 0)
+        else:
+            info.block_bytes = FOURCC_BLOCK_BYTES.get(fourcc, 0)
+    else:
+        info.bits_per_pixel = rgb_bit_count
+
+    return info
+
+
+def read_dds_header(filepath):
+    '''Returns the DdsInfo of a .dds file, reading only its headers'''
+
+    with open(filepath, "rb") as dds_file:
+        return parse_dds_header(dds_file.read(HEADER_SIZE + DX10_HEADER_SIZE))
+
+
+# Session cache of dds_info's results: path → (size, mtime, DdsInfo or None)
+_info_cache = {}
+_info_cache_lock = threading.Lock()
+
+
+def dds_info(filepath):
+    '''Returns the DdsInfo of a .dds file, or None if it can't be read
+    or isn't a .dds file. Results are cached until the file changes.'''
+
+    filepath = os.path.abspath(str(filepath))
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+
+    with _info_cache_lock:
+        cached = _info_cache.get(filepath)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+
+    try:
+        info = read_dds_header(filepath)
+    except (OSError, DdsError):
+        info = None
+    with _info_cache_lock:
+        _info_cache[filepath] = (stat.st_size, stat.st_mtime_ns, info)
+    return info
+
+
+def dds_dimensions(filepath):
+    '''Returns a .dds file's (width, height), or None if it can't be read'''
+
+    info = dds_info(filepath)
+    return (info.width, info.height) if info else None
+
+
+def clear_info_cache():
+    with _info_cache_lock:
+        _info_cache.clear()
+
+
+def proxy_levels_to_drop(info, max_size):
+    '''Number of top mip levels to drop for the largest dimension
+    to be max_size at most (keeping one level, at least)'''
+
+    levels_to_drop = 0
+    while levels_to_drop < info.mip_count - 1 and max(info.level_dimensions(levels_to_drop)) > max_size:
+        levels_to_drop += 1
+    return levels_to_drop
+
+
+def write_proxy_dds(origin, destination, max_size):
+    '''Writes a copy of a .dds file whose largest dimension is max_size
+    at most, by dropping its largest mip levels. Returns False without
+    writing anything if that's not possible or not needed: if the file
+    has no mips, is small enough already, or its layout is unknown
+    (volume textures, unusual formats), so that it is copied as is.'''
+
+    with open(origin, "rb") as origin_file:
+        header_bytes = origin_file.read(HEADER_SIZE + DX10_HEADER_SIZE)
+        try:
+            info = parse_dds_header(header_bytes)
+        except DdsError:
+            return False
+        if not info.is_supported:
+            return False
+        levels_to_drop = proxy_levels_to_drop(info, max_size)
+        if not levels_to_drop:
+            return False
+
+        origin_file.seek(0, 2)
+        if origin_file.tell() < info.data_offset + info.data_size():
+            return False  # Truncated or laid out differently
+
+        header = bytearray(header_bytes[:info.data_offset])
+        width, height = info.level_dimensions(levels_to_drop)
+        struct.pack_into("<I", header, _HEIGHT_OFFSET, height)
+        struct.pack_into("<I", header, _WIDTH_OFFSET, width)
+        struct.pack_into("<I", header, _MIP_COUNT_OFFSET, info.mip_count - levels_to_drop)
+        if info.flags & (DDSD_PITCH | DDSD_LINEARSIZE):
+            struct.pack_into("<I", header, _PITCH_OFFSET, info.level_pitch(levels_to_drop))
+
+        dropped_size = sum(info.level_size(level) for level in range(levels_to_drop))
+        kept_size = sum(info.level_size(level) for level in range(levels_to_drop, info.mip_count))
+
+        with open(destination, "wb") as destination_file:
+            destination_file.write(header)
+            face_offset = info.data_offset
+            for _ in range(info.faces):
+                origin_file.seek(face_offset + dropped_size)
+                destination_file.write(origin_file.read(kept_size))
+                face_offset += dropped_size + kept_size
+
+    return True
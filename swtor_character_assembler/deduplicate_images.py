@@ -0,0 +1,179 @@
+# Repeated character imports leave behind many Images (such as
+# "foo.dds.001") that load the same file as another Image, or a
+# byte-identical copy of it in another character's folder: each one
+# takes its own RAM and VRAM once displayed. Unlike the Materials and
+# Nodegroups deduplicators, this one doesn't go by names but by what
+# the Images hold:
+#
+# 1. Images loading the same file (same normalized absolute path).
+# 2. Among the rest, Images whose files (or packed data) are identical.
+#    Only those of equal size are hashed, so that most files are never
+#    read.
+#
+# Either way, only Images with the same color space and alpha settings
+# are merged, as SWTOR materials need some textures read as Non-Color.
+# Each group's users are remapped to one of its Images (user_remap),
+# and the rest are deleted.
+
+
+import os
+import hashlib
+
+import bpy
+
+from .gather_manifest import file_hash
+from .dds_file import dds_info
+from .texture_memory import decoded_memory
+
+
+def _settings(image):
+    return (image.colorspace_settings.name, image.alpha_mode)
+
+
+def _normalized_path(image):
+    return os.path.normcase(os.path.normpath(bpy.path.abspath(image.filepath)))
+
+
+def _contents_size(image):
+    '''Size of an Image's packed data or file, or None if unreadable'''
+
+    if image.packed_file:
+        return image.packed_file.size
+    try:
+        return os.path.getsize(_normalized_path(image))
+    except OSError:
+        return None
+
+
+def _contents_hash(image):
+    if image.packed_file:
+        return hashlib.sha1(image.packed_file.data).hexdigest()
+    try:
+        return file_hash(_normalized_path(image))
+    except OSError:
+        return None
+
+
+def pixel_memory(image):
+    '''Returns the bytes of an Image's pixels in RAM, and whether it
+    has them loaded: (bytes, True), or (estimated bytes, False) if it
+    hasn't (estimated from .dds files' headers, else 0)'''
+
+    if image.has_data:
+        width, height = image.size
+        return width * height * (16 if image.is_float else 4), True
+    if not image.packed_file:
+        info = dds_info(_normalized_path(image))
+        if info:
+            return decoded_memory(info), False
+    return 0, False
+
+
+def keeper_order(image):
+    # The most used one first (or, if tied, the one with the shortest name: the unsuffixed one, typically).
+    return (-image.users, len(image.name), image.name)
+
+
+def find_duplicate_images(images):
+    '''Returns a list of lists of Images holding the same pixels:
+    those loading the same file first, then those with identical
+    contents. Each list's first Image is the one to keep.'''
+
+    groups = []
+
+    # By path
+    by_path = {}
+    for image in images:
+        if image.packed_file:
+            by_path[("", image.name)] = [image]
+        else:
+            by_path.setdefault((_normalized_path(image),) + _settings(image), []).append(image)
+    for group in by_path.values():
+        group.sort(key=keeper_order)
+    groups.extend(group for group in by_path.values() if len(group) > 1)
+
+    # By contents, among one Image per path
+    by_size = {}
+    for group in by_path.values():
+        image = group[0]
+        size = _contents_size(image)
+        if size:
+            by_size.setdefault((size,) + _settings(image), []).append(group)
+
+    for candidates in by_size.values():
+        if len(candidates) < 2:
+            continue
+        by_hash = {}
+        for group in candidates:
+            contents_hash = _contents_hash(group[0])
+            if contents_hash:
+                by_hash.setdefault(contents_hash, []).append(group)
+        for same_contents in by_hash.values():
+            if len(same_contents) > 1:
+                # Merge the path groups' kept Images
+                groups.append(sorted((group[0] for group in same_contents), key=keeper_order))
+
+    return groups
+
+
+
+class SWTOR_OT_deduplicate_images(bpy.types.Operator):
+
+    bl_idname = "swtor.deduplicate_images"
+    bl_label = "Deduplicate Images"
+    bl_description = "Replaces all Images that load the same file, or identical files\n(such as the same texture in several characters' folders), or identical packed data,\nwith a single one of them, whatever their names, and deletes the rest.\nOnly Images with the same Color Space and Alpha settings are merged.\n\nThis operator affects all Images in the current Blender file\nand doesn't require a selection"
+    bl_options = {'REGISTER', "UNDO"}
+
+    @classmethod
+    def poll(cls,context):
+        if bpy.data.images:
+            return True
+        else:
+            return False
+
+
+    def execute(self, context):
+        bpy.context.window.cursor_set("WAIT")
+
+        # Linked Images can't be removed, and generated ones or
+        # render results don't come from files.
+        images = [
+            image for image in bpy.data.images
+            if not image.library and image.source == 'FILE' and image.type == 'IMAGE' and (image.filepath or image.packed_file)
+            ]
+
+        image_count_report = 0
+        freed_memory = 0
+        unloaded_memory = 0
+        for group in find_duplicate_images(images):
+            kept_image = group[0]
+            for image in group[1:]:
+                print("  Replace image '%s' with '%s'" % (image.name, kept_image.name))
+                memory, loaded = pixel_memory(image)
+                if loaded:
+                    freed_memory += memory
+                else:
+                    unloaded_memory += memory
+                image.user_remap(kept_image)
+                bpy.data.images.remove(image)
+                image_count_report += 1
+
+        bpy.context.window.cursor_set("DEFAULT")
+        self.report({'INFO'}, "{} duplicate Images replaced and deleted: {:.1f} MB of pixel memory freed, plus {:.1f} MB that unloaded ones would have taken".format(
+            image_count_report,
+            freed_memory / (1024 * 1024),
+            unloaded_memory / (1024 * 1024),
+            ))
+        return {'FINISHED'}
+
+
+# UI is set in ui.py
+
+
+# Registrations
+
+def register():
+    bpy.utils.register_class(SWTOR_OT_deduplicate_images)
+
+def unregister():
+    bpy.utils.unregister_class(SWTOR_OT_deduplicate_images)
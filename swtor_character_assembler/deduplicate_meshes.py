@@ -0,0 +1,213 @@
+# Unlike the Materials and Nodegroups deduplicators, which go by their
+# names' numbered suffixes, this one goes by the meshes' geometry, so
+# that it catches duplicates whatever their names (for example, the
+# same gear imported for several characters and then prefixed).
+#
+# Meshes are first grouped by their vertex, loop, polygon and UV layer
+# counts, which is free to read. Only meshes sharing those with another
+# one have their geometry read, in bulk through foreach_get into NumPy
+# arrays, and hashed: vertex positions, polygons' loop starts and
+# totals, loops' vertex indices, polygons' material indices, shape
+# keys' positions, UV coordinates and custom split normals.
+#
+# Vertex group weights are stored in the mesh too, so they decide how
+# a rigged object deforms, but Blender has no bulk access to them: they
+# are read vertex by vertex, so only meshes whose hashes match already,
+# and whose objects have vertex groups, have theirs compared. Meshes
+# with equal hashes and weights are merged into one.
+#
+# Objects keep the materials they had: if the kept mesh's materials
+# differ from their own, their material slots are set to link their
+# materials from the object instead.
+
+
+import hashlib
+
+import bpy
+import numpy as np
+
+from .mesh_registry import estimate_mesh_memory
+
+
+def _counts(mesh):
+    return (
+        len(mesh.vertices),
+        len(mesh.edges),
+        len(mesh.loops),
+        len(mesh.polygons),
+        len(mesh.uv_layers),
+        len(mesh.shape_keys.key_blocks) if mesh.shape_keys else 0,
+        )
+
+
+def _read(collection, attribute, dtype, length):
+    array = np.empty(length, dtype=dtype)
+    collection.foreach_get(attribute, array)
+    return array
+
+
+def _update_with_custom_normals(digest, mesh):
+    if not mesh.has_custom_normals:
+        return
+    loops = len(mesh.loops)
+    digest.update(b"custom normals")
+    if hasattr(mesh, "corner_normals"):  # Blender 4.1 and later
+        digest.update(_read(mesh.corner_normals, "vector", np.float32, loops * 3).tobytes())
+    else:
+        mesh.calc_normals_split()
+        digest.update(_read(mesh.loops, "normal", np.float32, loops * 3).tobytes())
+
+
+def geometry_hash(mesh):
+    '''Hash of a mesh's geometry and custom normals,
+    read in bulk with foreach_get'''
+
+    vertices = len(mesh.vertices)
+    loops = len(mesh.loops)
+    polygons = len(mesh.polygons)
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(_read(mesh.vertices, "co", np.float32, vertices * 3).tobytes())
+    digest.update(_read(mesh.polygons, "loop_start", np.int32, polygons).tobytes())
+    digest.update(_read(mesh.polygons, "loop_total", np.int32, polygons).tobytes())
+    digest.update(_read(mesh.polygons, "material_index", np.int32, polygons).tobytes())
+    digest.update(_read(mesh.loops, "vertex_index", np.int32, loops).tobytes())
+    for uv_layer in mesh.uv_layers:
+        digest.update(_read(uv_layer.data, "uv", np.float32, loops * 2).tobytes())
+    if mesh.shape_keys:
+        for key_block in mesh.shape_keys.key_blocks:
+            digest.update(_read(key_block.data, "co", np.float32, vertices * 3).tobytes())
+    _update_with_custom_normals(digest, mesh)
+    return digest.digest()
+
+
+def weights_hash(mesh):
+    '''Hash of a mesh's vertex group weights, or None if it has none.
+    Read vertex by vertex, so only meant for meshes whose geometry
+    hashes match another's.'''
+
+    # Each vertex's vertex group indices and weights, plus how many it
+    # has, so that the same weights on different vertices differ.
+    counts = np.empty(len(mesh.vertices), dtype=np.int32)
+    groups = []
+    weights = []
+    for index, vertex in enumerate(mesh.vertices):
+        count = counts[index] = len(vertex.groups)
+        if count:
+            groups.append(_read(vertex.groups, "group", np.int32, count))
+            weights.append(_read(vertex.groups, "weight", np.float32, count))
+    if not groups:
+        return None
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(counts.tobytes())
+    digest.update(np.concatenate(groups).tobytes())
+    digest.update(np.concatenate(weights).tobytes())
+    return digest.digest()
+
+
+def _split_by_weights(group, weighted_meshes):
+    # Meshes whose objects have no vertex groups don't deform by any
+    # weights they might hold, so theirs aren't read.
+    by_weights = {}
+    for mesh in group:
+        key = weights_hash(mesh) if mesh.as_pointer() in weighted_meshes else None
+        by_weights.setdefault(key, []).append(mesh)
+    return [same_weights for same_weights in by_weights.values() if len(same_weights) > 1]
+
+
+def find_duplicate_meshes(meshes, weighted_meshes=frozenset()):
+    '''Returns a list of lists of meshes with the same geometry.
+    weighted_meshes is the set of the as_pointer() of the meshes used
+    by objects with vertex groups, whose weights must match too.'''
+
+    by_counts = {}
+    for mesh in meshes:
+        by_counts.setdefault(_counts(mesh), []).append(mesh)
+
+    groups = []
+    for candidates in by_counts.values():
+        if len(candidates) < 2:
+            continue
+        by_hash = {}
+        for mesh in candidates:
+            by_hash.setdefault(geometry_hash(mesh), []).append(mesh)
+        for group in by_hash.values():
+            if len(group) > 1:
+                groups.extend(_split_by_weights(group, weighted_meshes))
+    return groups
+
+
+def replace_mesh(obj, mesh):
+    '''Gives an object another mesh, keeping the object's materials'''
+
+    materials = [slot.material for slot in obj.material_slots]
+    obj.data = mesh
+    if [slot.material for slot in obj.material_slots] != materials:
+        for slot, material in zip(obj.material_slots, materials):
+            slot.link = 'OBJECT'
+            slot.material = material
+
+
+
+class SWTOR_OT_deduplicate_meshes(bpy.types.Operator):
+
+    bl_idname = "swtor.deduplicate_meshes"
+    bl_label = "Deduplicate Meshes"
+    bl_description = "Replaces all Meshes that have the same geometry (vertex positions, polygons, material indices,\nUVs and shape keys), vertex group weights and custom normals with a single one of them, whatever their names, and deletes the rest,\nkeeping each Object's Materials.\n\nThis operator affects all Meshes in the current Blender file\nand doesn't require a selection"
+    bl_options = {'REGISTER', "UNDO"}
+
+    @classmethod
+    def poll(cls,context):
+        if bpy.data.meshes:
+            return True
+        else:
+            return False
+
+
+    def execute(self, context):
+        bpy.context.window.cursor_set("WAIT")
+
+        objects_by_mesh = {}
+        weighted_meshes = set()
+        for obj in bpy.data.objects:
+            if obj.type == 'MESH' and obj.data is not None:
+                objects_by_mesh.setdefault(obj.data.as_pointer(), []).append(obj)
+                if obj.vertex_groups:
+                    weighted_meshes.add(obj.data.as_pointer())
+
+        # Linked meshes can't be removed.
+        meshes = [mesh for mesh in bpy.data.meshes if not mesh.library]
+        duplicate_groups = find_duplicate_meshes(meshes, weighted_meshes)
+
+        mesh_count_report = 0
+        reclaimed_memory = 0
+        for group in duplicate_groups:
+            # Keep the most used one (or, if tied, the one with the shortest name: the unsuffixed one, typically).
+            group.sort(key=lambda mesh: (-mesh.users, len(mesh.name), mesh.name))
+            kept_mesh = group[0]
+            for mesh in group[1:]:
+                print("  Replace mesh '%s' with '%s'" % (mesh.name, kept_mesh.name))
+                for obj in objects_by_mesh.get(mesh.as_pointer(), []):
+                    replace_mesh(obj, kept_mesh)
+                if mesh.users:
+                    mesh.user_remap(kept_mesh)
+                reclaimed_memory += estimate_mesh_memory(mesh)
+                bpy.data.meshes.remove(mesh)
+                mesh_count_report += 1
+
+        bpy.context.window.cursor_set("DEFAULT")
+        self.report({'INFO'}, "{} duplicate Meshes replaced and deleted (~{:.1f} MB of RAM reclaimed)".format(mesh_count_report, reclaimed_memory / (1024 * 1024)))
+        return {'FINISHED'}
+
+
+# UI is set in ui.py
+
+
+# Registrations
+
+def register():
+    bpy.utils.register_class(SWTOR_OT_deduplicate_meshes)
+
+def unregister():
+    bpy.utils.unregister_class(SWTOR_OT_deduplicate_meshes)
@@ -0,0 +1,127 @@
+# Dependency closure of SWTOR models: .gr2 → .mat → .dds.
+#
+# 'paths.json' files list a character's models, materials and most of
+# their textures, but not everything: the .mat files hold more texture
+# inputs than the ddsPaths lists, and the models themselves name the
+# materials they were made with. Any asset missing from a character's
+# folder surfaces later as a failed (or crashing) .gr2 import.
+#
+# The resolver follows every reference:
+#
+# • .gr2 files store their materials' names as plain, NUL-terminated
+#   strings. Each one that matches a file in art/shaders/materials is
+#   a dependency. Scanning the file's strings rather than parsing its
+#   layout keeps working across the format's variants: the names that
+#   aren't materials' (meshes', bones'…) just don't match any file.
+#
+# • .mat files' texture inputs, all of them (see mat_scanner).
+#
+# The resolved graph is memoized by file path, modification time and
+# size through mat_cache (in memory, and optionally on disk between
+# sessions): each model's existing materials, and each material's
+# textures. Re-resolving a file that didn't change costs a stat and a
+# dict lookup, without checking its references' existence again, so
+# repeated characters and characters sharing gear resolve from cache.
+# (A model's materials are checked again only when the model changes:
+# if materials are added to the 'resources' folder later on, clear the
+# cache.)
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender.
+
+
+import os
+import re
+
+from .resources_index import normalize_path
+from .mat_cache import mat_cache
+from .assembler_log import get_logger
+
+
+log = get_logger("gather")
+
+
+MATERIALS_FOLDER = "\\art\\shaders\\materials\\"
+
+# NUL-terminated runs of printable ASCII, and which of them can be
+# material names
+_GR2_STRING = re.compile(rb"([\x20-\x7e]{3,128})\x00")
+_MATERIAL_NAME = re.compile(r"^[A-Za-z0-9_\-\.]+$")
+
+
+def scan_gr2_strings(gr2_filepath):
+    '''Returns the distinct NUL-terminated strings in a .gr2 file
+    that could be material names, in order of appearance'''
+
+    with open(gr2_filepath, "rb") as gr2_file:
+        contents = gr2_file.read()
+
+    names = []
+    seen = set()
+    for match in _GR2_STRING.finditer(contents):
+        name = match.group(1).decode("ascii")
+        if name not in seen and _MATERIAL_NAME.match(name):
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def material_path(material_name):
+    '''Path, as written in 'paths.json' files, of a material's .mat file'''
+
+    if material_name.lower().endswith(".mat"):
+        material_name = material_name[:-len(".mat")]
+    return MATERIALS_FOLDER + material_name + ".mat"
+
+
+class DependencyResolver:
+    '''Finds the .mat files a .gr2 model references. exists tells whether
+    an asset path (as written in 'paths.json' files) is in the 'resources'
+    folder or asset source; its answers are kept with the models'
+    materials in the cache (see above).'''
+
+    def __init__(self, exists, cache=mat_cache):
+        self.exists = exists
+        self.cache = cache
+        self._exists = {}
+        self.models_resolved = 0
+        self.models_scanned = 0
+        self.materials_found = 0
+
+    def _asset_exists(self, asset_path):
+        key = normalize_path(asset_path)
+        if key not in self._exists:
+            try:
+                self._exists[key] = bool(self.exists(asset_path))
+            except Exception as e:
+                log.warning("Couldn't check whether %s exists: %s", asset_path, e, extra={"path": asset_path})
+                self._exists[key] = False
+        return self._exists[key]
+
+    def model_materials(self, gr2_filepath):
+        '''Returns the paths (as written in 'paths.json' files) of the
+        existing .mat files a local .gr2 file references'''
+
+        try:
+            mat_paths = self.cache.get(gr2_filepath, self.existing_materials)
+        except Exception as e:
+            # The copying will report the missing or faulty .gr2 file.
+            log.warning("Couldn't read %s for its materials: %s", gr2_filepath, e, extra={"path": gr2_filepath})
+            return []
+
+        self.models_resolved += 1
+        self.materials_found += len(mat_paths)
+        return mat_paths
+
+    def existing_materials(self, gr2_filepath):
+        '''Scans a local .gr2 file for the existing .mat files it
+        references (see model_materials, which caches the results)'''
+
+        self.models_scanned += 1
+        mat_paths = [material_path(name) for name in scan_gr2_strings(gr2_filepath)]
+        return [mat_path for mat_path in mat_paths if self._asset_exists(mat_path)]
+
+    def summary(self):
+        return "Dependencies: {} models resolved ({} scanned, the rest from cache), {} materials found in them".format(
+            self.models_resolved, self.models_scanned, self.materials_found
+            )
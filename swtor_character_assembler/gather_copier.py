@@ -0,0 +1,410 @@
+# Asset copying engine for the Character Assembler's gathering phase.
+#
+# Copying is dispatched to a pool of threads: most of the time spent
+# copying a character's assets goes into waiting for the storage
+# (especially when the 'resources' folder lives in a network share),
+# so several copies in flight hide most of that latency. Entries can
+# come from a generator, so that copying overlaps with the planning.
+#
+# Instead of byte copies, the assets can be placed as links to their
+# 'resources' originals ("LINK" mode): a reflink (copy-on-write clone)
+# if the filesystem supports it, else a hardlink, else a symlink, and
+# only as a last resort a copy.
+#
+# For characters that don't need their full texture resolution (crowds,
+# layout work), .dds textures can be written at a proxy resolution
+# instead, without their largest mip levels (see dds_file).
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender.
+
+
+import os
+import sys
+import errno
+import shutil
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from .gather_manifest import UP_TO_DATE, EDITED, NOT_RECORDED
+from .dds_file import write_proxy_dds
+from .assembler_log import get_logger
+
+
+log = get_logger("gather")
+
+
+DEFAULT_MAX_WORKERS = 8
+
+# Copies queued per worker thread at most when copying from a generator
+PENDING_PER_WORKER = 4
+
+# Placement modes
+COPY_MODE = "COPY"
+LINK_MODE = "LINK"
+
+# Per-file outcomes
+COPIED = "COPIED"
+REFLINKED = "REFLINKED"
+HARDLINKED = "HARDLINKED"
+SYMLINKED = "SYMLINKED"
+PROXIED = "WRITTEN AT PROXY RESOLUTION"
+PRESERVED = "FILE ALREADY EXISTS IN DESTINATION. PRESERVED"
+EDITED_PRESERVED = "FILE EDITED IN THE CHARACTER'S FOLDER. PRESERVED"
+SKIPPED = "UNCHANGED SINCE LAST GATHERING. SKIPPED"
+FAILED = "ERROR"
+
+LINKED_OUTCOMES = (REFLINKED, HARDLINKED, SYMLINKED)
+
+
+class CopyStats:
+    '''Tallies of a gathering run, plus its throughput'''
+
+    __slots__ = ("copied", "linked", "proxied", "preserved", "skipped", "failed", "bytes_copied", "bytes_linked", "elapsed", "cancelled")
+
+    def __init__(self):
+        self.copied = 0
+        self.linked = 0
+        self.proxied = 0  # Counted as copied, too
+        self.preserved = 0
+        self.skipped = 0  # Unchanged since the last gathering
+        self.failed = 0
+        self.bytes_copied = 0
+        self.bytes_linked = 0  # Bytes that didn't need copying thanks to links
+        self.elapsed = 0.0
+        self.cancelled = False
+
+    @property
+    def files_done(self):
+        return self.copied + self.linked + self.preserved + self.skipped + self.failed
+
+    @property
+    def files_per_second(self):
+        return (self.copied + self.linked) / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def megabytes_per_second(self):
+        return self.bytes_copied / (1024 * 1024) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        summary = "{} files copied ({:.1f} MB), {} preserved, {} failed in {:.2f}s: {:.1f} files/s, {:.1f} MB/s".format(
+            self.copied,
+            self.bytes_copied / (1024 * 1024),
+            self.preserved,
+            self.failed,
+            self.elapsed,
+            self.files_per_second,
+            self.megabytes_per_second,
+        )
+        if self.skipped:
+            summary += ". {} files unchanged since the last gathering".format(self.skipped)
+        if self.linked:
+            summary += ". {} files linked ({:.1f} MB not copied)".format(self.linked, self.bytes_linked / (1024 * 1024))
+        if self.proxied:
+            summary += ". {} textures at proxy resolution".format(self.proxied)
+        if self.cancelled:
+            summary += ". CANCELLED before gathering every asset"
+        return summary
+
+
+def create_folders(folderpaths):
+    '''Creates any missing destination folders in a single pass
+    (before any copying starts, so that copying threads don't race
+    for them). Returns a list of (folderpath, error) for failures.'''
+
+    failures = []
+    for folderpath in sorted(set(str(folderpath) for folderpath in folderpaths)):
+        if os.path.isdir(folderpath):
+            continue
+        try:
+            os.makedirs(folderpath, mode=0o777, exist_ok=True) # mode required to make folders user-accessible
+            log.debug("Creating %s folder.", folderpath, extra={"path": folderpath})
+        except Exception as e:
+            log.error("The folder %s didn't exist and when trying to create it an error occurred: %s", folderpath, e, extra={"path": folderpath})
+            failures.append((folderpath, e))
+    return failures
+
+
+# Linking
+
+# Errors meaning "this filesystem (or pair of them) can't do that",
+# as opposed to problems with the file itself.
+_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV,
+    errno.EPERM,
+    errno.EINVAL,
+    errno.ENOTTY,
+    errno.ENOSYS,
+    errno.EOPNOTSUPP,
+    getattr(errno, "ENOTSUP", errno.EOPNOTSUPP),
+}
+
+# Windows' equivalents (invalid function, not same device,
+# not supported, privilege not held)
+_UNSUPPORTED_WINERRORS = {1, 17, 50, 1314}
+
+# Linux's FICLONE ioctl request code (_IOW(0x94, 9, int))
+_FICLONE = 0x40049409
+
+
+def reflink(origin, destination):
+    '''Clones a file copy-on-write (Btrfs, XFS, APFS…). Raises OSError
+    if the platform or filesystem doesn't support it.'''
+
+    if sys.platform.startswith("linux"):
+        import fcntl
+        try:
+            with open(origin, "rb") as origin_file, open(destination, "wb") as destination_file:
+                fcntl.ioctl(destination_file.fileno(), _FICLONE, origin_file.fileno())
+        except OSError:
+            if os.path.exists(destination):
+                os.remove(destination)
+            raise
+        shutil.copystat(origin, destination)
+
+    elif sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(origin), os.fsencode(destination), 0) != 0:
+            error_number = ctypes.get_errno()
+            raise OSError(error_number, os.strerror(error_number), destination)
+
+    else:
+        raise OSError(errno.EOPNOTSUPP, "Reflinks aren't supported in this platform", destination)
+
+
+def _symlink(origin, destination):
+    os.symlink(os.path.abspath(origin), destination)
+
+
+_LINK_METHODS = (
+    (REFLINKED, reflink),
+    (HARDLINKED, os.link),
+    (SYMLINKED, _symlink),
+)
+
+# First linking method that worked for a given (origin's device,
+# destination folder), so that the rest of that folder's files
+# don't retry the ones that failed.
+_first_working_method = {}
+
+
+def link_asset(origin, destination):
+    '''Places a file as a reflink, a hardlink or a symlink to the
+    origin, in that order of preference, or as a copy if none
+    of those are possible. Returns the outcome.'''
+
+    origin_device = os.stat(origin).st_dev  # Raises if the origin is missing.
+    cache_key = (origin_device, os.path.dirname(destination))
+
+    for method_index in range(_first_working_method.get(cache_key, 0), len(_LINK_METHODS)):
+        outcome, method = _LINK_METHODS[method_index]
+        try:
+            method(origin, destination)
+        except NotImplementedError:
+            continue
+        except OSError as e:
+            if e.errno in _UNSUPPORTED_ERRNOS or getattr(e, "winerror", None) in _UNSUPPORTED_WINERRORS:
+                continue
+            raise
+        _first_working_method[cache_key] = method_index
+        return outcome
+
+    shutil.copy2(origin, destination)
+    return COPIED
+
+
+
+# Copying
+
+def copy_asset(origin, destination, dont_overwrite=True, link_mode=COPY_MODE, store=None, manifest=None, source=None, max_texture_size=0):
+    '''Copies (or links, see link_asset) a single asset file. If an
+    asset_store.AssetStore is passed, the file is placed from it instead.
+    If an asset_sources.AssetSource is passed, the origin is fetched
+    from it first. If max_texture_size is set, .dds files larger than
+    that are written without their largest mip levels (see dds_file).
+
+    If a gather_manifest.GatherManifest is passed, an existing file is
+    only replaced if its origin has changed since it was gathered, and
+    kept if it was edited since then unless dont_overwrite is False.
+    Files the manifest doesn't know about follow dont_overwrite.
+
+    Returns a (outcome, bytes copied or linked, error) tuple'''
+
+    if source:
+        try:
+            origin = source.fetch_local(origin)
+        except Exception as e:
+            return FAILED, 0, e
+
+    variant = None
+    if max_texture_size and destination.lower().endswith(".dds"):
+        variant = "proxy {}".format(max_texture_size)
+
+    if os.path.lexists(destination):
+        state = manifest.state(origin, destination, variant) if manifest else NOT_RECORDED
+        if state == UP_TO_DATE:
+            return SKIPPED, 0, None
+        if state == EDITED and dont_overwrite:
+            return EDITED_PRESERVED, 0, None
+        if state == NOT_RECORDED and dont_overwrite and os.path.exists(destination):
+            return PRESERVED, 0, None
+        # Remove what we are replacing instead of writing over it:
+        # if it's a link, writing would go through to the 'resources'
+        # original, and links can't be created over existing files.
+        try:
+            os.remove(destination)
+        except Exception as e:
+            return FAILED, 0, e
+
+    try:
+        if variant and write_proxy_dds(origin, destination, max_texture_size):
+            outcome = PROXIED
+        elif store:
+            outcome = store.place(origin, destination)
+        elif link_mode == LINK_MODE:
+            outcome = link_asset(origin, destination)
+        else:
+            shutil.copy2(origin, destination)
+            outcome = COPIED
+        if manifest:
+            manifest.record(origin, destination, variant)
+    except Exception as e:
+        return FAILED, 0, e
+    return outcome, os.path.getsize(destination), None
+
+
+def copy_assets(entries, dont_overwrite=True, max_workers=DEFAULT_MAX_WORKERS, folders=None, link_mode=COPY_MODE, store=None, manifest=None, progress_callback=None, cancel_event=None, source=None, max_texture_size=0):
+    '''Copies a gathering plan's entries (see gather_planner.GatherEntry)
+    concurrently. entries can be a list or a generator such as
+    gather_planner.iter_gather: copying starts as soon as the first entry
+    comes in, and the generator isn't asked for more while too many
+    copies are pending, so memory use stays flat.
+
+    folders is the set of destination folders to create first; if not
+    passed, they are created as the entries come in. link_mode can be
+    COPY_MODE or LINK_MODE (see link_asset). If an asset store is passed,
+    the entries are placed from it (see asset_store). If a gathering
+    manifest is passed, only new or changed assets are placed (see
+    copy_asset), and the manifest is saved once done. If an asset source
+    is passed, each entry's origin is fetched from it by the same worker
+    thread that copies it, so that fetches overlap too (see asset_sources).
+    If max_texture_size is set, textures are written at proxy resolution
+    (entries with a max_texture_size of their own use theirs).
+
+    progress_callback, if passed, is called with the numbers of files
+    done and of files queued so far after each file. If a
+    threading.Event is passed as cancel_event, setting it stops the
+    queueing of more files: the ones queued already are finished,
+    and stats.cancelled is set.
+
+    Returns an (errors_report, stats) tuple, errors_report being a list
+    of "slotName - type of asset - origin" strings in the entries' order.'''
+
+    stats = CopyStats()
+    start_time = time.perf_counter()
+
+    created_folders = set()
+    if folders is not None:
+        create_folders(folders)
+        created_folders.update(str(folderpath) for folderpath in folders)
+
+    max_workers = max(1, max_workers)
+    max_pending = max_workers * PENDING_PER_WORKER
+    results = queue.Queue()
+    pending = 0
+    queued = 0
+    failed_entries = []  # (index, entry)
+
+    def on_done(future, index, entry):
+        # Runs in the worker threads: it only passes the result on.
+        try:
+            result = future.result()
+        except Exception as e:
+            result = (FAILED, 0, e)
+        results.put((index, entry, result))
+
+    # Results are logged from this thread as they come,
+    # so that they are tallied in order.
+    def report(index, entry, result):
+        outcome, bytes_copied, error = result
+
+        if outcome in (COPIED, PROXIED):
+            stats.copied += 1
+            stats.bytes_copied += bytes_copied
+            if outcome == PROXIED:
+                stats.proxied += 1
+        elif outcome in LINKED_OUTCOMES:
+            stats.linked += 1
+            stats.bytes_linked += bytes_copied
+        elif outcome in (PRESERVED, EDITED_PRESERVED):
+            stats.preserved += 1
+        elif outcome == SKIPPED:
+            stats.skipped += 1
+        else:
+            stats.failed += 1
+            failed_entries.append((index, entry))
+
+        fields = {
+            "slot": entry.slot_name,
+            "asset_type": entry.asset_type,
+            "origin": entry.origin,
+            "destination": entry.destination,
+            "outcome": outcome,
+            "bytes": bytes_copied,
+            }
+        if outcome == FAILED:
+            log.error("%s - %s\n %s\n %s\nERROR: %s\n", entry.slot_name, entry.asset_type, entry.origin, entry.destination, error, extra=fields)
+        else:
+            log.debug("%s - %s\n %s\n %s\n%s\n", entry.slot_name, entry.asset_type, entry.origin, entry.destination, outcome, extra=fields)
+        if progress_callback:
+            progress_callback(stats.files_done, queued)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for index, entry in enumerate(entries):
+            if cancel_event is not None and cancel_event.is_set():
+                stats.cancelled = True
+                break
+
+            folderpath = os.path.dirname(entry.destination)
+            if folderpath not in created_folders:
+                create_folders([folderpath])
+                created_folders.add(folderpath)
+
+            # Wait for room before queueing more copies
+            while pending >= max_pending:
+                report(*results.get())
+                pending -= 1
+
+            entry_max_texture_size = max_texture_size if entry.max_texture_size is None else entry.max_texture_size
+            future = executor.submit(copy_asset, entry.origin, entry.destination, dont_overwrite, link_mode, store, manifest, source, entry_max_texture_size)
+            future.add_done_callback(lambda future, index=index, entry=entry: on_done(future, index, entry))
+            pending += 1
+            queued += 1
+
+            # Report whatever is done already, without waiting
+            while True:
+                try:
+                    finished = results.get_nowait()
+                except queue.Empty:
+                    break
+                report(*finished)
+                pending -= 1
+
+        while pending:
+            report(*results.get())
+            pending -= 1
+
+    if store:
+        store.save()
+    if manifest:
+        manifest.save()
+
+    stats.elapsed = time.perf_counter() - start_time
+
+    errors_report = []
+    for index, entry in sorted(failed_entries, key=lambda failed_entry: failed_entry[0]):
+        errors_report.append(entry.slot_name + " - " + entry.asset_type + " - " + str(entry.origin))
+
+    return errors_report, stats
@@ -0,0 +1,137 @@
+# Per-character gathering manifest.
+#
+# Every gathering writes a 'gather_manifest.json' file next to the
+# character's 'paths.json', recording for each gathered asset where
+# it came from and the state of both the 'resources' original and
+# the character folder's file at the time (size, modification time,
+# and optionally a hash of the contents).
+#
+# Later gatherings compare against it to copy only the assets that
+# changed in 'resources' (after a game patch, typically), and to tell
+# apart the files that the user has edited in the character folder,
+# which are kept unless overwriting is explicitly requested.
+#
+# Assets gathered as a variant of their original (such as textures
+# at proxy resolution) record it, so that gathering a different one
+# (back to full resolution, for example) replaces them.
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender.
+
+
+import os
+import json
+import hashlib
+import threading
+
+from .assembler_log import get_logger
+
+
+log = get_logger("gather")
+
+
+MANIFEST_FILENAME = "gather_manifest.json"
+MANIFEST_VERSION = 1
+
+# States of an already gathered asset
+NOT_RECORDED = "NOT_RECORDED"  # Not in the manifest (or no manifest).
+UP_TO_DATE = "UP_TO_DATE"
+SOURCE_CHANGED = "SOURCE_CHANGED"  # Changed in 'resources'.
+EDITED = "EDITED"  # Changed in the character's folder.
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(filepath):
+    '''Returns the SHA-1 hex digest of a file's contents'''
+
+    digest = hashlib.sha1()
+    with open(filepath, "rb") as file:
+        for chunk in iter(lambda: file.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GatherManifest:
+    '''A character folder's record of gathered assets. Thread-safe, so that
+    the gathering threads can check and record assets concurrently.
+    Call save() once done.'''
+
+    def __init__(self, character_folderpath, use_hashes=False):
+        self.character_folderpath = str(character_folderpath)
+        self.filepath = os.path.join(self.character_folderpath, MANIFEST_FILENAME)
+        self.use_hashes = use_hashes
+
+        self._lock = threading.Lock()
+        self.assets = {}
+        if os.path.isfile(self.filepath):
+            try:
+                with open(self.filepath, "r") as manifest_file:
+                    manifest = json.load(manifest_file)
+                if manifest.get("version") == MANIFEST_VERSION:
+                    self.assets = manifest.get("assets", {})
+            except Exception as e:
+                log.warning("The gathering manifest couldn't be read. All assets will be treated as new: %s", e)
+
+    def _key(self, destination):
+        return os.path.relpath(destination, self.character_folderpath).replace("\\", "/")
+
+    def state(self, origin, destination, variant=None):
+        '''Compares an existing destination file and its 'resources' origin
+        with their manifest record. Returns one of the states above.
+        Edits in the character's folder take precedence over changes
+        in 'resources'. A different variant than the recorded one counts
+        as a change in 'resources'.'''
+
+        record = self.assets.get(self._key(destination))
+        if not record:
+            return NOT_RECORDED
+
+        # The character folder's file is lstat-ed, so that a symlink's
+        # target changing in 'resources' doesn't count as an edit.
+        destination_stat = os.lstat(destination)
+        if (destination_stat.st_size, destination_stat.st_mtime_ns) != (record["size"], record["mtime"]):
+            if not (record.get("hash") and os.path.isfile(destination) and file_hash(destination) == record["hash"]):
+                return EDITED
+
+        try:
+            origin_stat = os.stat(origin)
+        except OSError:
+            # Let the copying fail and report it.
+            return SOURCE_CHANGED
+        if (
+            os.path.normcase(os.path.abspath(origin)) != os.path.normcase(record["source"])
+            or (origin_stat.st_size, origin_stat.st_mtime_ns) != (record["source_size"], record["source_mtime"])
+            ):
+            return SOURCE_CHANGED
+
+        if record.get("variant") != variant:
+            return SOURCE_CHANGED
+
+        return UP_TO_DATE
+
+    def record(self, origin, destination, variant=None):
+        '''Records a just gathered asset'''
+
+        origin_stat = os.stat(origin)
+        destination_stat = os.lstat(destination)
+        record = {
+            "source": os.path.abspath(origin),
+            "source_size": origin_stat.st_size,
+            "source_mtime": origin_stat.st_mtime_ns,
+            "size": destination_stat.st_size,
+            "mtime": destination_stat.st_mtime_ns,
+            "hash": file_hash(destination) if self.use_hashes else None,
+        }
+        if variant:
+            record["variant"] = variant
+        with self._lock:
+            self.assets[self._key(destination)] = record
+
+    def save(self):
+        '''Writes the manifest to the character's folder'''
+
+        with self._lock:
+            with open(self.filepath + ".tmp", "w") as manifest_file:
+                json.dump({"version": MANIFEST_VERSION, "assets": self.assets}, manifest_file, indent=1)
+            os.replace(self.filepath + ".tmp", self.filepath)
@@ -0,0 +1,425 @@
+# Gathering planner for the Character Assembler.
+#
+# Parses a TORCommunity.com character's 'paths.json' (and its companion
+# 'skeleton.json', if any) into a plan of asset files to copy from
+# the SWTOR 'resources' folder to the character's folder.
+#
+# Plans can be built whole (plan_gather) or streamed (iter_gather):
+# the latter yields entries as they are planned, so that copying can
+# start while later slots' .mat files are still being read.
+#
+# With complete_dependencies set, plans hold every asset the models
+# depend on, beyond the ones 'paths.json' lists: the materials the
+# .gr2 files reference, and every texture the .mat files reference
+# (see dependency_resolver). The models' materials are planned last,
+# so that an asset source's models are fetched by the copying threads
+# meanwhile, along with everything else, rather than by the planner.
+#
+# This module doesn't depend on bpy, so that planning can be tested
+# and benchmarked outside Blender.
+
+
+import os
+import json
+from pathlib import Path
+
+from .resources_index import normalize_path
+from .mat_cache import mat_cache
+from .mat_scanner import scan_mat_textures, get_wrinkles_and_directionmaps
+from .dds_file import dds_info
+from .dependency_resolver import DependencyResolver
+from .assembler_log import get_logger
+
+
+log = get_logger("gather")
+
+
+# Texture inputs in .mat files that 'paths.json' files don't list
+# (the diverse camelCases are as per BioWare's horrific inconsistency)
+ADDITIONAL_TEXTURE_SEMANTICS = ("DirectionMap", "animatedWrinkleMap", "animatedWrinkleMask")
+
+
+# Aux Functions
+
+def get_skeleton_model(paths_json_filepath):
+    '''Returns the skeleton's .gr2 path in 'resources' as written in
+    the 'skeleton.json' file next to a 'paths.json' one, or None'''
+
+    skeleton_json_filepath = Path(paths_json_filepath).parent / "skeleton.json"
+    try:
+        with open(skeleton_json_filepath, 'r') as skeleton_file:
+            json_data = json.load(skeleton_file)
+    except Exception:
+        return None
+    return json_data.get("path") or None
+
+
+def get_skeleton_filepath(paths_json_filepath):
+    '''Returns the path the skeleton's .gr2 file is gathered into
+    inside a character's folder, or None if there is no skeleton'''
+
+    skeleton_model = get_skeleton_model(paths_json_filepath)
+    if skeleton_model:
+        return str( Path(paths_json_filepath).parent / "skeleton" / _filename(skeleton_model) )
+    return None
+
+
+
+# Plan
+
+class GatherEntry:
+    '''A single asset file to copy to the character's folder'''
+
+    __slots__ = ("slot_name", "asset_type", "origin", "destination", "report", "size", "max_texture_size")
+
+    def __init__(self, slot_name, asset_type, origin, destination, report=""):
+        self.slot_name = slot_name
+        self.asset_type = asset_type
+        self.origin = origin
+        self.destination = destination
+        self.report = report
+        self.size = None  # Origin's size, if known (see GatherPlan.check_sources)
+        self.max_texture_size = None  # Proxy resolution of its own, if any (see texture_memory)
+
+    def __repr__(self):
+        return "GatherEntry({!r}, {!r}, {!r}, {!r})".format(self.slot_name, self.asset_type, self.origin, self.destination)
+
+
+class GatherPlan:
+    '''Deduplicated list of GatherEntry, plus the set of
+    destination folders they need'''
+
+    __slots__ = ("entries", "folders", "duplicates", "skeleton_filepath", "dependencies", "_keys", "_taken")
+
+    def __init__(self):
+        self.entries = []
+        self.folders = set()
+        self.duplicates = 0  # Number of repeated origin→destination pairs merged
+        self.skeleton_filepath = None
+        self.dependencies = None  # The dependency_resolver.DependencyResolver used, if any
+        self._keys = set()
+        self._taken = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def add(self, slot_name, asset_type, origin, destination):
+        '''Adds an entry unless its origin→destination pair is planned already.
+        Returns the new entry, or None if merged into an existing one.'''
+
+        key = (origin, destination)
+        if key in self._keys:
+            self.duplicates += 1
+            return None
+        self._keys.add(key)
+
+        entry = GatherEntry(slot_name, asset_type, origin, destination)
+        self.entries.append(entry)
+        self.folders.add(str(Path(destination).parent))
+        return entry
+
+    def take_new(self):
+        '''Returns the entries added since the last call'''
+
+        new_entries = self.entries[self._taken:]
+        self._taken = len(self.entries)
+        return new_entries
+
+    def check_source(self, entry, resources_index):
+        '''Looks up a single entry's origin in a resources_index.ResourcesIndex,
+        filling in its size. Returns False if the origin is missing.'''
+
+        relative_path = resources_index.relative_path(entry.origin)
+        if relative_path is None:
+            return True
+        indexed = resources_index.lookup(relative_path)
+        if indexed:
+            entry.size = indexed[1]
+            return True
+        entry.report = "MISSING IN RESOURCES"
+        return False
+
+    def check_sources(self, resources_index):
+        '''Looks up the entries' origins in a resources_index.ResourcesIndex
+        (without touching the 'resources' folder), filling in their sizes.
+        Returns the list of entries whose origins are missing.'''
+
+        relative_paths = [resources_index.relative_path(entry.origin) for entry in self.entries]
+        found = resources_index.lookup_many(relative_path for relative_path in relative_paths if relative_path)
+
+        missing = []
+        for entry, relative_path in zip(self.entries, relative_paths):
+            if relative_path is None:
+                continue
+            indexed = found.get(normalize_path(relative_path))
+            if indexed:
+                entry.size = indexed[1]
+            else:
+                entry.report = "MISSING IN RESOURCES"
+                missing.append(entry)
+        return missing
+
+    def texture_infos(self, at_destinations=False):
+        '''Reads the headers of the plan's .dds textures (see dds_file.dds_info)
+        at their origins or, once gathered, at their destinations, without
+        loading any image. Returns a list of (entry, DdsInfo), skipping the
+        files that can't be read.'''
+
+        texture_infos = []
+        for entry in self.entries:
+            filepath = entry.destination if at_destinations else entry.origin
+            if filepath.lower().endswith(".dds"):
+                info = dds_info(filepath)
+                if info:
+                    texture_infos.append((entry, info))
+        return texture_infos
+
+
+def summarize_textures(texture_infos):
+    '''One-line summary of a list of (entry, DdsInfo)'''
+
+    if not texture_infos:
+        return "No textures."
+    largest_entry, largest = max(texture_infos, key=lambda texture_info: texture_info[1].width * texture_info[1].height)
+    return "{} textures, {:.1f} MB of texture data. Largest: {}x{} ({})".format(
+        len(texture_infos),
+        sum(info.data_size() for _, info in texture_infos) / (1024 * 1024),
+        largest.width,
+        largest.height,
+        _filename(largest_entry.destination),
+        )
+
+
+
+# Planning
+
+def _resources_path(swtor_resources_folderpath, asset_path):
+    # Paths in 'paths.json' and .mat files start with a backslash, and
+    # their separators vary: make them work in any OS.
+    return str( Path(swtor_resources_folderpath).joinpath(*asset_path.replace("\\", "/").strip("/").split("/")) )
+
+
+def _filename(asset_path):
+    return asset_path.replace("\\", "/").rsplit("/", 1)[-1]
+
+
+def _add_material(plan, resolve, locate, slot_name, mat_path, mat_folderpath, maps_slot_name, maps_folderpath, all_textures=False):
+    '''Plans a .mat file plus the texturemaps that only its contents tell about:
+    those with ADDITIONAL_TEXTURE_SEMANTICS, into maps_folderpath, and, if
+    all_textures is set, the rest of them too, into mat_folderpath.
+    A generator that pauses before reading the file (see _fill_plan).'''
+
+    origin = resolve(mat_path)  # Needed right away, to read it
+    plan.add(slot_name, "material definition", origin, str( Path(mat_folderpath) / _filename(mat_path) ))
+    yield
+
+    try:
+        mat_textures = mat_cache.get(origin, scan_mat_textures)
+    except Exception as e:
+        # The copying will report the missing or faulty .mat file.
+        log.warning("Couldn't read %s for additional texturemaps: %s", origin, e, extra={"path": origin})
+        return
+
+    for semantic, texturemap in mat_textures:
+        if semantic in ADDITIONAL_TEXTURE_SEMANTICS:
+            plan.add(
+                maps_slot_name,
+                "texture map",
+                locate(texturemap),
+                str( Path(maps_folderpath) / _filename(texturemap) ),
+                )
+        elif all_textures:
+            plan.add(
+                slot_name,
+                "texture map",
+                locate(texturemap),
+                str( Path(mat_folderpath) / _filename(texturemap) ),
+                )
+
+
+def _add_dds_paths(plan, locate, slot_name, ddsPaths, folderpath):
+    if ddsPaths:
+        for ddsPath in ddsPaths.values():
+            if ddsPath.endswith(".dds"):
+                plan.add(
+                    slot_name,
+                    "texture map",
+                    locate(ddsPath),
+                    str( Path(folderpath) / _filename(ddsPath) ),
+                    )
+
+
+def plan_gather(paths_json_filepath, swtor_resources_folderpath, resolver=None, complete_dependencies=False):
+    '''Builds the GatherPlan for a character's 'paths.json' file.
+    If a path_resolver.PathResolver is passed, the assets' paths are
+    resolved through it, fixing any casing mismatches. An
+    asset_sources.AssetSource can be passed as the resolver, too.
+    If complete_dependencies is set, the plan includes every asset the
+    models and materials reference (see dependency_resolver).'''
+
+    with open(paths_json_filepath, 'r') as file:
+        json_data = json.load(file)
+    return plan_gather_from_data(json_data, paths_json_filepath, swtor_resources_folderpath, resolver, complete_dependencies)
+
+
+def plan_gather_from_data(json_data, paths_json_filepath, swtor_resources_folderpath, resolver=None, complete_dependencies=False):
+    '''Builds the GatherPlan for already parsed 'paths.json' data
+    (paths_json_filepath is still needed to locate the character's
+    folder and its 'skeleton.json' file)'''
+
+    plan = GatherPlan()
+    for _ in _fill_plan(plan, json_data, paths_json_filepath, swtor_resources_folderpath, resolver, complete_dependencies):
+        pass
+    return plan
+
+
+def iter_gather(paths_json_filepath, swtor_resources_folderpath, resolver=None, plan=None, complete_dependencies=False):
+    '''Yields the GatherEntry of a character's 'paths.json' file as they
+    are planned. If a GatherPlan is passed, it is filled as it goes
+    (for its duplicates count, skeleton_filepath, etc.)'''
+
+    with open(paths_json_filepath, 'r') as file:
+        json_data = json.load(file)
+    yield from iter_gather_from_data(json_data, paths_json_filepath, swtor_resources_folderpath, resolver, plan, complete_dependencies)
+
+
+def iter_gather_from_data(json_data, paths_json_filepath, swtor_resources_folderpath, resolver=None, plan=None, complete_dependencies=False):
+    '''Yields the GatherEntry of already parsed 'paths.json' data as they are planned'''
+
+    if plan is None:
+        plan = GatherPlan()
+    for _ in _fill_plan(plan, json_data, paths_json_filepath, swtor_resources_folderpath, resolver, complete_dependencies):
+        yield from plan.take_new()
+
+
+def _fill_plan(plan, json_data, paths_json_filepath, swtor_resources_folderpath, resolver, complete_dependencies=False):
+    # Generator that fills a plan, pausing after each group of assets
+    # (and, especially, before reading each .mat file) so that callers
+    # can take the entries planned so far.
+
+    if resolver:
+        resolve = resolver.resolve
+        # Asset sources can tell where an asset will be without fetching
+        # it yet, so that the copying threads fetch it (see asset_sources).
+        locate = getattr(resolver, "locate", resolver.resolve)
+        fetch_local = getattr(resolver, "fetch_local", None) or (lambda filepath: filepath)
+    else:
+        resolve = locate = lambda asset_path: _resources_path(swtor_resources_folderpath, asset_path)
+        fetch_local = lambda filepath: filepath
+
+    dependencies = None
+    if complete_dependencies:
+        dependencies = DependencyResolver(getattr(resolver, "exists", None) or (lambda asset_path: os.path.exists(resolve(asset_path))))
+        plan.dependencies = dependencies
+    planned_models = []  # (slot name, model's origin), for their materials
+
+    character_folderpath = Path(paths_json_filepath).parent
+    character_models_folderpath = character_folderpath / "models"
+    character_materials_folderpath = character_folderpath / "materials"
+    character_skeleton_folderpath = character_folderpath / "skeleton"
+
+    for element in json_data:
+
+        slotName = element["slotName"]
+
+        if slotName != "skinMats":
+
+            # NOT SKIN MATERIALS
+
+            for model in element.get("models") or []:
+                model_origin = locate(model)
+                plan.add(
+                    slotName,
+                    "model",
+                    model_origin,
+                    str( character_models_folderpath / slotName / _filename(model) ),
+                    )
+                planned_models.append((slotName, model_origin))
+            yield
+
+            materialInfo = element.get("materialInfo")
+            if materialInfo:
+                if "matPath" in materialInfo:
+                    yield from _add_material(
+                        plan,
+                        resolve,
+                        locate,
+                        slotName,
+                        materialInfo["matPath"],
+                        character_materials_folderpath / slotName,
+                        slotName,
+                        character_materials_folderpath / slotName,
+                        all_textures = complete_dependencies,
+                        )
+
+                _add_dds_paths(plan, locate, slotName, materialInfo.get("ddsPaths"), character_materials_folderpath / slotName)
+
+                if "eyeMatInfo" in materialInfo:
+                    _add_dds_paths(plan, locate, "eye", materialInfo["eyeMatInfo"].get("ddsPaths"), character_materials_folderpath / "eye")
+                yield
+
+        else:
+
+            # SKIN MATERIALS (the dict hierarchy gets deeper and more confusing)
+
+            materialInfo = element.get("materialInfo")
+            if materialInfo and "mats" in materialInfo:
+                for mat in materialInfo["mats"]:
+                    mat_slotName = mat["slotName"]
+                    mat_folderpath = character_materials_folderpath / slotName / mat_slotName
+
+                    if "materialInfo" in mat and "matPath" in mat["materialInfo"]:
+                        # Their DirectionMaps and WrinkleMaps go to the common skinMats
+                        # folder, and any other textures to their own folders.
+                        yield from _add_material(
+                            plan,
+                            resolve,
+                            locate,
+                            slotName + ": " + mat_slotName,
+                            mat["materialInfo"]["matPath"],
+                            mat_folderpath,
+                            slotName,
+                            character_materials_folderpath / slotName,
+                            all_textures = complete_dependencies,
+                            )
+
+                    _add_dds_paths(plan, locate, slotName + ": " + mat_slotName, mat.get("ddsPaths"), mat_folderpath)
+                    yield
+
+    # The materials the models reference. When streaming the plan into
+    # the copying (see iter_gather), the copying threads have fetched
+    # the models by now, or are fetching them: fetch_local waits for
+    # those fetches rather than repeating them.
+    if dependencies:
+        for slotName, model_origin in planned_models:
+            try:
+                model_filepath = fetch_local(model_origin)
+            except Exception:
+                model_filepath = model_origin  # The copying will report it.
+            for mat_path in dependencies.model_materials(model_filepath):
+                yield from _add_material(
+                    plan,
+                    resolve,
+                    locate,
+                    slotName,
+                    mat_path,
+                    character_materials_folderpath / slotName,
+                    slotName,
+                    character_materials_folderpath / slotName,
+                    all_textures = True,
+                    )
+
+    # If there is a companion "skeleton.json" file, process it too.
+    skeleton_model = get_skeleton_model(paths_json_filepath)
+    if skeleton_model:
+        plan.skeleton_filepath = str( character_skeleton_folderpath / _filename(skeleton_model) )
+        plan.add(
+            "Skeleton",
+            "model",
+            locate(skeleton_model),
+            plan.skeleton_filepath,
+            )
+    yield
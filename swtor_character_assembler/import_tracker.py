@@ -0,0 +1,136 @@
+# Tracking of the datablocks an importer creates.
+#
+# The .gr2 Importer doesn't return what it imported, and diffing
+# bpy.data.objects before and after each import costs time in
+# proportion to the whole file's objects: in scenes with tens of
+# thousands of them, more than importing a small character does.
+#
+# Instead, ImportTracker makes a new, empty Collection the active one
+# for the import's duration. Importers link the objects they create to
+# the active Collection (bpy.context.collection), so afterwards that
+# Collection holds exactly the new objects, which are then moved to
+# where they would have gone otherwise. The materials and images they
+# brought in are told apart from pre-existing ones by their session
+# UIDs, which Blender hands out in increasing order: anything created
+# after a "watermark" ID (a throwaway Text datablock) is new.
+#
+# All of it costs in proportion to the imported datablocks only. If an
+# importer links objects somewhere else (the object count tells), the
+# tracker falls back to a scan of bpy.data.objects by session UID.
+
+
+import bpy
+
+
+TRACKING_COLLECTION_NAME = "SWCA Import"
+
+
+def session_watermark():
+    '''Returns a session UID below those of any datablock created from
+    now on (or None if this Blender doesn't expose session UIDs)'''
+
+    text = bpy.data.texts.new(TRACKING_COLLECTION_NAME)
+    watermark = getattr(text, "session_uid", None)
+    bpy.data.texts.remove(text)
+    return watermark
+
+
+class ImportTracker:
+    '''Context manager collecting the objects created inside it, plus
+    the materials and images they brought in:
+
+        with ImportTracker() as tracker:
+            bpy.ops.import_mesh.gr2(filepath=filepath)
+        tracker.meshes, tracker.armatures, tracker.materials…
+    '''
+
+    def __init__(self):
+        self.objects = []
+        self.materials = []
+        self.images = []
+        self._watermark = None
+        self._objects_count = 0
+        self._collection = None
+        self._previous_layer_collection = None
+
+    def __enter__(self):
+        self._watermark = session_watermark()
+        self._objects_count = len(bpy.data.objects)
+
+        view_layer = bpy.context.view_layer
+        self._collection = bpy.data.collections.new(TRACKING_COLLECTION_NAME)
+        bpy.context.scene.collection.children.link(self._collection)
+        self._previous_layer_collection = view_layer.active_layer_collection
+        view_layer.active_layer_collection = view_layer.layer_collection.children[self._collection.name]
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        view_layer = bpy.context.view_layer
+        view_layer.active_layer_collection = self._previous_layer_collection
+        previous_collection = self._previous_layer_collection.collection
+
+        objects = list(self._collection.objects)
+        if len(objects) < len(bpy.data.objects) - self._objects_count and self._watermark is not None:
+            # The importer linked objects elsewhere, too.
+            objects = [obj for obj in bpy.data.objects if obj.session_uid > self._watermark]
+
+        # Leave the objects where the importer would have linked them.
+        for obj in list(self._collection.objects):
+            if previous_collection not in obj.users_collection:
+                previous_collection.objects.link(obj)
+            self._collection.objects.unlink(obj)
+        bpy.data.collections.remove(self._collection)
+        self._collection = None
+
+        self.objects = objects
+        materials = self._objects_materials(objects)
+        self.materials = self._new_ids(materials)
+        self.images = self._new_ids(self._materials_images(materials))
+        return False
+
+    def _new_ids(self, ids):
+        if self._watermark is None:
+            return ids
+        return [id for id in ids if id.session_uid > self._watermark]
+
+    @staticmethod
+    def _objects_materials(objects):
+        materials = {}
+        for obj in objects:
+            for slot in obj.material_slots:
+                if slot.material:
+                    materials[slot.material.as_pointer()] = slot.material
+        return list(materials.values())
+
+    @staticmethod
+    def _materials_images(materials):
+        images = {}
+        node_trees = [material.node_tree for material in materials if material.node_tree]
+        seen_trees = set()
+        while node_trees:
+            node_tree = node_trees.pop()
+            if node_tree.as_pointer() in seen_trees:
+                continue
+            seen_trees.add(node_tree.as_pointer())
+            for node in node_tree.nodes:
+                if getattr(node, "image", None):
+                    images[node.image.as_pointer()] = node.image
+                elif node.type == 'GROUP' and node.node_tree:
+                    node_trees.append(node.node_tree)
+        return list(images.values())
+
+    @property
+    def meshes(self):
+        return [obj for obj in self.objects if obj.type == 'MESH']
+
+    @property
+    def armatures(self):
+        return [obj for obj in self.objects if obj.type == 'ARMATURE']
+
+    def summary(self):
+        return "{} meshes, {} armatures, {} materials and {} images imported".format(
+            len(self.meshes),
+            len(self.armatures),
+            len(self.materials),
+            len(self.images),
+            )
@@ -0,0 +1,140 @@
+# Memoization of SWTOR shader .mat files' parsing.
+#
+# The same .mat files come up again and again across a character's
+# slots, across characters, and across re-gatherings. Parsing results
+# are cached by (absolute path, modification time, size), so a file
+# is parsed again only if it changes.
+#
+# The cache lives in memory with LRU eviction and, optionally, in a
+# JSON file between Blender sessions. Parsing results must be
+# JSON-serializable (lists, dicts, strings, numbers).
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender.
+
+
+import os
+import json
+import threading
+from collections import OrderedDict
+
+from .assembler_log import get_logger
+
+
+log = get_logger("gather")
+
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_MAX_DISK_ENTRIES = 65536
+
+
+class MatCache:
+    '''LRU cache of .mat files' parsing results, optionally persisted to disk.
+    Thread-safe. Results are cached per parser function, so that different
+    kinds of parsing of a same file don't mix.'''
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, cache_filepath=None):
+        self.max_entries = max_entries
+        self.max_disk_entries = DEFAULT_MAX_DISK_ENTRIES
+        self.cache_filepath = None
+
+        self._entries = OrderedDict()
+        self._disk_entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if cache_filepath:
+            self.set_cache_filepath(cache_filepath)
+
+    def set_cache_filepath(self, cache_filepath):
+        '''Sets (or, with None, unsets) the file the cache persists to,
+        loading its contents if it exists'''
+
+        with self._lock:
+            if cache_filepath == self.cache_filepath:
+                return
+            self.cache_filepath = cache_filepath
+            self._disk_entries = {}
+            if cache_filepath and os.path.isfile(cache_filepath):
+                try:
+                    with open(cache_filepath, "r") as cache_file:
+                        self._disk_entries = json.load(cache_file)
+                except Exception as e:
+                    log.warning("The .mat files' cache couldn't be read and will be rebuilt: %s", e)
+
+    @staticmethod
+    def _key(mat_filepath, parser):
+        stat = os.stat(mat_filepath)
+        # (Parsers can have a cache_version attribute, to tell apart results of different versions.)
+        parser_name = parser.__name__ + ("@{}".format(parser.cache_version) if hasattr(parser, "cache_version") else "")
+        return "{}|{}|{}|{}".format(parser_name, os.path.normcase(os.path.abspath(mat_filepath)), stat.st_mtime_ns, stat.st_size)
+
+    def get(self, mat_filepath, parser):
+        '''Returns parser(mat_filepath), from the cache if possible.
+        Raises whatever os.stat or the parser raise (errors aren't cached).'''
+
+        key = self._key(mat_filepath, parser)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            if key in self._disk_entries:
+                result = self._disk_entries[key]
+                self.disk_hits += 1
+                self._store(key, result)
+                return result
+
+        result = parser(mat_filepath)
+
+        with self._lock:
+            self.misses += 1
+            self._store(key, result)
+            if self.cache_filepath:
+                self._disk_entries[key] = result
+                self._dirty = True
+        return result
+
+    def _store(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def save(self):
+        '''Writes the cache to its file, if it has one and has new entries'''
+
+        with self._lock:
+            if not (self.cache_filepath and self._dirty):
+                return
+            # Keep the most recently added entries (dicts keep insertion order).
+            if len(self._disk_entries) > self.max_disk_entries:
+                keys = list(self._disk_entries)[-self.max_disk_entries:]
+                self._disk_entries = {key: self._disk_entries[key] for key in keys}
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.cache_filepath)), exist_ok=True)
+                with open(self.cache_filepath + ".tmp", "w") as cache_file:
+                    json.dump(self._disk_entries, cache_file)
+                os.replace(self.cache_filepath + ".tmp", self.cache_filepath)
+                self._dirty = False
+            except Exception as e:
+                log.warning("The .mat files' cache couldn't be saved: %s", e)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def summary(self):
+        return ".mat files cache: {} hits, {} hits from disk, {} misses ({} files in memory)".format(
+            self.hits, self.disk_hits, self.misses, len(self._entries)
+            )
+
+
+# Shared by all the Character Assembler's runs in a Blender session
+mat_cache = MatCache()
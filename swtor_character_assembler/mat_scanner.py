@@ -0,0 +1,181 @@
+# Scanning of SWTOR shader .mat files for texture inputs.
+#
+# A .mat file is an XML list of <input> elements, each with a
+# <semantic>, a <type> and a <value>. scan_mat_textures streams through
+# the file in a single iterparse pass, collecting every texture-typed
+# input with its semantic as its end tag comes by, instead of building
+# the whole tree and searching it for one semantic at a time as
+# get_wrinkles_and_directionmaps does.
+#
+# This module only depends on the standard library, so that it can be
+# run as a script to benchmark both functions on a corpus of .mat files:
+#
+#     python mat_scanner.py PATH_TO/resources/art/shaders/materials [--repeats N]
+
+
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+
+def normalize_texture_path(value):
+    '''Turns a texture input's value into a path in the same style as
+    'paths.json' ones: leading backslash, backslash separators, and
+    the .dds extension the .mat files omit'''
+
+    return "\\" + value.strip().replace("/", "\\").lstrip("\\") + ".dds"
+
+
+def scan_mat_textures(mat_file_abs_path):
+    '''Reads a shader .mat file and returns a list of (semantic, path)
+    for every texture input in it, paths normalized as per
+    normalize_texture_path. Inputs with empty values are skipped.'''
+
+    textures = []
+    fields = None  # The current <input>'s children's texts
+    for event, element in ET.iterparse(mat_file_abs_path, events=("start", "end")):
+        if element.tag == "input":
+            if event == "start":
+                fields = {}
+                continue
+            input_type = fields.get("type") or ""
+            value = fields.get("value") or ""
+            # (BioWare's casing of the types isn't consistent either.)
+            if input_type.strip().lower() == "texture" and value.strip():
+                textures.append((fields.get("semantic"), normalize_texture_path(value)))
+            fields = None
+            element.clear()
+        elif event == "end" and fields is not None:
+            fields[element.tag] = element.text
+    return textures
+
+# The results' format changed: ignore the ones cached by earlier versions.
+scan_mat_textures.cache_version = 2
+
+
+def get_wrinkles_and_directionmaps(mat_file_abs_path):
+    '''Reads a shader .mat file and returns any DirectionMap
+    and WrinkleMap paths in an "as is" basis
+    (slashes, backslashes, initial ones or not…)'''
+
+    relative_paths = []
+    with open(mat_file_abs_path, 'r') as mat_file:
+        tree = ET.parse(mat_file)
+        root = tree.getroot()
+
+        # The diverse camelCases are as per BioWare's horrific inconsistency.
+        # Same goes for initial backslash. For consistency, we add it if missing.
+        # backslash vs. slash is solved vía pathlib later on.
+
+        DirectionMap = root.find("./input/[semantic='DirectionMap']")
+        if DirectionMap != None:
+            texturemap_path = DirectionMap.find("value").text + ".dds"
+            if texturemap_path[0] != "\\":
+                texturemap_path = "\\" + texturemap_path
+            relative_paths.append(texturemap_path)
+
+        animatedWrinkleMap = root.find("./input/[semantic='animatedWrinkleMap']")
+        if animatedWrinkleMap != None:
+            texturemap_path = animatedWrinkleMap.find("value").text + ".dds"
+            if texturemap_path[0] != "\\":
+                texturemap_path = "\\" + texturemap_path
+            relative_paths.append(texturemap_path)
+
+        animatedWrinkleMask = root.find("./input/[semantic='animatedWrinkleMask']")
+        if animatedWrinkleMask != None:
+            texturemap_path = animatedWrinkleMask.find("value").text + ".dds"
+            if texturemap_path[0] != "\\":
+                texturemap_path = "\\" + texturemap_path
+            relative_paths.append(texturemap_path)
+
+    return(relative_paths)
+
+
+
+# Micro-benchmark
+
+def _time_per_file(function, mat_filepaths, repeats):
+    best = None
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        for mat_filepath in mat_filepaths:
+            try:
+                function(mat_filepath)
+            except Exception:
+                pass
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(mat_filepaths)
+
+
+def benchmark(mat_filepaths, repeats=5):
+    '''Times get_wrinkles_and_directionmaps and scan_mat_textures over
+    a list of .mat files (best of several runs, so that the OS's file
+    cache is warm for both), and checks that the latter finds every
+    path the former does. Returns a dict of results.'''
+
+    mat_filepaths = list(mat_filepaths)
+
+    mismatches = []
+    textures_found = 0
+    for mat_filepath in mat_filepaths:
+        try:
+            expected = get_wrinkles_and_directionmaps(mat_filepath)
+        except Exception:
+            continue
+        found = [path.lower() for _, path in scan_mat_textures(mat_filepath)]
+        textures_found += len(found)
+        for path in expected:
+            if normalize_texture_path(path[:-len(".dds")]).lower() not in found:
+                mismatches.append((mat_filepath, path))
+
+    baseline = _time_per_file(get_wrinkles_and_directionmaps, mat_filepaths, repeats)
+    scanner = _time_per_file(scan_mat_textures, mat_filepaths, repeats)
+
+    return {
+        "files": len(mat_filepaths),
+        "baseline_us_per_file": baseline * 1e6,
+        "scanner_us_per_file": scanner * 1e6,
+        "speedup": baseline / scanner if scanner else 0.0,
+        "textures_found": textures_found,
+        "mismatches": mismatches,
+    }
+
+
+def _main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmarks the .mat scanner against get_wrinkles_and_directionmaps.")
+    parser.add_argument("paths", nargs="+", help=".mat files, or folders to search for them")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=0, help="Use at most this many files")
+    arguments = parser.parse_args(argv)
+
+    mat_filepaths = []
+    for path in arguments.paths:
+        if os.path.isdir(path):
+            for folderpath, _, filenames in os.walk(path):
+                mat_filepaths += [os.path.join(folderpath, filename) for filename in filenames if filename.lower().endswith(".mat")]
+        else:
+            mat_filepaths.append(path)
+    if arguments.limit:
+        mat_filepaths = mat_filepaths[:arguments.limit]
+    if not mat_filepaths:
+        print("No .mat files found.")
+        return 1
+
+    results = benchmark(mat_filepaths, arguments.repeats)
+    print("{} .mat files, best of {} runs:".format(results["files"], arguments.repeats))
+    print("    get_wrinkles_and_directionmaps: {:8.1f} µs/file (3 semantics)".format(results["baseline_us_per_file"]))
+    print("    scan_mat_textures:              {:8.1f} µs/file (all {} texture inputs)".format(results["scanner_us_per_file"], results["textures_found"]))
+    print("    speedup: {:.2f}x".format(results["speedup"]))
+    if results["mismatches"]:
+        print("    {} paths found by the former but not by the latter:".format(len(results["mismatches"])))
+        for mat_filepath, path in results["mismatches"][:20]:
+            print("        ", mat_filepath, path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
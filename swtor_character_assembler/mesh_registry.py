@@ -0,0 +1,218 @@
+# Registry of imported gear meshes, so that characters wearing the
+# same gear share its mesh data.
+#
+# The .gr2 Importer creates new mesh data for every model it imports,
+# even if an identical one was imported for a previous character: a
+# crowd of NPCs in the same armor holds as many copies of it as there
+# are NPCs. After each import, share_meshes() looks every new mesh up
+# by its source: the .gr2 file it came from (its path in 'resources',
+# plus a hash of its contents, so that a game patch changing it makes
+# for a new entry) and its mesh's name inside that file. If an earlier
+# import registered a mesh under that key, the new object is given
+# that mesh, and its own copy is removed. Otherwise the new mesh is
+# registered.
+#
+# Dye colors and other per-character differences live in the materials,
+# which Blender stores in the mesh. So before an object switches meshes,
+# its material slots are set to link their materials from the object
+# itself, which keeps each character's own materials.
+#
+# Registry entries are stored in the meshes themselves, as a custom
+# property, so the registry survives saving and reopening the file.
+# The in-memory lookup table is rebuilt from those properties once per
+# file.
+
+
+import os
+import re
+import json
+from pathlib import Path
+
+import bpy
+
+from .gather_manifest import file_hash, MANIFEST_FILENAME
+from .dependency_resolver import scan_gr2_strings
+from .mat_cache import mat_cache
+
+
+SOURCE_PROPERTY = "swca_mesh_source"
+
+# Blender's ".001"-like suffixes for repeated names
+_NAME_SUFFIX = re.compile(r"\.\d{3,}$")
+
+# Rough bytes per mesh element in Blender's memory
+_BYTES_PER_VERTEX = 12 + 4  # position, flags
+_BYTES_PER_EDGE = 8 + 4
+_BYTES_PER_LOOP = 4 + 4 + 12  # vertex and edge indices, normal
+_BYTES_PER_POLYGON = 4 + 4 + 4  # first loop, loop count, material index
+_BYTES_PER_UV = 8
+_BYTES_PER_WEIGHT = 8
+_WEIGHTS_PER_VERTEX = 4  # SWTOR models' bone influences
+
+
+def estimate_mesh_memory(mesh):
+    '''Rough estimate of the bytes a mesh datablock takes in RAM'''
+
+    vertices = len(mesh.vertices)
+    loops = len(mesh.loops)
+    weights = vertices * _WEIGHTS_PER_VERTEX if vertices and len(mesh.vertices[0].groups) else 0
+    shape_keys = len(mesh.shape_keys.key_blocks) if mesh.shape_keys else 0
+    return (
+        vertices * _BYTES_PER_VERTEX * (1 + shape_keys)
+        + len(mesh.edges) * _BYTES_PER_EDGE
+        + loops * (_BYTES_PER_LOOP + _BYTES_PER_UV * len(mesh.uv_layers))
+        + len(mesh.polygons) * _BYTES_PER_POLYGON
+        + weights * _BYTES_PER_WEIGHT
+        )
+
+
+class MeshRegistry:
+    '''Source key → mesh name lookup table of the current .blend file'''
+
+    def __init__(self):
+        self.blend_filepath = None  # (None: not built yet)
+        self.meshes = {}
+        self._hashes = {}  # .gr2 file → (size, mtime, hash)
+
+    def _ensure_current(self):
+        # A different file (or a new one) has a different set of meshes.
+        if self.blend_filepath != bpy.data.filepath:
+            self.blend_filepath = bpy.data.filepath
+            self.meshes = {mesh[SOURCE_PROPERTY]: mesh.name for mesh in bpy.data.meshes if SOURCE_PROPERTY in mesh}
+
+    def get(self, key):
+        self._ensure_current()
+        mesh = bpy.data.meshes.get(self.meshes.get(key, ""))
+        if mesh is not None and mesh.get(SOURCE_PROPERTY) == key:
+            return mesh
+        self.meshes.pop(key, None)
+        return None
+
+    def register(self, key, mesh):
+        self._ensure_current()
+        mesh[SOURCE_PROPERTY] = key
+        self.meshes[key] = mesh.name
+
+    def file_hash(self, filepath):
+        stat = os.stat(filepath)
+        cached = self._hashes.get(filepath)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        contents_hash = file_hash(filepath)
+        self._hashes[filepath] = (stat.st_size, stat.st_mtime_ns, contents_hash)
+        return contents_hash
+
+
+mesh_registry = MeshRegistry()
+
+
+class MeshSharingStats:
+    '''Results of a share_meshes() run'''
+
+    __slots__ = ("meshes", "shared", "registered", "unknown", "memory_saved")
+
+    def __init__(self):
+        self.meshes = 0
+        self.shared = 0  # Given an existing mesh
+        self.registered = 0  # New to the registry
+        self.unknown = 0  # Whose .gr2 file couldn't be told for sure
+        self.memory_saved = 0
+
+    def summary(self):
+        return "Shared meshes: {} of {} meshes reuse identical gear's mesh data (~{:.1f} MB saved), {} registered as new{}".format(
+            self.shared,
+            self.meshes,
+            self.memory_saved / (1024 * 1024),
+            self.registered,
+            ", {} of unknown source".format(self.unknown) if self.unknown else "",
+            )
+
+
+def _models_by_mesh_name(character_folderpath):
+    '''Maps the names in the character's .gr2 files to those files.
+    Names found in more than one file (shared bone names, say) map to
+    None, as an object by that name can't be told to come from either.
+    The strings are cached per file (see mat_cache).'''
+
+    models = {}
+    for folderpath, _, filenames in os.walk(Path(character_folderpath) / "models"):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(".gr2"):
+                gr2_filepath = os.path.join(folderpath, filename)
+                try:
+                    names = mat_cache.get(gr2_filepath, scan_gr2_strings)
+                except Exception:
+                    continue
+                for name in names:
+                    if models.get(name, gr2_filepath) != gr2_filepath:
+                        models[name] = None
+                    else:
+                        models[name] = gr2_filepath
+    return models
+
+
+def _gathered_origins(character_folderpath):
+    '''Maps the character's gathered files to their 'resources' paths,
+    as recorded in its gathering manifest'''
+
+    try:
+        with open(Path(character_folderpath) / MANIFEST_FILENAME, "r") as manifest_file:
+            assets = json.load(manifest_file).get("assets", {})
+    except (OSError, ValueError):
+        return {}
+    return {
+        os.path.normcase(os.path.join(character_folderpath, relative_path)): record["source"]
+        for relative_path, record in assets.items()
+        }
+
+
+def share_meshes(objects, character_folderpath, registry=mesh_registry):
+    '''Gives the objects of a just imported character the registered
+    meshes of identical earlier imports, and registers the rest.
+    Returns a MeshSharingStats.'''
+
+    stats = MeshSharingStats()
+    models = _models_by_mesh_name(character_folderpath)
+    origins = _gathered_origins(character_folderpath)
+
+    for obj in objects:
+        if obj.type != 'MESH' or obj.data is None:
+            continue
+        stats.meshes += 1
+        mesh = obj.data
+
+        for mesh_name in (_NAME_SUFFIX.sub("", obj.name), _NAME_SUFFIX.sub("", mesh.name)):
+            gr2_filepath = models.get(mesh_name)
+            if gr2_filepath:
+                break
+        else:
+            stats.unknown += 1
+            continue
+        source = origins.get(os.path.normcase(gr2_filepath), "")
+        key = "{}|{}|{}".format(
+            source.replace("\\", "/").lower(),
+            registry.file_hash(gr2_filepath),
+            mesh_name,
+            )
+
+        registered_mesh = registry.get(key)
+        if registered_mesh is None:
+            registry.register(key, mesh)
+            stats.registered += 1
+            continue
+        if registered_mesh == mesh:
+            continue
+
+        # Keep the object's own materials when switching its mesh.
+        materials = [slot.material for slot in obj.material_slots]
+        obj.data = registered_mesh
+        for slot, material in zip(obj.material_slots, materials):
+            slot.link = 'OBJECT'
+            slot.material = material
+
+        stats.shared += 1
+        if mesh.users == 0:
+            stats.memory_saved += estimate_mesh_memory(mesh)
+            bpy.data.meshes.remove(mesh)
+
+    return stats
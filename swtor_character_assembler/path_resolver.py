@@ -0,0 +1,124 @@
+# Case and separator-insensitive resolution of SWTOR asset paths.
+#
+# The asset paths in 'paths.json', 'skeleton.json' and .mat files come
+# with BioWare's inconsistent casing and separators. That's harmless in
+# Windows, but in case-sensitive filesystems (Linux's, typically) a
+# mismatch means a failed copy and, later on, a crashing .gr2 import.
+#
+# The resolver keeps a map of every file in the 'resources' folder from
+# its lowercased, slash-separated relative path to its actual one, so
+# each lookup is a dict access. The map comes from the 'resources'
+# index if there is one (see resources_index), or from a walk of the
+# folder. Either is kept in memory for the rest of the Blender session
+# (the index's, until the index is refreshed).
+#
+# Every correction made is recorded, so that extraction problems
+# can be audited.
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender.
+
+
+import os
+import threading
+
+from .resources_index import normalize_path
+from .assembler_log import get_logger
+
+
+log = get_logger("gather")
+
+
+CORRECTIONS_LOG_FILENAME = "path_corrections.log"
+
+# Walked maps, by 'resources' folder, kept for the session
+_walked_maps = {}
+_maps_lock = threading.Lock()
+
+# Indexed maps, by index file: (time of the index's last refresh, map)
+_indexed_maps = {}
+
+
+def walk_resources(swtor_resources_folderpath):
+    '''Returns a map of normalized relative path → actual relative
+    path for every file in a 'resources' folder'''
+
+    paths_map = {}
+    for folderpath, _, filenames in os.walk(swtor_resources_folderpath):
+        relative_folderpath = os.path.relpath(folderpath, swtor_resources_folderpath)
+        if relative_folderpath == ".":
+            relative_folderpath = ""
+        for filename in filenames:
+            relative_filepath = os.path.join(relative_folderpath, filename)
+            paths_map[normalize_path(relative_filepath)] = relative_filepath
+    return paths_map
+
+
+class PathResolver:
+    '''Resolves asset paths as written in SWTOR files to absolute paths
+    in a 'resources' folder with the files' actual casing'''
+
+    def __init__(self, swtor_resources_folderpath, paths_map):
+        self.swtor_resources_folderpath = str(swtor_resources_folderpath)
+        self.paths_map = paths_map
+        self.corrections = []  # (as written, actual relative path)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_index(cls, resources_index):
+        '''Builds a resolver from a resources_index.ResourcesIndex, reusing
+        the map read from it before unless it has been refreshed since'''
+
+        last_refresh = resources_index.last_refresh()
+        with _maps_lock:
+            indexed_map = _indexed_maps.get(resources_index.index_filepath)
+            if indexed_map is None or indexed_map[0] != last_refresh:
+                indexed_map = _indexed_maps[resources_index.index_filepath] = (last_refresh, resources_index.paths_map())
+            return cls(resources_index.swtor_resources_folderpath, indexed_map[1])
+
+    @classmethod
+    def from_walk(cls, swtor_resources_folderpath, rewalk=False):
+        '''Builds a resolver by walking a 'resources' folder, or
+        reusing a previous walk of it in this session'''
+
+        swtor_resources_folderpath = str(swtor_resources_folderpath)
+        with _maps_lock:
+            if rewalk or swtor_resources_folderpath not in _walked_maps:
+                _walked_maps[swtor_resources_folderpath] = walk_resources(swtor_resources_folderpath)
+            return cls(swtor_resources_folderpath, _walked_maps[swtor_resources_folderpath])
+
+    def resolve(self, asset_path):
+        '''Returns the absolute path of an asset in the 'resources' folder,
+        asset_path being as written in 'paths.json', .mat files, etc.
+        Assets not found resolve to their paths as written (with the
+        separators fixed), for the copying to report them.'''
+
+        as_written = asset_path.replace("\\", "/").strip("/")
+        actual = self.paths_map.get(normalize_path(as_written))
+
+        if actual is None:
+            # Not in the map. If it exists as written, it's a file
+            # added after the map was made.
+            actual = as_written
+            if os.path.exists(os.path.join(self.swtor_resources_folderpath, as_written)):
+                self.paths_map[normalize_path(as_written)] = as_written
+
+        elif actual.replace("\\", "/") != as_written:
+            with self._lock:
+                self.corrections.append((asset_path, actual))
+            log.debug("PATH CORRECTED: %s → %s", asset_path, actual, extra={"path": actual})
+
+        return os.path.join(self.swtor_resources_folderpath, *actual.replace("\\", "/").split("/"))
+
+    def write_corrections_log(self, folderpath):
+        '''Appends the corrections made so far to a log file in a folder
+        (typically, the character's). Returns the log's path, or None
+        if there were no corrections.'''
+
+        if not self.corrections:
+            return None
+        log_filepath = os.path.join(str(folderpath), CORRECTIONS_LOG_FILENAME)
+        with open(log_filepath, "a") as log_file:
+            for as_written, actual in self.corrections:
+                log_file.write("{}\t{}\n".format(as_written, actual))
+        return log_filepath
@@ -1,7 +1,21 @@
 import bpy
 import os
+import sys
 from pathlib import Path
 
+from .resources_index_refresh import refresh_status, start_refresh
+from .asset_sources import has_tor_archives
+
+
+def update_use_resources_index(self, context):
+    # Build (or bring up to date) the index as soon as it's enabled.
+    if self.use_resources_index and ( Path(self.swtor_resources_folderpath) / "art/shaders/materials").exists():
+        start_refresh(self.swtor_resources_folderpath)
+
+def update_swtor_tor_folderpath(self, context):
+    # Check for archives once here, rather than in every panel redraw.
+    has_tor_archives(self.swtor_tor_folderpath, recheck=True)
+
 class addonPreferences(bpy.types.AddonPreferences):
     bl_idname = __package__
 
@@ -14,6 +28,145 @@ class addonPreferences(bpy.types.AddonPreferences):
         maxlen = 1024
     )
 
+    swtor_tor_folderpath: bpy.props.StringProperty(
+        name = "SWTOR Assets (.tor)",
+        description = "Path to the game's 'Assets' folder, holding its .tor archives.\nIf no 'resources' folder is set, the Character Assembler extracts only the files\neach character needs straight from these archives, keeping them for later uses.\nAfter a game patch, changed files are extracted anew",
+        subtype = "DIR_PATH",
+        default = "",
+        maxlen = 1024,
+        update = update_swtor_tor_folderpath,
+    )
+
+    asset_sources: bpy.props.StringProperty(
+        name = "Additional Sources",
+        description = "Other places to take assets from, separated by semicolons: 'resources' folders,\n.zip archives of them, folders with .tor archives, or http(s):// URLs of servers mirroring a 'resources' folder.\nThey are stacked over the 'resources' folder (or .tor archives) above in the order listed:\nthe first one having an asset provides it, so that patched or modded assets can override the base ones.\nAssets fetched from archives or servers are cached locally for later uses",
+        default = "",
+        maxlen = 4096
+    )
+
+    use_resources_index: bpy.props.BoolProperty(
+        name = "Index 'resources' Folder",
+        description = "Keep an index of the 'resources' folder's files, so that the Character Assembler\ncan check a character's assets and report missing ones before copying anything.\nRecommended for 'resources' folders in network shares or slow drives.\n\nThe index is built in the background when enabled. Refresh it after updating the extraction",
+        default = False,
+        update = update_use_resources_index,
+    )
+
+    fix_path_casing: bpy.props.BoolProperty(
+        name = "Fix Paths' Casing",
+        description = "Find the character's assets in the 'resources' folder even if their paths' upper/lowercasing\ndoesn't match the files' (which breaks gathering in case-sensitive filesystems such as Linux's).\nEvery correction is logged in a 'path_corrections.log' file in the character's folder.\n\nWithout a 'resources' index, the first gathering of the session has to list the whole folder",
+        default = not sys.platform.startswith("win"),
+    )
+
+    # Character Assembler's assets gathering
+    gather_threads: bpy.props.IntProperty(
+        name = "Gathering Threads",
+        description = "Number of asset files the Character Assembler copies simultaneously.\nHigher values help when the 'resources' folder is in a network share or a slow drive",
+        default = 8,
+        min = 1,
+        max = 64,
+    )
+
+    gather_link_mode: bpy.props.EnumProperty(
+        name = "Gathering Mode",
+        description = "How the Character Assembler places the assets in the character's folder",
+        items = [
+            ("COPY", "Copy", "Copy the assets' files from the 'resources' folder"),
+            ("LINK", "Link", "Place the assets as links to their files in the 'resources' folder, saving disk space and time:\na copy-on-write clone (reflink) if the drive supports it, else a hardlink, else a symlink,\nand a plain copy if none of those are possible.\n\nHardlinks and symlinks share their contents with the 'resources' folder's files:\nretouch assets only after replacing them with copies"),
+        ],
+        default = "COPY",
+    )
+
+    gather_manifest_hashes: bpy.props.BoolProperty(
+        name = "Hash Gathered Assets",
+        description = "Record a hash of every gathered asset in the character's gathering manifest.\nSlower, but tells apart files that were really edited in the character's folder\nfrom ones whose modification date changed only",
+        default = False,
+    )
+
+    mat_cache_on_disk: bpy.props.BoolProperty(
+        name = "Keep .mat Files' Cache Between Sessions",
+        description = "The Character Assembler remembers what it read from the shader .mat files it has seen\n(unless they change) to avoid re-reading them. This keeps that memory between Blender sessions",
+        default = True,
+    )
+
+    gather_complete_dependencies: bpy.props.BoolProperty(
+        name = "Gather Complete Dependencies",
+        description = "Besides the assets 'paths.json' lists, gather the materials the character's .gr2 models\nreference and every texture their .mat files reference, so that no asset the .gr2 Importer\nmay look for is missing. What each file references is remembered until the file changes",
+        default = False,
+    )
+
+    texture_memory_budget: bpy.props.IntProperty(
+        name = "Texture Memory Budget (MB)",
+        description = "Maximum memory a character's textures should take once imported (0: no limit).\nIf they'd take more, the Character Assembler gathers the biggest ones at a lower\nresolution (dropping their largest mip levels) until the estimate fits",
+        default = 0,
+        min = 0,
+        soft_max = 16384,
+    )
+
+    prefetch_before_import: bpy.props.BoolProperty(
+        name = "Read Ahead Before Importing",
+        description = "While the .gr2 Importer imports a character, read the character's models and textures\nahead in the background, so that the importer finds them in memory. Speeds up importing\nfrom slow drives and network shares. The console reports how much of the import was served warm",
+        default = False,
+    )
+
+    share_meshes: bpy.props.BoolProperty(
+        name = "Share Identical Gear's Meshes",
+        description = "Characters using the same gear models (the same .gr2 files) share their mesh data\ninstead of each holding a copy, which saves memory in scenes with many characters.\nEach character keeps its own materials. Editing a shared mesh affects every character using it",
+        default = False,
+    )
+
+    character_cache: bpy.props.BoolProperty(
+        name = "Cache Assembled Characters",
+        description = "Save every assembled character to a cache .blend file, and load it from there\nthe next time it is imported with the same files, gathered assets and options,\ninstead of importing and assembling it anew",
+        default = False,
+    )
+
+    character_cache_mode: bpy.props.EnumProperty(
+        name = "Load Cached Characters By",
+        description = "How cached characters are brought into the scene",
+        items = [
+            ("APPEND", "Appending", "Append the character's Collection: a fully editable copy"),
+            ("LINK", "Linking", "Link the character's Collection from the cache, as a Collection instance.\nLighter and faster, but not editable without making it local"),
+        ],
+        default = "APPEND",
+    )
+
+    # Logging
+    log_level: bpy.props.EnumProperty(
+        name = "Console Messages",
+        description = "How much the add-on's tools write to Blender's system console.\nWriting a line per asset file slows large gatherings down noticeably,\nespecially in Windows",
+        items = [
+            ("DEBUG", "Every Asset", "Report every file gathered, path corrected, etc. Slowest"),
+            ("INFO", "Summaries", "Report each run's progress and results, plus any problems"),
+            ("WARNING", "Problems Only", "Report warnings and errors only"),
+        ],
+        default = "INFO",
+    )
+
+    log_to_file: bpy.props.BoolProperty(
+        name = "Log To Character's Folder",
+        description = "Write a detailed log of every gathering, every asset file included,\nto an 'assembler_log.jsonl' file (one JSON object per line) in the character's folder",
+        default = False,
+    )
+
+    # Shared asset store
+    asset_store_folderpath: bpy.props.StringProperty(
+        name = "Asset Store",
+        description = "Folder where the Character Assembler keeps a single copy of every asset it gathers,\nplacing links to those in the characters' folders instead of copies of their own.\nLeave empty to gather straight from the 'resources' folder.\n\nRetouch assets only after replacing them with copies: retouching a linked file\nwould affect every character using it",
+        subtype = "DIR_PATH",
+        default = "",
+        maxlen = 1024
+    )
+
+    asset_store_key: bpy.props.EnumProperty(
+        name = "Identify Assets By",
+        description = "How the asset store tells whether two files are the same asset",
+        items = [
+            ("PATH", "Path, Size And Date", "Fast: uses the file's path inside 'resources', its size and its modification date"),
+            ("HASH", "Contents", "Slower the first time a file is seen: hashes the file's contents,\nso identical files at different paths are stored once"),
+        ],
+        default = "PATH",
+    )
+
     # UI ----------------------------------------
     
     def draw(self, context):
@@ -26,6 +179,52 @@ class addonPreferences(bpy.types.AddonPreferences):
         col.label(text="Path to the 'resources' folder in a SWTOR assets extraction")
         col.label(text="produced by the Slicers GUI app, EasyMYP, or any similar tool.")
         pref_box.prop(self, 'swtor_resources_folderpath', expand=True)
+        col=pref_box.column()
+        col.scale_y = 0.7
+        col.label(text="Or, instead, path to the game's 'Assets' folder with its .tor archives")
+        col.label(text="(the assets each character needs are extracted from them as needed).")
+        pref_box.prop(self, 'swtor_tor_folderpath', expand=True)
+        pref_box.prop(self, 'asset_sources')
+        row = pref_box.row()
+        row.prop(self, 'use_resources_index')
+        if self.use_resources_index:
+            row.operator("swtor.resources_index_refresh", text="Refresh").full = False
+            row.operator("swtor.resources_index_refresh", text="Full Refresh").full = True
+            if refresh_status["text"]:
+                pref_box.label(text=refresh_status["text"])
+        pref_box.prop(self, 'fix_path_casing')
+
+        # Character Assembler's assets gathering preferences UI
+        pref_box = layout.box()
+        col=pref_box.column()
+        col.scale_y = 0.7
+        col.label(text="Character Assembler's assets gathering")
+        pref_box.prop(self, 'gather_threads')
+        pref_box.prop(self, 'gather_link_mode', expand=True)
+        pref_box.prop(self, 'gather_manifest_hashes')
+        pref_box.prop(self, 'mat_cache_on_disk')
+        pref_box.prop(self, 'gather_complete_dependencies')
+        pref_box.prop(self, 'texture_memory_budget')
+        pref_box.prop(self, 'prefetch_before_import')
+        pref_box.prop(self, 'share_meshes')
+        row = pref_box.row()
+        row.prop(self, 'character_cache')
+        row.prop(self, 'character_cache_mode', text="")
+        row.operator("swtor.clear_character_cache", text="Clear Cache")
+        row = pref_box.row()
+        row.prop(self, 'log_level')
+        row.prop(self, 'log_to_file')
+
+        # Shared asset store preferences UI
+        pref_box = layout.box()
+        col=pref_box.column()
+        col.scale_y = 0.7
+        col.label(text="Shared asset store for all the characters' assets (optional)")
+        pref_box.prop(self, 'asset_store_folderpath', expand=True)
+        pref_box.prop(self, 'asset_store_key')
+        row = pref_box.row()
+        row.operator("swtor.asset_store_cleanup", text="Clean Up Unused Assets").statistics_only = False
+        row.operator("swtor.asset_store_cleanup", text="Show Statistics").statistics_only = True
 
 
 # Registrations
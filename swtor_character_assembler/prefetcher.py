@@ -0,0 +1,194 @@
+# Read-ahead of a character's files while Blender imports it.
+#
+# The .gr2 Importer reads the character's models and textures one by
+# one, in its own order, and parses each before asking for the next:
+# on a cold spinning drive or a network share, most of the import's
+# time goes into waiting for those reads. Once the gathering has
+# planned the files, we already know what the import will read, so a
+# background thread can ask for them ahead, in the same order:
+#
+# • Where the OS offers posix_fadvise (Linux, BSDs), each file gets a
+#   POSIX_FADV_WILLNEED hint, and the kernel reads it into its page
+#   cache asynchronously, without copying anything to us.
+#
+# • Elsewhere (Windows, macOS), the thread reads the files through,
+#   in chunks, and discards what it read: the OS keeps it cached.
+#
+# Either way, the importer's reads then come from RAM. Where mincore
+# is available, the files' page cache residency is measured before
+# starting, so that the report can tell how much of the import was
+# warm already and how much the read-ahead warmed.
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender.
+
+
+import os
+import threading
+import ctypes
+import ctypes.util
+import mmap
+
+from .assembler_log import get_logger
+
+
+log = get_logger("prefetch")
+
+
+READ_CHUNK_SIZE = 1024 * 1024
+MEGABYTE = 1024 * 1024
+
+
+# mincore, through the C library, where there is one
+
+_libc = None
+if os.name == "posix":
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        _libc.mmap.restype = ctypes.c_void_p
+        _libc.mmap.argtypes = (ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long)
+        _libc.munmap.argtypes = (ctypes.c_void_p, ctypes.c_size_t)
+        _libc.mincore.argtypes = (ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p)
+    except (OSError, AttributeError, TypeError):
+        _libc = None
+
+_MAP_FAILED = ctypes.c_void_p(-1).value
+
+
+def can_measure_residency():
+    return _libc is not None
+
+
+def resident_bytes(filepath):
+    '''Returns how many bytes of a file are in the OS's page cache,
+    or None if that can't be told (no mincore, unreadable file…)'''
+
+    if _libc is None:
+        return None
+    try:
+        fd = os.open(filepath, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        size = os.fstat(fd).st_size
+        if size == 0:
+            return 0
+        address = _libc.mmap(None, size, mmap.PROT_READ, mmap.MAP_SHARED, fd, 0)
+        if address in (None, _MAP_FAILED):
+            return None
+        try:
+            pages = (size + mmap.PAGESIZE - 1) // mmap.PAGESIZE
+            vector = (ctypes.c_ubyte * pages)()
+            if _libc.mincore(ctypes.c_void_p(address), size, vector) != 0:
+                return None
+            resident_pages = sum(page & 1 for page in vector)
+        finally:
+            _libc.munmap(ctypes.c_void_p(address), size)
+    finally:
+        os.close(fd)
+    return min(size, resident_pages * mmap.PAGESIZE)
+
+
+class Prefetcher:
+    '''Reads a list of files ahead, in order, in a background thread.
+    start() it before the import, and stop() it afterwards.'''
+
+    def __init__(self, filepaths, use_fadvise=True):
+        self.filepaths = []
+        seen = set()
+        for filepath in filepaths:
+            filepath = str(filepath)
+            if filepath not in seen:
+                seen.add(filepath)
+                self.filepaths.append(filepath)
+
+        self.use_fadvise = use_fadvise and hasattr(os, "posix_fadvise")
+        self.total_bytes = 0
+        self.cached_bytes = None  # Bytes in the page cache before starting, if measurable
+        self.prefetched_files = 0
+        self.prefetched_bytes = 0
+        self.failed_files = 0
+
+        self._sizes = {}
+        self._cold_bytes = {}  # Bytes of each file not cached yet
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def method(self):
+        return "posix_fadvise" if self.use_fadvise else "background reads"
+
+    def start(self):
+        # Measure what is cached already, and skip those files.
+        pending = []
+        cached_bytes = 0 if can_measure_residency() else None
+        for filepath in self.filepaths:
+            try:
+                size = os.path.getsize(filepath)
+            except OSError:
+                self.failed_files += 1
+                continue
+            self._sizes[filepath] = size
+            self.total_bytes += size
+            resident = resident_bytes(filepath) if cached_bytes is not None else None
+            if resident is not None:
+                cached_bytes += resident
+                if resident >= size:
+                    continue
+            self._cold_bytes[filepath] = size - (resident or 0)
+            pending.append(filepath)
+        self.cached_bytes = cached_bytes
+
+        self._thread = threading.Thread(target=self._run, args=(pending,), daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self, filepaths):
+        buffer = bytearray(READ_CHUNK_SIZE) if not self.use_fadvise else None
+        for filepath in filepaths:
+            if self._stop_event.is_set():
+                return
+            try:
+                with open(filepath, "rb", buffering=0) as file:
+                    if self.use_fadvise:
+                        os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+                    else:
+                        while file.readinto(buffer):
+                            if self._stop_event.is_set():
+                                return
+            except OSError as e:
+                log.debug("Couldn't read %s ahead: %s", filepath, e, extra={"path": filepath})
+                self.failed_files += 1
+                continue
+            self.prefetched_files += 1
+            self.prefetched_bytes += self._cold_bytes[filepath]
+
+    def stop(self):
+        '''Stops the read-ahead (the files not reached are left as they are)'''
+
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def summary(self):
+        '''Cache-hit report: how much of the files were warm for the import'''
+
+        if not self.total_bytes:
+            return "Prefetch: no files to read ahead"
+
+        cached_bytes = self.cached_bytes or 0
+        not_reached = max(0, self.total_bytes - cached_bytes - self.prefetched_bytes)
+        summary = "Prefetch ({}): {} files, {:.1f} MB. ".format(self.method, len(self._sizes), self.total_bytes / MEGABYTE)
+        if self.cached_bytes is not None:
+            summary += "{:.0f}% served warm: {:.1f} MB were cached already, {:.1f} MB read ahead".format(
+                100 * (cached_bytes + self.prefetched_bytes) / self.total_bytes,
+                cached_bytes / MEGABYTE,
+                self.prefetched_bytes / MEGABYTE,
+                )
+        else:
+            summary += "{:.1f} MB read ahead".format(self.prefetched_bytes / MEGABYTE)
+        if not_reached:
+            summary += ", {:.1f} MB not reached before the import ended".format(not_reached / MEGABYTE)
+        if self.failed_files:
+            summary += ". {} files couldn't be read".format(self.failed_files)
+        return summary
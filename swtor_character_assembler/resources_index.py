@@ -0,0 +1,219 @@
+# Persistent index of a SWTOR 'resources' folder.
+#
+# A 'resources' extraction holds hundreds of thousands of files, often
+# in a NAS, where every existence check or size query is a slow round
+# trip. This index keeps every file's relative path, size and
+# modification time in an SQLite database, so that the gathering
+# planner can check a whole character's assets without touching the
+# 'resources' folder, and report missing ones before any copying.
+#
+# Refreshing is incremental: only folders whose modification time
+# changed since the last refresh (files added, removed or renamed in
+# them) get their files' stats re-read. A full refresh re-reads all.
+#
+# Lookups are case and separator-insensitive (see normalize_path),
+# while the files' actual relative paths are kept too.
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender.
+
+
+import os
+import sqlite3
+import threading
+import time
+
+from .assembler_log import get_logger
+
+
+log = get_logger("resources_index")
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    key TEXT PRIMARY KEY,      -- normalized relative path
+    path TEXT NOT NULL,        -- actual relative path
+    folder TEXT NOT NULL,      -- normalized relative path of its folder
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+CREATE TABLE IF NOT EXISTS folders (
+    key TEXT PRIMARY KEY,
+    mtime INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS info (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def normalize_path(relative_path):
+    '''Turns a resources-relative path as written in 'paths.json' files,
+    .mat files, etc. (with slashes or backslashes, a leading one or not,
+    any casing) into the index's lookup key'''
+
+    return relative_path.replace("\\", "/").strip("/").lower()
+
+
+class ResourcesIndex:
+    '''SQLite-backed index of a 'resources' folder. Each thread gets its own
+    database connection, so that it can be refreshed in a background thread
+    while being queried from others.'''
+
+    def __init__(self, index_filepath, swtor_resources_folderpath):
+        self.index_filepath = str(index_filepath)
+        self.swtor_resources_folderpath = str(swtor_resources_folderpath)
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_filepath)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.index_filepath, timeout=30)
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+    # Queries
+
+    def is_built(self):
+        '''Whether the index has been refreshed at least once'''
+
+        row = self._connection().execute("SELECT value FROM info WHERE name = 'refreshed'").fetchone()
+        return row is not None
+
+    def last_refresh(self):
+        '''Returns the time of the last refresh (seconds since the epoch), or None'''
+
+        row = self._connection().execute("SELECT value FROM info WHERE name = 'refreshed'").fetchone()
+        return float(row[0]) if row else None
+
+    def lookup(self, relative_path):
+        '''Returns (actual relative path, size, mtime in ns) for a file, or None'''
+
+        return self._connection().execute(
+            "SELECT path, size, mtime FROM files WHERE key = ?", (normalize_path(relative_path),)
+            ).fetchone()
+
+    def lookup_many(self, relative_paths):
+        '''Returns a dict of normalized relative path → (actual relative path,
+        size, mtime) for the files that exist among the ones passed'''
+
+        keys = list(set(normalize_path(relative_path) for relative_path in relative_paths))
+        found = {}
+        connection = self._connection()
+        # SQLite limits the number of parameters per query.
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            query = "SELECT key, path, size, mtime FROM files WHERE key IN ({})".format(",".join("?" * len(chunk)))
+            for key, path, size, mtime in connection.execute(query, chunk):
+                found[key] = (path, size, mtime)
+        return found
+
+    def exists(self, relative_path):
+        return self.lookup(relative_path) is not None
+
+    def size(self, relative_path):
+        '''Returns a file's size, or None if it isn't in the index'''
+
+        found = self.lookup(relative_path)
+        return found[1] if found else None
+
+    def paths_map(self):
+        '''Returns a dict of every file's normalized relative path
+        → actual relative path'''
+
+        return dict(self._connection().execute("SELECT key, path FROM files"))
+
+    def file_count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def relative_path(self, absolute_path):
+        '''Returns the resources-relative path of an absolute path inside
+        the 'resources' folder, or None if it's outside it'''
+
+        relative_path = os.path.relpath(absolute_path, self.swtor_resources_folderpath)
+        if relative_path.startswith(".."):
+            return None
+        return relative_path
+
+
+    # Refreshing
+
+    def refresh(self, full=False, progress_callback=None):
+        '''Brings the index up to date with the 'resources' folder.
+        progress_callback, if passed, is called with the number of
+        folders visited so far every now and then.
+
+        Returns a dict with the numbers of folders visited and rescanned,
+        and the number of files in the index.'''
+
+        connection = self._connection()
+        known_folders = dict(connection.execute("SELECT key, mtime FROM folders"))
+        seen_folders = set()
+        folders_visited = 0
+        folders_rescanned = 0
+
+        pending = [""]
+        with connection:  # A single transaction
+            while pending:
+                relative_folderpath = pending.pop()
+                absolute_folderpath = os.path.join(self.swtor_resources_folderpath, relative_folderpath)
+                folder_key = normalize_path(relative_folderpath)
+                seen_folders.add(folder_key)
+
+                try:
+                    folder_mtime = os.stat(absolute_folderpath).st_mtime_ns
+                    entries = list(os.scandir(absolute_folderpath))
+                except OSError as e:
+                    log.warning("Couldn't read the folder %s: %s", absolute_folderpath, e, extra={"path": absolute_folderpath})
+                    continue
+
+                # Subfolders' changes don't change their parent's mtime,
+                # so they are always visited.
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(os.path.join(relative_folderpath, entry.name))
+
+                if full or known_folders.get(folder_key) != folder_mtime:
+                    files = []
+                    for entry in entries:
+                        if entry.is_file():
+                            try:
+                                stat = entry.stat()
+                            except OSError:
+                                continue
+                            relative_filepath = os.path.join(relative_folderpath, entry.name)
+                            files.append((normalize_path(relative_filepath), relative_filepath, folder_key, stat.st_size, stat.st_mtime_ns))
+
+                    connection.execute("DELETE FROM files WHERE folder = ?", (folder_key,))
+                    connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", files)
+                    connection.execute("INSERT OR REPLACE INTO folders VALUES (?, ?)", (folder_key, folder_mtime))
+                    folders_rescanned += 1
+
+                folders_visited += 1
+                if progress_callback and folders_visited % 200 == 0:
+                    progress_callback(folders_visited)
+
+            # Forget folders that don't exist anymore.
+            for folder_key in set(known_folders) - seen_folders:
+                connection.execute("DELETE FROM files WHERE folder = ?", (folder_key,))
+                connection.execute("DELETE FROM folders WHERE key = ?", (folder_key,))
+
+            connection.execute("INSERT OR REPLACE INTO info VALUES ('refreshed', ?)", (str(time.time()),))
+
+        return {
+            "folders_visited": folders_visited,
+            "folders_rescanned": folders_rescanned,
+            "files": self.file_count(),
+        }
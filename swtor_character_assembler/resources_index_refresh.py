@@ -0,0 +1,126 @@
+import bpy
+import hashlib
+import threading
+from pathlib import Path
+
+from .resources_index import ResourcesIndex
+from .assembler_log import get_logger
+
+
+log = get_logger("resources_index")
+
+
+# Status of the background refresh, for the Preferences panel to show.
+refresh_status = {"running": False, "text": ""}
+_refresh_thread = None
+
+
+# Aux Functions
+
+def resources_index_filepath(swtor_resources_folderpath):
+    '''Returns the index database's path for a 'resources' folder.
+    There is one per 'resources' folder, in Blender's user data folder.'''
+
+    folder_hash = hashlib.sha1(str(Path(swtor_resources_folderpath).resolve()).encode("utf-8")).hexdigest()[:12]
+    datafiles_folderpath = bpy.utils.user_resource('DATAFILES', path=__package__, create=True)
+    return str( Path(datafiles_folderpath) / ("resources_index_" + folder_hash + ".sqlite") )
+
+
+def get_resources_index(swtor_preferences):
+    '''Returns the ResourcesIndex for the 'resources' folder in the
+    add-on's preferences if its use is enabled and it has been built
+    already, and None otherwise'''
+
+    if not swtor_preferences.use_resources_index or refresh_status["running"]:
+        return None
+    swtor_resources_folderpath = swtor_preferences.swtor_resources_folderpath
+    if not ( Path(swtor_resources_folderpath) / "art/shaders/materials").exists():
+        return None
+    index_filepath = resources_index_filepath(swtor_resources_folderpath)
+    if not Path(index_filepath).exists():
+        return None
+    resources_index = ResourcesIndex(index_filepath, swtor_resources_folderpath)
+    return resources_index if resources_index.is_built() else None
+
+
+def _refresh(index_filepath, swtor_resources_folderpath, full):
+    # Runs in a background thread: it mustn't touch bpy.
+    def progress(folders_visited):
+        refresh_status["text"] = "Indexing 'resources': {} folders visited…".format(folders_visited)
+
+    try:
+        resources_index = ResourcesIndex(index_filepath, swtor_resources_folderpath)
+        results = resources_index.refresh(full=full, progress_callback=progress)
+        resources_index.close()
+        refresh_status["text"] = "'resources' index up to date: {} files ({} of {} folders rescanned).".format(
+            results["files"], results["folders_rescanned"], results["folders_visited"]
+            )
+        log.info(refresh_status["text"])
+    except Exception as e:
+        refresh_status["text"] = "ERROR indexing 'resources': " + str(e)
+        log.error(refresh_status["text"])
+    refresh_status["running"] = False
+
+
+def start_refresh(swtor_resources_folderpath, full=False):
+    '''Starts refreshing the index of a 'resources' folder in a background
+    thread, unless a refresh is running already. Returns whether it started.'''
+
+    global _refresh_thread
+    if refresh_status["running"]:
+        return False
+
+    refresh_status["running"] = True
+    refresh_status["text"] = "Indexing 'resources'…"
+    _refresh_thread = threading.Thread(
+        target=_refresh,
+        args=(resources_index_filepath(swtor_resources_folderpath), swtor_resources_folderpath, full),
+        daemon=True,
+        )
+    _refresh_thread.start()
+    return True
+
+
+
+class SWTOR_OT_resources_index_refresh(bpy.types.Operator):
+
+    bl_idname = "swtor.resources_index_refresh"
+    bl_label = "Refresh 'resources' Index"
+    bl_description = "Updates the index of the 'resources' folder's files in the background.\nOnly folders with added, removed or renamed files are re-read,\nunless a full refresh is requested.\n\n• Requires setting the path to a 'resources' folder in this addon's Preferences"
+    bl_options = {'REGISTER'}
+
+    full: bpy.props.BoolProperty(
+        name="Full Refresh",
+        description="Re-read every file's size and date, not just the ones in changed folders",
+        default = False,
+        options={'HIDDEN'}
+    )
+
+    @classmethod
+    def poll(cls,context):
+        swtor_resources_folderpath = context.preferences.addons[__package__].preferences.swtor_resources_folderpath
+        return ( Path(swtor_resources_folderpath) / "art/shaders/materials").exists() and not refresh_status["running"]
+
+
+    def execute(self, context):
+        swtor_resources_folderpath = context.preferences.addons[__package__].preferences.swtor_resources_folderpath
+        if start_refresh(swtor_resources_folderpath, full=self.full):
+            self.report({'INFO'}, "Indexing the 'resources' folder in the background")
+        else:
+            self.report({'WARNING'}, "The 'resources' folder is being indexed already")
+        return {'FINISHED'}
+
+
+# UI is set in preferences.py
+
+
+# Registrations
+
+def register():
+    bpy.utils.register_class(SWTOR_OT_resources_index_refresh)
+
+def unregister():
+    bpy.utils.unregister_class(SWTOR_OT_resources_index_refresh)
+
+if __name__ == "__main__":
+    register()
@@ -0,0 +1,150 @@
+# Texture memory estimates for the Character Assembler.
+#
+# Before importing a character, we can tell how much memory its
+# textures will take from their .dds headers alone (see dds_file):
+# Blender decodes each image into an uncompressed RGBA buffer (8 bits
+# per channel, or 32-bit floats for HDR formats) in RAM, and uploads
+# it, plus its mipmaps, as a GPU texture when displayed.
+#
+# The estimates are tallied per slot (head, chest, skinMats…), and a
+# memory budget can be met by gathering the biggest textures at a
+# proxy resolution: fit_texture_budget drops one mip level at a time
+# from whichever texture takes the most memory, until the total fits.
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender.
+
+
+import heapq
+
+from .dds_file import proxy_levels_to_drop
+
+
+# Bytes per pixel once decoded by Blender
+DECODED_BYTES_PER_PIXEL = 4
+DECODED_FLOAT_BYTES_PER_PIXEL = 16
+
+# DXGI formats Blender decodes to float buffers (BC6H, 16 and 32-bit float)
+FLOAT_DXGI_FORMATS = {2, 10, 94, 95, 96}
+
+# GPU textures hold their mip chain too: a third more
+GPU_MIPMAPS_FACTOR = 4 / 3
+
+MEGABYTE = 1024 * 1024
+
+
+def decoded_memory(info, level=0):
+    '''Estimated bytes that a texture (a dds_file.DdsInfo) takes in RAM
+    once loaded, with its largest level being the given mip level'''
+
+    width, height = info.level_dimensions(level)
+    if info.dxgi_format in FLOAT_DXGI_FORMATS:
+        bytes_per_pixel = DECODED_FLOAT_BYTES_PER_PIXEL
+    else:
+        bytes_per_pixel = DECODED_BYTES_PER_PIXEL
+    return width * height * bytes_per_pixel * info.faces
+
+
+def gathered_level(info, max_texture_size=0):
+    '''Largest mip level a texture keeps when gathered at a proxy resolution.
+    Textures whose layout isn't supported are gathered whole (see
+    dds_file.write_proxy_dds).'''
+
+    if not (max_texture_size and info.is_supported):
+        return 0
+    return proxy_levels_to_drop(info, max_texture_size)
+
+
+class TextureMemoryEstimate:
+    '''Estimated memory of a character's textures, in total and per slot'''
+
+    __slots__ = ("ram", "vram", "slots", "textures", "downscaled")
+
+    def __init__(self):
+        self.ram = 0
+        self.vram = 0
+        self.slots = {}  # Slot name → RAM bytes
+        self.textures = 0
+        self.downscaled = 0  # Textures set to a lower resolution to fit a budget
+
+    def add(self, slot_name, ram):
+        self.ram += ram
+        self.vram += int(ram * GPU_MIPMAPS_FACTOR)
+        self.slots[slot_name] = self.slots.get(slot_name, 0) + ram
+        self.textures += 1
+
+    def slots_by_size(self):
+        '''List of (slot name, RAM bytes), largest first'''
+        return sorted(self.slots.items(), key=lambda slot: slot[1], reverse=True)
+
+    def summary(self):
+        summary = "Texture memory estimate: {:.0f} MB in RAM, {:.0f} MB in VRAM ({} textures)".format(
+            self.ram / MEGABYTE,
+            self.vram / MEGABYTE,
+            self.textures,
+            )
+        if self.downscaled:
+            summary += ". {} textures downscaled to fit the memory budget".format(self.downscaled)
+        return summary
+
+    def slots_report(self):
+        return "\n".join("     {:>8.1f} MB  {}".format(ram / MEGABYTE, slot_name) for slot_name, ram in self.slots_by_size())
+
+
+def _slot_name(entry):
+    # Skin materials' slots are "skinMats: <material>": tally them together.
+    return entry.slot_name.split(":")[0]
+
+
+def estimate_texture_memory(texture_infos, max_texture_size=0):
+    '''Returns the TextureMemoryEstimate of a list of (GatherEntry, DdsInfo)
+    (see gather_planner.GatherPlan.texture_infos), honoring the proxy
+    resolution they'll be gathered at: either max_texture_size or the
+    entries' own max_texture_size, if set.'''
+
+    estimate = TextureMemoryEstimate()
+    for entry, info in texture_infos:
+        entry_max_texture_size = entry.max_texture_size if entry.max_texture_size is not None else max_texture_size
+        estimate.add(_slot_name(entry), decoded_memory(info, gathered_level(info, entry_max_texture_size)))
+        if entry.max_texture_size is not None:
+            estimate.downscaled += 1
+    return estimate
+
+
+def fit_texture_budget(texture_infos, budget, max_texture_size=0):
+    '''Lowers the resolution of the biggest textures in a list of
+    (GatherEntry, DdsInfo) until their estimated RAM use fits the
+    budget (in bytes), one mip level at a time, by setting their
+    entries' max_texture_size. Textures without more mip levels to
+    drop, or whose layout isn't supported, are left as they are (and
+    count whole). Returns the number of entries set.'''
+
+    levels = {}
+    total = 0
+    heap = []
+    for index, (entry, info) in enumerate(texture_infos):
+        entry.max_texture_size = None
+        level = gathered_level(info, max_texture_size)
+        levels[index] = level
+        ram = decoded_memory(info, level)
+        total += ram
+        if info.is_supported:
+            heapq.heappush(heap, (-ram, index))
+
+    while total > budget and heap:
+        negative_ram, index = heapq.heappop(heap)
+        entry, info = texture_infos[index]
+        level = levels[index]
+        if level >= info.mip_count - 1:
+            continue  # Can't go lower.
+        levels[index] = level + 1
+        ram = decoded_memory(info, level + 1)
+        total += ram + negative_ram
+        heapq.heappush(heap, (-ram, index))
+
+    downscaled = 0
+    for index, (entry, info) in enumerate(texture_infos):
+        if levels[index] > gathered_level(info, max_texture_size):
+            entry.max_texture_size = max(info.level_dimensions(levels[index]))
+            downscaled += 1
+    return downscaled
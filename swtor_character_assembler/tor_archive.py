@@ -0,0 +1,412 @@
+# Reading of assets straight from SWTOR's .tor (MYP) game archives.
+#
+# Instead of a full 'resources' extraction (hundreds of thousands of
+# files, redone after every game patch), the Character Assembler can
+# extract just the files a character needs from the game's Assets
+# folder's .tor archives, into a small, growing 'resources'-like
+# folder that the rest of the add-on uses as usual (see
+# asset_sources.TorSource).
+#
+# A .tor archive holds its files' table of contents (TOC) as a chain
+# of blocks of fixed-size entries. Entries don't hold filenames, just
+# a 64-bit hash of them (see hash_filename), which is all we need, as
+# we always know which files we want. The TOCs of all the archives
+# are merged into an index file, sorted by hash, that is rebuilt only
+# when the archives change (that is, after a game patch) and is
+# searched through a memory map, so that the million-plus entries of
+# a game installation never have to be loaded as Python objects.
+#
+# The format, as documented by the community's extraction tools:
+#
+#   Archive header (little-endian):
+#       0x00  uint32  magic, "MYP\0"
+#       0x04  uint32  version (5)
+#       0x08  uint32  byte order mark (0xFD23EC43)
+#       0x0C  uint64  offset of the first TOC block
+#       0x14  uint32  files capacity
+#       0x18  uint32  files count
+#
+#   TOC block:
+#       uint32  number of entries in the block
+#       uint64  offset of the next block (0 if last)
+#       entries, 34 bytes each:
+#           uint64  offset of the file's header
+#           uint32  size of the file's header (the data follows it)
+#           uint32  compressed size
+#           uint32  uncompressed size
+#           uint32  filename hash's secondary half
+#           uint32  filename hash's primary half
+#           uint32  CRC
+#           uint16  compression (0: none, 1: zlib)
+#
+# write_tor_archive creates archives in this format, for testing.
+#
+# This module doesn't depend on bpy, so that it can be used and
+# tested outside Blender.
+
+
+import os
+import json
+import mmap
+import glob
+import zlib
+import struct
+import threading
+
+from .resources_index import normalize_path
+from .assembler_log import get_logger
+
+
+log = get_logger("tor_archive")
+
+
+MYP_MAGIC = 0x0050594D
+MYP_VERSION = 5
+MYP_BOM = 0xFD23EC43
+
+_HEADER = struct.Struct("<IIIQII")
+_BLOCK_HEADER = struct.Struct("<IQ")
+_ENTRY = struct.Struct("<QIIIIIIH")
+
+NO_COMPRESSION = 0
+ZLIB_COMPRESSION = 1
+
+# Index file: header, JSON list of the indexed archives, then the
+# records sorted by hash, 8-byte aligned.
+INDEX_MAGIC = b"SWCATOC1"
+_INDEX_HEADER = struct.Struct("<8sQI")
+_RECORD = struct.Struct("<QQIIHH4x")  # hash, data offset, compressed size, uncompressed size, archive, compression
+
+TOR_INDEX_FILENAME = "tor_index.bin"
+
+_M32 = 0xFFFFFFFF
+
+
+class TorArchiveError(Exception):
+    pass
+
+
+
+# Filenames' hashing (Bob Jenkins' lookup3 hashlittle2)
+
+def _rot(x, k):
+    return ((x << k) | (x >> (32 - k))) & _M32
+
+
+def hashlittle2(data, pc=0, pb=0):
+    '''Returns the (primary, secondary) 32-bit hashes of some bytes'''
+
+    length = len(data)
+    a = b = c = (0xDEADBEEF + length + pc) & _M32
+    c = (c + pb) & _M32
+
+    i = 0
+    while length > 12:
+        a = (a + int.from_bytes(data[i:i + 4], "little")) & _M32
+        b = (b + int.from_bytes(data[i + 4:i + 8], "little")) & _M32
+        c = (c + int.from_bytes(data[i + 8:i + 12], "little")) & _M32
+        a = (a - c) & _M32; a ^= _rot(c, 4);  c = (c + b) & _M32
+        b = (b - a) & _M32; b ^= _rot(a, 6);  a = (a + c) & _M32
+        c = (c - b) & _M32; c ^= _rot(b, 8);  b = (b + a) & _M32
+        a = (a - c) & _M32; a ^= _rot(c, 16); c = (c + b) & _M32
+        b = (b - a) & _M32; b ^= _rot(a, 19); a = (a + c) & _M32
+        c = (c - b) & _M32; c ^= _rot(b, 4);  b = (b + a) & _M32
+        length -= 12
+        i += 12
+
+    if length == 0:
+        return c, b
+
+    tail = data[i:] + b"\0" * (12 - length)
+    a = (a + int.from_bytes(tail[0:4], "little")) & _M32
+    b = (b + int.from_bytes(tail[4:8], "little")) & _M32
+    c = (c + int.from_bytes(tail[8:12], "little")) & _M32
+    c ^= b; c = (c - _rot(b, 14)) & _M32
+    a ^= c; a = (a - _rot(c, 11)) & _M32
+    b ^= a; b = (b - _rot(a, 25)) & _M32
+    c ^= b; c = (c - _rot(b, 16)) & _M32
+    a ^= c; a = (a - _rot(c, 4)) & _M32
+    b ^= a; b = (b - _rot(a, 14)) & _M32
+    c ^= b; c = (c - _rot(b, 24)) & _M32
+    return c, b
+
+
+def tor_filename(asset_path):
+    '''Returns a file's name as hashed in the archives, asset_path being
+    as written in 'paths.json', .mat files, etc. (relative to 'resources')'''
+
+    return "/resources/" + normalize_path(asset_path)
+
+
+def hash_filename(asset_path):
+    '''Returns the 64-bit hash a file is listed by in the archives'''
+
+    primary, secondary = hashlittle2(tor_filename(asset_path).encode("utf-8"))
+    return (primary << 32) | secondary
+
+
+
+# Archives
+
+def read_toc(archive_file):
+    '''Yields (hash, data offset, compressed size, uncompressed size,
+    compression) for every file in an open .tor archive'''
+
+    archive_file.seek(0)
+    header = archive_file.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise TorArchiveError("Not a .tor archive (too short)")
+    magic, version, bom, block_offset, _, _ = _HEADER.unpack(header)
+    if magic != MYP_MAGIC:
+        raise TorArchiveError("Not a .tor archive (wrong magic number)")
+
+    visited = set()
+    while block_offset:
+        if block_offset in visited:
+            raise TorArchiveError("Corrupt .tor archive (looping TOC blocks)")
+        visited.add(block_offset)
+
+        archive_file.seek(block_offset)
+        entries_count, next_block_offset = _BLOCK_HEADER.unpack(archive_file.read(_BLOCK_HEADER.size))
+        block = archive_file.read(entries_count * _ENTRY.size)
+        for (offset, header_size, compressed_size, uncompressed_size,
+             secondary, primary, crc, compression) in _ENTRY.iter_unpack(block[:len(block) - len(block) % _ENTRY.size]):
+            if offset == 0:
+                continue  # Unused slot
+            yield (primary << 32) | secondary, offset + header_size, compressed_size, uncompressed_size, compression
+        block_offset = next_block_offset
+
+
+def write_tor_archive(archive_filepath, files, compress=True, entries_per_block=1000):
+    '''Writes a .tor archive holding files, a dict of asset path →
+    contents (bytes). Meant for testing.'''
+
+    with open(archive_filepath, "wb") as archive_file:
+        archive_file.write(b"\0" * _HEADER.size)
+
+        toc = []
+        for asset_path, contents in files.items():
+            data = zlib.compress(contents) if compress else contents
+            offset = archive_file.tell()
+            file_header = b"\0" * 16
+            archive_file.write(file_header)
+            archive_file.write(data)
+            filename_hash = hash_filename(asset_path)
+            toc.append((
+                offset,
+                len(file_header),
+                len(data),
+                len(contents),
+                filename_hash & _M32,
+                filename_hash >> 32,
+                zlib.crc32(contents),
+                ZLIB_COMPRESSION if compress else NO_COMPRESSION,
+                ))
+
+        first_block_offset = archive_file.tell() if toc else 0
+        blocks = [toc[start:start + entries_per_block] for start in range(0, len(toc), entries_per_block)]
+        for block_index, block in enumerate(blocks):
+            block_offset = archive_file.tell()
+            block_size = _BLOCK_HEADER.size + entries_per_block * _ENTRY.size
+            next_block_offset = block_offset + block_size if block_index < len(blocks) - 1 else 0
+            archive_file.write(_BLOCK_HEADER.pack(entries_per_block, next_block_offset))
+            for entry in block:
+                archive_file.write(_ENTRY.pack(*entry))
+            archive_file.write(b"\0" * (_ENTRY.size * (entries_per_block - len(block))))
+
+        archive_file.seek(0)
+        archive_file.write(_HEADER.pack(MYP_MAGIC, MYP_VERSION, MYP_BOM, first_block_offset, len(blocks) * entries_per_block, len(toc)))
+
+
+def find_archives(tor_folderpath):
+    '''Returns the sorted paths of the .tor archives in a folder
+    (typically, the game's 'Assets' folder)'''
+
+    return sorted(glob.glob(os.path.join(str(tor_folderpath), "*.tor")))
+
+
+
+# Index
+
+class TorIndex:
+    '''Merged, memory-mapped TOC index of the .tor archives in a folder.
+    Thread-safe for reading.'''
+
+    def __init__(self, tor_folderpath, index_filepath):
+        self.tor_folderpath = str(tor_folderpath)
+        self.index_filepath = str(index_filepath)
+        self.archives = []  # Archives' paths, as referenced by the records
+        self._index_file = None
+        self._index_map = None
+        self._records_offset = 0
+        self._count = 0
+        self._archive_maps = {}
+        self._signature = None
+        self._lock = threading.Lock()
+
+        archives_signature = self._archives_signature()
+        if not self._open(archives_signature):
+            self.rebuild(archives_signature)
+            if not self._open(archives_signature):
+                raise TorArchiveError("The .tor archives' index couldn't be opened: " + self.index_filepath)
+
+    def _archives_signature(self):
+        signature = []
+        for archive_filepath in find_archives(self.tor_folderpath):
+            stat = os.stat(archive_filepath)
+            signature.append([archive_filepath, stat.st_size, stat.st_mtime_ns])
+        return signature
+
+    def _open(self, archives_signature):
+        '''Opens the index file if it exists and matches the archives'''
+
+        self.close()
+        try:
+            index_file = open(self.index_filepath, "rb")
+        except OSError:
+            return False
+        try:
+            magic, count, signature_length = _INDEX_HEADER.unpack(index_file.read(_INDEX_HEADER.size))
+            signature = json.loads(index_file.read(signature_length).decode("utf-8"))
+            if magic != INDEX_MAGIC or signature != archives_signature:
+                index_file.close()
+                return False
+            records_offset = _align(_INDEX_HEADER.size + signature_length)
+            index_map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) if count else None
+        except Exception:
+            index_file.close()
+            return False
+
+        self._index_file = index_file
+        self._index_map = index_map
+        self._records_offset = records_offset
+        self._count = count
+        self.archives = [archive_filepath for archive_filepath, _, _ in signature]
+        self._signature = signature
+        return True
+
+    def changed(self):
+        '''Whether the archives changed since the index was opened'''
+
+        return self._archives_signature() != self._signature
+
+    def refresh(self):
+        '''Rebuilds the index if the archives changed since it was opened
+        (a game patch, typically). Closes the memory maps of the index and
+        archives, so nothing may be reading through them meanwhile.'''
+
+        archives_signature = self._archives_signature()
+        if archives_signature != self._signature:
+            self.rebuild(archives_signature)
+            if not self._open(archives_signature):
+                raise TorArchiveError("The .tor archives' index couldn't be opened: " + self.index_filepath)
+
+    def rebuild(self, archives_signature=None):
+        '''Reads every archive's TOC and writes the index file anew'''
+
+        if archives_signature is None:
+            archives_signature = self._archives_signature()
+        log.info("Indexing the .tor archives in %s…", self.tor_folderpath)
+
+        records = {}
+        for archive_index, (archive_filepath, _, _) in enumerate(archives_signature):
+            try:
+                with open(archive_filepath, "rb") as archive_file:
+                    for filename_hash, data_offset, compressed_size, uncompressed_size, compression in read_toc(archive_file):
+                        # Later archives (patches, typically) win.
+                        records[filename_hash] = (data_offset, compressed_size, uncompressed_size, archive_index, compression)
+            except (OSError, TorArchiveError, struct.error) as e:
+                log.warning("Couldn't read the .tor archive %s: %s", archive_filepath, e)
+
+        signature_bytes = json.dumps(archives_signature).encode("utf-8")
+        records_offset = _align(_INDEX_HEADER.size + len(signature_bytes))
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_filepath)), exist_ok=True)
+        temporary_filepath = self.index_filepath + ".tmp"
+        with open(temporary_filepath, "wb") as index_file:
+            index_file.write(_INDEX_HEADER.pack(INDEX_MAGIC, len(records), len(signature_bytes)))
+            index_file.write(signature_bytes)
+            index_file.write(b"\0" * (records_offset - _INDEX_HEADER.size - len(signature_bytes)))
+            for filename_hash in sorted(records):
+                data_offset, compressed_size, uncompressed_size, archive_index, compression = records[filename_hash]
+                index_file.write(_RECORD.pack(filename_hash, data_offset, compressed_size, uncompressed_size, archive_index, compression))
+
+        self.close()
+        os.replace(temporary_filepath, self.index_filepath)
+        log.info("%s files indexed in %s .tor archives.", len(records), len(archives_signature))
+
+    def close(self):
+        with self._lock:
+            for archive_map, archive_file in self._archive_maps.values():
+                archive_map.close()
+                archive_file.close()
+            self._archive_maps = {}
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_map = None
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _hash_at(self, position):
+        return struct.unpack_from("<Q", self._index_map, self._records_offset + position * _RECORD.size)[0]
+
+    def lookup(self, asset_path):
+        '''Returns (data offset, compressed size, uncompressed size,
+        archive's path, compression) for a file, or None'''
+
+        if not self._count:
+            return None
+        filename_hash = hash_filename(asset_path)
+
+        # Binary search over the memory-mapped records
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._hash_at(middle) < filename_hash:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self._count or self._hash_at(low) != filename_hash:
+            return None
+
+        _, data_offset, compressed_size, uncompressed_size, archive_index, compression = _RECORD.unpack_from(
+            self._index_map, self._records_offset + low * _RECORD.size
+            )
+        return data_offset, compressed_size, uncompressed_size, self.archives[archive_index], compression
+
+    def exists(self, asset_path):
+        return self.lookup(asset_path) is not None
+
+    def _archive_map(self, archive_filepath):
+        with self._lock:
+            if archive_filepath not in self._archive_maps:
+                archive_file = open(archive_filepath, "rb")
+                self._archive_maps[archive_filepath] = (mmap.mmap(archive_file.fileno(), 0, access=mmap.ACCESS_READ), archive_file)
+            return self._archive_maps[archive_filepath][0]
+
+    def read(self, asset_path):
+        '''Returns a file's contents. Raises FileNotFoundError if it
+        isn't in the archives, and TorArchiveError if it can't be read.'''
+
+        found = self.lookup(asset_path)
+        if found is None:
+            raise FileNotFoundError("Not found in the .tor archives: " + tor_filename(asset_path))
+        data_offset, compressed_size, uncompressed_size, archive_filepath, compression = found
+
+        data = self._archive_map(archive_filepath)[data_offset:data_offset + compressed_size]
+        if compression == ZLIB_COMPRESSION:
+            data = zlib.decompress(data)
+        elif compression != NO_COMPRESSION:
+            raise TorArchiveError("Unsupported compression ({}) of {}".format(compression, tor_filename(asset_path)))
+        if len(data) != uncompressed_size:
+            raise TorArchiveError("Corrupt data in the .tor archives for " + tor_filename(asset_path))
+        return data
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
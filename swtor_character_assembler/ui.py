@@ -2,6 +2,14 @@ import bpy
 import addon_utils
 from pathlib import Path
 
+from . import character_assembler
+from .texture_memory import MEGABYTE
+from .asset_sources import has_tor_archives
+
+
+# Slots listed in the panel's texture memory estimate
+MAX_SLOTS_SHOWN = 6
+
 
 class SWTOR_PT_files_tools(bpy.types.Panel):
     bl_space_type = "VIEW_3D"
@@ -16,6 +24,11 @@ class SWTOR_PT_files_tools(bpy.types.Panel):
         # Extracted SWTOR assets' "resources" folder. 
         swtor_resources_folderpath = bpy.context.preferences.addons[__package__].preferences.swtor_resources_folderpath
         resources_folder_exists = ( Path(swtor_resources_folderpath) / "art/shaders/materials").exists()
+        # Or, instead, the game's .tor archives
+        swtor_tor_folderpath = bpy.context.preferences.addons[__package__].preferences.swtor_tor_folderpath
+        tor_archives_exist = has_tor_archives(swtor_tor_folderpath)
+        # Or additional asset sources (folders, .zip archives, servers)
+        asset_sources_set = bool(bpy.context.preferences.addons[__package__].preferences.asset_sources.strip())
         
         # .gr2 Importer Addon
         modern_gr2_addon_is_enabled = addon_utils.check("io_scene_gr2")[1]
@@ -37,6 +50,10 @@ class SWTOR_PT_files_tools(bpy.types.Panel):
         swtor_addon_status.alert = False  # Reset alert
         if resources_folder_exists:
             swtor_addon_status.label(text="• 'resources' Folder: SET")
+        elif tor_archives_exist:
+            swtor_addon_status.label(text="• Game's .tor Archives: SET")
+        elif asset_sources_set:
+            swtor_addon_status.label(text="• Asset Sources: SET")
         else:
             swtor_addon_status.alert = True
             swtor_addon_status.label(text="• 'resources' Folder: NOT SET")
@@ -65,6 +82,11 @@ class SWTOR_PT_files_tools(bpy.types.Panel):
         # Extracted SWTOR assets' "resources" folder. 
         swtor_resources_folderpath = bpy.context.preferences.addons[__package__].preferences.swtor_resources_folderpath
         resources_folder_exists = ( Path(swtor_resources_folderpath) / "art/shaders/materials").exists()
+        # Or, instead, the game's .tor archives
+        swtor_tor_folderpath = bpy.context.preferences.addons[__package__].preferences.swtor_tor_folderpath
+        tor_archives_exist = has_tor_archives(swtor_tor_folderpath)
+        # Or additional asset sources
+        asset_sources_set = bool(bpy.context.preferences.addons[__package__].preferences.asset_sources.strip())
         # .gr2 Importer Addon
         modern_gr2_addon_is_enabled = addon_utils.check("io_scene_gr2")[1]
 
@@ -72,11 +94,14 @@ class SWTOR_PT_files_tools(bpy.types.Panel):
         # character_assembler UI
         tool_section = layout.box().column(align=True)
         tool_section.scale_y = 1.0
-        tool_section.enabled = resources_folder_exists
+        tool_section.enabled = resources_folder_exists or tor_archives_exist or asset_sources_set
         tool_section.alert = tool_section.enabled is False
         
         tool_section.label(text="Character Assembler")
-        tool_section.operator("swtor.character_assembler", text="Select 'paths.json' File")
+        if context.scene.swca_non_blocking_bool:
+            tool_section.operator("swtor.character_assembler_modal", text="Select 'paths.json' File")
+        else:
+            tool_section.operator("swtor.character_assembler", text="Select 'paths.json' File")
         # tool_section.prop(context.scene, "swca_prefix_str", text="Prefix")
 
         tool_section_props = tool_section.column(align=True)
@@ -87,6 +112,23 @@ class SWTOR_PT_files_tools(bpy.types.Panel):
         tool_section_props.prop(context.scene, "swca_import_armor_only", text="Import Armor Gear Only")
         tool_section_props.prop(context.scene, "swca_import_skeleton_bool", text="Import Rigging Skeleton")
         tool_section_props.prop(context.scene, "swca_bind_to_skeleton_bool", text="Bind Objects To Skeleton",)
+        tool_section_props.prop(context.scene, "swca_non_blocking_bool", text="Don't Block Blender")
+        tool_section_props.prop(context.scene, "swca_proxy_resolution", text="Textures")
+
+        # Texture memory estimate of the last character gathered or estimated
+        estimate_section = tool_section.column(align=True)
+        estimate_section.scale_y = 0.75
+        estimate_section.separator()
+        estimate_section.operator("swtor.estimate_texture_memory", text="Estimate Texture Memory")
+        last_texture_estimate = character_assembler.last_texture_estimate
+        texture_estimate = last_texture_estimate["estimate"]
+        if texture_estimate:
+            estimate_section.label(text="{}:".format(last_texture_estimate["character"]))
+            estimate_section.label(text="• RAM {:.0f} MB, VRAM {:.0f} MB".format(texture_estimate.ram / MEGABYTE, texture_estimate.vram / MEGABYTE))
+            for slot_name, ram in texture_estimate.slots_by_size()[:MAX_SLOTS_SHOWN]:
+                estimate_section.label(text="   {}: {:.0f} MB".format(slot_name, ram / MEGABYTE))
+            if texture_estimate.downscaled:
+                estimate_section.label(text="• {} textures downscaled".format(texture_estimate.downscaled))
         
 
 
@@ -120,6 +162,31 @@ class SWTOR_PT_renaming_tools(bpy.types.Panel):
 
 
 
+class SWTOR_PT_deduplication_tools(bpy.types.Panel):
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "SWTOR Character Tools"
+    bl_label = "Deduplication Tools"
+
+    def draw(self, context):
+
+        layout = self.layout        
+        tool_section = layout.box()
+
+        col_info=tool_section.column(align=False)
+        col_info.scale_y = 0.7
+        col_info.label(text="After importing several characters,")
+        col_info.label(text="merge their duplicate data to")
+        col_info.label(text="save memory.")
+
+        col=tool_section.column(align=True)
+        col.operator("swtor.deduplicate_meshes", text="Deduplicate Meshes")
+        col.operator("swtor.deduplicate_images", text="Deduplicate Images")
+
+
+
+
+
 class SWTOR_PT_baking_tools(bpy.types.Panel):
     bl_space_type = "VIEW_3D"
     bl_region_type = "UI"
@@ -164,6 +231,7 @@ class SWTOR_PT_baking_tools(bpy.types.Panel):
 classes = [
     SWTOR_PT_files_tools,
     SWTOR_PT_renaming_tools,
+    SWTOR_PT_deduplication_tools,
     SWTOR_PT_baking_tools,
 ]
 
@@ -0,0 +1,16 @@
+# The add-on's __init__ imports bpy, which is only available inside
+# Blender. The modules tested here don't depend on it, so the package
+# is registered without running its __init__.
+
+import sys
+import types
+from pathlib import Path
+
+
+PACKAGE_NAME = "swtor_character_assembler"
+PACKAGE_FOLDERPATH = Path(__file__).resolve().parent.parent / PACKAGE_NAME
+
+if PACKAGE_NAME not in sys.modules:
+    package = types.ModuleType(PACKAGE_NAME)
+    package.__path__ = [str(PACKAGE_FOLDERPATH)]
+    sys.modules[PACKAGE_NAME] = package
@@ -0,0 +1,188 @@
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from swtor_character_assembler.asset_sources import HttpSource, LocalFolderSource, OverlaySource, TorSource, get_tor_index
+from swtor_character_assembler.tor_archive import write_tor_archive
+
+
+ASSETS = {
+    "art/shaders/materials/chest.mat": b"<Material/>",
+    "art/textures/chest_d.dds": b"DDS " + bytes(range(256)) * 64,
+    }
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Persistent connections
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path):
+    '''An HTTP server mirroring a 'resources' folder. Returns
+    (base URL, mirrored folder).'''
+
+    mirrored = tmp_path / "mirror" / "resources"
+    for asset_path, contents in ASSETS.items():
+        filepath = mirrored.joinpath(*asset_path.split("/"))
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        filepath.write_bytes(contents)
+
+    http_server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_Handler, directory=str(tmp_path / "mirror")))
+    thread = threading.Thread(target=http_server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield "http://127.0.0.1:{}/resources/".format(http_server.server_address[1]), mirrored
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+
+
+def test_rejects_other_urls(tmp_path):
+    with pytest.raises(ValueError):
+        HttpSource("ftp://example.com/resources", tmp_path / "cache")
+
+
+def test_fetch(server, tmp_path):
+    base_url, _ = server
+    source = HttpSource(base_url, tmp_path / "cache")
+    try:
+        filepath = source.locate("\\art\\shaders\\materials\\chest.mat")
+        assert not os.path.exists(filepath)
+        assert source.fetch_local(filepath) == filepath
+        with open(filepath, "rb") as fetched_file:
+            assert fetched_file.read() == ASSETS["art/shaders/materials/chest.mat"]
+        assert source.fetched == 1
+
+        # Fetched once per instance
+        source.fetch_local(filepath)
+        assert source.fetched == 1
+        assert source.requests == 1
+    finally:
+        source.close()
+
+
+def test_missing_and_exists(server, tmp_path):
+    base_url, _ = server
+    source = HttpSource(base_url, tmp_path / "cache")
+    try:
+        assert source.exists("\\art\\textures\\chest_d.dds")
+        assert not source.exists("\\art\\textures\\missing.dds")
+        with pytest.raises(FileNotFoundError):
+            source.fetch_local(source.locate("\\art\\textures\\missing.dds"))
+        # Unfetchable assets resolve to where they'd be, for the copying to report them.
+        assert not os.path.exists(source.resolve("\\art\\textures\\missing.dds"))
+    finally:
+        source.close()
+
+
+def test_concurrent_fetches_reuse_connections(server, tmp_path):
+    base_url, _ = server
+    source = HttpSource(base_url, tmp_path / "cache", max_connections=2)
+    try:
+        filepaths = [source.locate(asset_path) for asset_path in ASSETS] * 8
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(source.fetch_local, filepaths))
+        assert source.fetched == len(ASSETS)
+        assert source.requests == len(ASSETS)
+        assert source._connections.qsize() <= 2
+        for asset_path, contents in ASSETS.items():
+            with open(source.local_path(asset_path), "rb") as fetched_file:
+                assert fetched_file.read() == contents
+    finally:
+        source.close()
+
+
+def test_cache_reused_across_instances(server, tmp_path):
+    base_url, mirrored = server
+    source = HttpSource(base_url, tmp_path / "cache")
+    source.resolve("\\art\\textures\\chest_d.dds")
+    source.save()
+    source.close()
+
+    # Reused as is
+    source = HttpSource(base_url, tmp_path / "cache")
+    source.resolve("\\art\\textures\\chest_d.dds")
+    assert (source.fetched, source.reused, source.requests) == (0, 1, 0)
+    source.close()
+
+    # Revalidated with a conditional request
+    source = HttpSource(base_url, tmp_path / "cache", revalidate=True)
+    source.resolve("\\art\\textures\\chest_d.dds")
+    assert (source.fetched, source.reused, source.requests) == (0, 1, 1)
+    source.close()
+
+    # Changed in the server
+    changed = mirrored / "art" / "textures" / "chest_d.dds"
+    changed.write_bytes(b"DDS changed")
+    stat = os.stat(changed)
+    os.utime(changed, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 10))
+    source = HttpSource(base_url, tmp_path / "cache", revalidate=True)
+    filepath = source.resolve("\\art\\textures\\chest_d.dds")
+    assert source.fetched == 1
+    with open(filepath, "rb") as fetched_file:
+        assert fetched_file.read() == b"DDS changed"
+    source.close()
+
+
+def test_overlay_over_local_folder(server, tmp_path):
+    base_url, _ = server
+    local_resources = tmp_path / "resources"
+    local_filepath = local_resources / "art" / "textures" / "local.dds"
+    local_filepath.parent.mkdir(parents=True)
+    local_filepath.write_bytes(b"DDS local")
+
+    http_source = HttpSource(base_url, tmp_path / "cache")
+    overlay = OverlaySource([http_source, LocalFolderSource(local_resources)])
+    try:
+        # Locating doesn't ask the sources.
+        located = [overlay.locate(asset_path) for asset_path in ("\\art\\textures\\chest_d.dds", "\\art\\textures\\local.dds")]
+        assert http_source.requests == 0
+        assert located[1] == str(local_filepath)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            fetched = list(executor.map(overlay.fetch_local, located))
+        assert fetched[0] == http_source.local_path("\\art\\textures\\chest_d.dds")
+        assert fetched[1] == str(local_filepath)
+        with open(fetched[0], "rb") as fetched_file:
+            assert fetched_file.read() == ASSETS["art/textures/chest_d.dds"]
+        assert overlay.source_of("\\art\\textures\\chest_d.dds") is http_source
+        assert overlay.source_of("\\art\\textures\\local.dds") is overlay.sources[-1]
+
+        # Resolving fetches right away.
+        assert overlay.resolve("\\art\\shaders\\materials\\chest.mat") == http_source.local_path("\\art\\shaders\\materials\\chest.mat")
+    finally:
+        overlay.close()
+
+
+def test_tor_index_not_refreshed_while_in_use(tmp_path):
+    tor_folderpath = tmp_path / "Assets"
+    tor_folderpath.mkdir()
+    write_tor_archive(tor_folderpath / "assets_1.tor", {"\\art\\a.dds": b"DDS a"})
+
+    reading = TorSource(get_tor_index(tor_folderpath, tmp_path / "indexes"), tmp_path / "cache")
+    filepath = reading.locate("\\art\\a.dds")
+
+    # A game patch, while a gathering is still reading the archives
+    write_tor_archive(tor_folderpath / "assets_2.tor", {"\\art\\b.dds": b"DDS b"})
+    other = TorSource(get_tor_index(tor_folderpath, tmp_path / "indexes"), tmp_path / "cache")
+    assert other.tor_index is reading.tor_index
+    assert not other.exists("\\art\\b.dds")
+    other.close()
+
+    reading.fetch_local(filepath)
+    with open(filepath, "rb") as fetched_file:
+        assert fetched_file.read() == b"DDS a"
+    reading.close()
+    reading.close()  # Released once
+
+    # Refreshed once no source uses it
+    later = TorSource(get_tor_index(tor_folderpath, tmp_path / "indexes"), tmp_path / "cache")
+    assert later.exists("\\art\\b.dds")
+    later.close()
@@ -0,0 +1,159 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from swtor_character_assembler.gather_copier import copy_assets
+from swtor_character_assembler.gather_planner import iter_gather, plan_gather
+
+
+MAT = (
+    "<Material>"
+    "<input><semantic>DiffuseMap</semantic><type>texture</type><value>{}</value></input>"
+    "<input><semantic>DirectionMap</semantic><type>Texture</type><value>{}</value></input>"
+    "</Material>"
+    )
+
+
+def _write(resources, asset_path, contents):
+    filepath = resources.joinpath(*asset_path.strip("\\").split("\\"))
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    filepath.write_bytes(contents)
+
+
+@pytest.fixture
+def character(tmp_path):
+    '''A 'resources' folder and a character's 'paths.json' using it.
+    Returns (resources folder, 'paths.json' path).'''
+
+    resources = tmp_path / "resources"
+    _write(resources, "\\art\\shaders\\materials\\chest_a.mat", MAT.format("art\\t\\chest_d", "art\\t\\chest_dir").encode())
+    _write(resources, "\\art\\shaders\\materials\\extra_mat.mat", MAT.format("art\\t\\extra_d", "art\\t\\extra_dir").encode())
+    _write(resources, "\\art\\shaders\\materials\\skin_head.mat", MAT.format("art\\t\\head_d", "art\\t\\head_dir").encode())
+    for name in ("chest_d", "chest_dir", "chest_n", "extra_d", "extra_dir", "head_d", "head_dir"):
+        _write(resources, "\\art\\t\\" + name + ".dds", name.encode())
+    # Model referencing an existing material (extra_mat) and strings that aren't ones
+    _write(resources, "\\art\\dynamic\\chest\\model\\chest.gr2", b"GR2\x00bone_root\x00extra_mat\x00nothere\x00")
+    _write(resources, "\\art\\dynamic\\spec\\skeleton.gr2", b"GR2\x00")
+
+    character_folderpath = tmp_path / "character"
+    character_folderpath.mkdir()
+    paths = [
+        {
+            "slotName": "chest",
+            "models": ["\\art\\dynamic\\chest\\model\\chest.gr2"],
+            "materialInfo": {
+                "matPath": "\\art\\shaders\\materials\\chest_a.mat",
+                "ddsPaths": {"rotationMap": "\\art\\t\\chest_n.dds"},
+                },
+            },
+        {
+            "slotName": "skinMats",
+            "materialInfo": {
+                "mats": [
+                    {
+                        "slotName": "head",
+                        "materialInfo": {"matPath": "\\art\\shaders\\materials\\skin_head.mat"},
+                        "ddsPaths": {},
+                        },
+                    ],
+                },
+            },
+        ]
+    paths_json_filepath = character_folderpath / "paths.json"
+    paths_json_filepath.write_text(json.dumps(paths))
+    (character_folderpath / "skeleton.json").write_text(json.dumps({"path": "\\art\\dynamic\\spec\\skeleton.gr2"}))
+    return resources, paths_json_filepath
+
+
+def _destinations(plan, character_folderpath):
+    return {Path(entry.destination).relative_to(character_folderpath).as_posix() for entry in plan}
+
+
+def test_plan(character):
+    resources, paths_json_filepath = character
+    plan = plan_gather(paths_json_filepath, resources)
+
+    assert _destinations(plan, paths_json_filepath.parent) == {
+        "models/chest/chest.gr2",
+        "materials/chest/chest_a.mat",
+        "materials/chest/chest_dir.dds",
+        "materials/chest/chest_n.dds",
+        "materials/skinMats/head/skin_head.mat",
+        "materials/skinMats/head_dir.dds",
+        "skeleton/skeleton.gr2",
+        }
+    assert plan.skeleton_filepath == str(paths_json_filepath.parent / "skeleton" / "skeleton.gr2")
+    assert plan.dependencies is None
+    for entry in plan:
+        assert os.path.exists(entry.origin)
+
+
+def test_plan_deduplicates(character):
+    resources, paths_json_filepath = character
+    paths = json.loads(paths_json_filepath.read_text())
+    paths.append(dict(paths[0]))
+    paths_json_filepath.write_text(json.dumps(paths))
+
+    plan = plan_gather(paths_json_filepath, resources)
+    assert len(plan) == 7
+    assert plan.duplicates == 4
+
+
+def test_plan_complete_dependencies(character):
+    resources, paths_json_filepath = character
+    plan = plan_gather(paths_json_filepath, resources, complete_dependencies=True)
+
+    assert _destinations(plan, paths_json_filepath.parent) == {
+        "models/chest/chest.gr2",
+        "materials/chest/chest_a.mat",
+        "materials/chest/chest_d.dds",
+        "materials/chest/chest_dir.dds",
+        "materials/chest/chest_n.dds",
+        # From the model
+        "materials/chest/extra_mat.mat",
+        "materials/chest/extra_d.dds",
+        "materials/chest/extra_dir.dds",
+        # Skin materials' other textures go to their own folders.
+        "materials/skinMats/head/skin_head.mat",
+        "materials/skinMats/head/head_d.dds",
+        "materials/skinMats/head_dir.dds",
+        "skeleton/skeleton.gr2",
+        }
+    assert plan.dependencies.materials_found == 1
+
+
+def test_iter_gather_matches_plan(character):
+    resources, paths_json_filepath = character
+    plan = plan_gather(paths_json_filepath, resources, complete_dependencies=True)
+    streamed = list(iter_gather(paths_json_filepath, resources, complete_dependencies=True))
+    assert [(entry.origin, entry.destination) for entry in streamed] == [(entry.origin, entry.destination) for entry in plan]
+
+
+def test_copy_assets(character):
+    resources, paths_json_filepath = character
+    plan = plan_gather(paths_json_filepath, resources)
+
+    errors, stats = copy_assets(plan.entries, folders=plan.folders, max_workers=4)
+    assert errors == []
+    assert stats.copied == len(plan)
+    assert stats.failed == 0
+    for entry in plan:
+        assert Path(entry.destination).read_bytes() == Path(entry.origin).read_bytes()
+
+    # Nothing gets overwritten by default.
+    errors, stats = copy_assets(plan.entries, max_workers=4)
+    assert errors == []
+    assert stats.preserved == len(plan)
+
+
+def test_copy_assets_reports_missing(character):
+    resources, paths_json_filepath = character
+    os.remove(resources / "art" / "t" / "chest_n.dds")
+    plan = plan_gather(paths_json_filepath, resources)
+
+    errors, stats = copy_assets(plan, max_workers=2)
+    assert stats.failed == 1
+    assert len(errors) == 1
+    assert "chest_n.dds" in errors[0]
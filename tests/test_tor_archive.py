@@ -0,0 +1,109 @@
+import io
+import os
+
+import pytest
+
+from swtor_character_assembler.tor_archive import (
+    TorArchiveError,
+    TorIndex,
+    hash_filename,
+    hashlittle2,
+    read_toc,
+    tor_filename,
+    write_tor_archive,
+    )
+
+
+# Reference values from lookup3.c's driver5()
+
+@pytest.mark.parametrize("pc, pb, expected", [
+    (0, 0, (0xDEADBEEF, 0xDEADBEEF)),
+    (0, 0xDEADBEEF, (0xBD5B7DDE, 0xDEADBEEF)),
+    (0xDEADBEEF, 0xDEADBEEF, (0x9C093CCD, 0xBD5B7DDE)),
+    ])
+def test_hashlittle2_empty(pc, pb, expected):
+    assert hashlittle2(b"", pc, pb) == expected
+
+
+@pytest.mark.parametrize("pc, primary", [
+    (0, 0x17770551),
+    (1, 0xCD628161),
+    ])
+def test_hashlittle2_text(pc, primary):
+    assert hashlittle2(b"Four score and seven years ago", pc)[0] == primary
+
+
+def test_filenames_are_normalized():
+    assert tor_filename("\\art\\Shaders\\materials\\Foo.mat") == "/resources/art/shaders/materials/foo.mat"
+    assert hash_filename("\\art\\Shaders\\materials\\Foo.mat") == hash_filename("art/shaders/materials/foo.mat")
+
+
+FILES = {
+    "\\art\\shaders\\materials\\chest.mat": b"<Material/>",
+    "\\art\\dynamic\\chest\\model\\chest.gr2": b"GR2" * 1000,
+    "\\art\\textures\\chest_d.dds": bytes(range(256)) * 40,
+    }
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_read_toc(tmp_path, compress):
+    archive_filepath = tmp_path / "assets.tor"
+    write_tor_archive(archive_filepath, FILES, compress=compress, entries_per_block=2)
+
+    with open(archive_filepath, "rb") as archive_file:
+        toc = {entry[0]: entry for entry in read_toc(archive_file)}
+        assert set(toc) == {hash_filename(asset_path) for asset_path in FILES}
+        for asset_path, contents in FILES.items():
+            _, data_offset, compressed_size, uncompressed_size, compression = toc[hash_filename(asset_path)]
+            assert uncompressed_size == len(contents)
+            assert compression == (1 if compress else 0)
+            archive_file.seek(data_offset)
+            assert len(archive_file.read(compressed_size)) == compressed_size
+
+
+def test_read_toc_rejects_other_files():
+    with pytest.raises(TorArchiveError):
+        list(read_toc(io.BytesIO(b"PK\x03\x04" + b"\0" * 64)))
+    with pytest.raises(TorArchiveError):
+        list(read_toc(io.BytesIO(b"MYP")))
+
+
+def test_index_reads_files(tmp_path):
+    write_tor_archive(tmp_path / "assets_1.tor", FILES, entries_per_block=2)
+    index = TorIndex(tmp_path, tmp_path / "index" / "tor_index.bin")
+    try:
+        assert len(index) == len(FILES)
+        for asset_path, contents in FILES.items():
+            assert index.exists(asset_path.upper())
+            assert index.read(asset_path) == contents
+        assert not index.exists("\\art\\textures\\missing.dds")
+        with pytest.raises(FileNotFoundError):
+            index.read("\\art\\textures\\missing.dds")
+    finally:
+        index.close()
+
+
+def test_later_archives_win_and_refresh(tmp_path):
+    index_filepath = tmp_path / "tor_index.bin"
+    write_tor_archive(tmp_path / "assets_1.tor", FILES)
+    index = TorIndex(tmp_path, index_filepath)
+    try:
+        assert index.read("\\art\\shaders\\materials\\chest.mat") == b"<Material/>"
+
+        # A patch archive, sorted after the first one
+        write_tor_archive(tmp_path / "assets_2.tor", {"\\art\\shaders\\materials\\chest.mat": b"<Material patched/>"})
+        index.refresh()
+        assert len(index) == len(FILES)
+        assert index.read("\\art\\shaders\\materials\\chest.mat") == b"<Material patched/>"
+        assert index.lookup("\\art\\shaders\\materials\\chest.mat")[3] == os.path.join(str(tmp_path), "assets_2.tor")
+    finally:
+        index.close()
+
+    # A new instance reuses the index file as it is.
+    modified = os.stat(index_filepath).st_mtime_ns
+    index = TorIndex(tmp_path, index_filepath)
+    try:
+        assert os.stat(index_filepath).st_mtime_ns == modified
+        assert index.read("\\art\\dynamic\\chest\\model\\chest.gr2") == FILES["\\art\\dynamic\\chest\\model\\chest.gr2"]
+    finally:
+        index.close()